@@ -0,0 +1,84 @@
+'''
+Compare parsing many numeric arguments with `*args: int`, which converts each
+argument with its own int() call and collects the results in a tuple of int
+objects, against `ids: List[int]`, which converts them in bulk into an
+array.array.
+
+Both are measured with argparse, and with autoparse's fast parser (fast=True),
+which hands the arguments to the array conversion without looking at each one.
+Parse time is the best of several runs of the whole autoparse call. Memory is
+the size of the collected result, as measured by tracemalloc, so it doesn't
+include the argument strings themselves, which both versions share.
+'''
+
+import tracemalloc
+from timeit import Timer
+from typing import List
+from autocommand import autocommand, autoparse
+
+
+def make_commands(element_type, fast):
+    '''
+    Create the boxed (*args) and compact (List) versions of a command taking
+    numbers of element_type.
+    '''
+    @autoparse(fast=fast)
+    def boxed(*ids: element_type):
+        return ids
+
+    @autoparse(fast=fast)
+    def compact(ids: List[element_type]):
+        return ids
+
+    return [('boxed', boxed), ('compact', compact)]
+
+
+def parse_time(command, argv, repeat):
+    timer = Timer(lambda: command(argv))
+    return min(timer.repeat(repeat, 1))
+
+
+def result_size(command, argv):
+    '''The memory allocated for the result, which is still alive'''
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        result = command(argv)
+        after, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    del result
+    return after - before
+
+
+def report(label, commands, argv, repeat):
+    print('{}, {} arguments:'.format(label, len(argv)))
+    results = {}
+    for name, command in commands:
+        # Warm up, so the parser is built before anything is measured
+        command(argv[:1])
+        results[name] = (
+            parse_time(command, argv, repeat), result_size(command, argv))
+        print('  {:8} {:8.1f} ms {:8.2f} MiB'.format(
+            name,
+            results[name][0] * 1000,
+            results[name][1] / (1 << 20)))
+
+    (boxed_time, boxed_size), (compact_time, compact_size) = results.values()
+    print('  speedup: {:.1f}x, memory: {:.1f}x smaller'.format(
+        boxed_time / compact_time, boxed_size / compact_size))
+
+
+@autocommand(__name__)
+def main(count=200000, repeat=5):
+    '''
+    Measure the parse time and memory use of COUNT numeric arguments.
+    '''
+    ints = [str(i * 7919) for i in range(count)]
+    floats = [str(i / 7) for i in range(count)]
+
+    for fast in False, True:
+        parser = 'fast parser' if fast else 'argparse'
+        report('int, ' + parser, make_commands(int, fast), ints, repeat)
+        report('float, ' + parser, make_commands(float, fast), floats, repeat)
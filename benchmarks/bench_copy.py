@@ -0,0 +1,70 @@
+'''
+Compare copying a file with smart_copy, which uses the kernel's zero-copy
+system calls when it can, against reading and writing it through Python with
+shutil.copyfileobj, both to another file and into a pipe.
+'''
+
+import os
+import shutil
+import tempfile
+from threading import Thread
+from timeit import default_timer
+from autocommand import autocommand, smart_copy, smart_open
+
+
+def python_copy(source, dest):
+    with smart_open(source, 'rb') as src, smart_open(dest, 'wb') as dst:
+        shutil.copyfileobj(src, dst, 1 << 20)
+
+
+def to_file(copy, source, directory):
+    copy(source, os.path.join(directory, 'copy.bin'))
+
+
+def to_pipe(copy, source, directory):
+    read_fd, write_fd = os.pipe()
+
+    def drain():
+        with open(read_fd, 'rb', buffering=0) as reader:
+            while reader.read(1 << 20):
+                pass
+
+    thread = Thread(target=drain)
+    thread.start()
+    with open(write_fd, 'wb') as writer:
+        copy(source, writer)
+    thread.join()
+
+
+def best_time(target, copy, source, directory, repeat):
+    times = []
+    for _ in range(repeat):
+        start = default_timer()
+        target(copy, source, directory)
+        times.append(default_timer() - start)
+
+        # Truncating the previous copy would be part of the next one
+        dest = os.path.join(directory, 'copy.bin')
+        if os.path.exists(dest):
+            os.remove(dest)
+    return min(times)
+
+
+@autocommand(__name__)
+def main(size_mib=256, repeat=5):
+    '''
+    Measure copying a SIZE_MIB MiB file with smart_copy and through Python.
+    '''
+    with tempfile.TemporaryDirectory() as directory:
+        source = os.path.join(directory, 'source.bin')
+        with open(source, 'wb') as file:
+            block = os.urandom(1 << 20)
+            for _ in range(size_mib):
+                file.write(block)
+
+        for label, target in ('file', to_file), ('pipe', to_pipe):
+            python = best_time(target, python_copy, source, directory, repeat)
+            zero = best_time(target, smart_copy, source, directory, repeat)
+            print('to {}: copyfileobj {:.1f} ms, smart_copy {:.1f} ms, '
+                  'speedup {:.1f}x'.format(
+                      label, python * 1000, zero * 1000, python / zero))
@@ -0,0 +1,78 @@
+'''
+Compare the import time of a module that defines many autoparse commands, with
+and without lazy parser construction.
+
+Each measurement imports a freshly generated module in a new interpreter, so
+that the results include everything a user of such a module would pay.
+'''
+
+import os
+import subprocess
+import sys
+import tempfile
+from statistics import median
+from autocommand import autocommand
+
+
+COMMAND_TEMPLATE = '''
+@autoparse(lazy={lazy})
+def command_{index}(
+        source: 'The file to read',
+        destination: 'The file to write',
+        count: int =1,
+        ratio: float =0.5,
+        name='command',
+        verbose=False,
+        quiet=False):
+    \'\'\'
+    Command number {index}
+    ----------
+    Extra documentation in the epilog.
+    \'\'\'
+'''
+
+# Print the time spent importing the generated module, excluding interpreter
+# startup and the import of autocommand itself.
+TIMER = '''
+import time
+import autocommand.autoparse
+start = time.perf_counter()
+import {module}
+print(time.perf_counter() - start)
+'''
+
+
+def write_module(directory, name, commands, lazy):
+    with open(os.path.join(directory, name + '.py'), 'w') as file:
+        file.write('from autocommand import autoparse\n')
+        for index in range(commands):
+            file.write(COMMAND_TEMPLATE.format(index=index, lazy=lazy))
+
+
+def time_import(directory, name):
+    result = subprocess.run(
+        [sys.executable, '-c', TIMER.format(module=name)],
+        cwd=directory, check=True,
+        stdout=subprocess.PIPE, universal_newlines=True)
+    return float(result.stdout)
+
+
+@autocommand(__name__)
+def main(commands=200, repeat=15):
+    '''
+    Measure the import time of a module defining COMMANDS autoparse commands,
+    in eager and lazy mode.
+    '''
+    with tempfile.TemporaryDirectory() as directory:
+        write_module(directory, 'eager_commands', commands, lazy=False)
+        write_module(directory, 'lazy_commands', commands, lazy=True)
+
+        eager = median(
+            time_import(directory, 'eager_commands') for _ in range(repeat))
+        lazy = median(
+            time_import(directory, 'lazy_commands') for _ in range(repeat))
+
+    print('{} commands, median of {} imports'.format(commands, repeat))
+    print('eager: {:8.2f} ms'.format(eager * 1000))
+    print('lazy:  {:8.2f} ms'.format(lazy * 1000))
+    print('speedup: {:.1f}x'.format(eager / lazy))
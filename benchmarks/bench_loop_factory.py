@@ -0,0 +1,87 @@
+'''
+Compare event loop implementations, as autoasync loop factories, on a local
+echo workload: an echo server on a loopback socket, and several clients that
+each send many small messages and wait for every reply.
+
+The factories are the default loop, selector loops with each of the
+selectors available on this platform, and uvloop, if it's installed.
+'''
+
+import asyncio
+import selectors
+from timeit import default_timer
+from autocommand import autocommand
+from autocommand.autoasync import autoasync
+
+
+MESSAGE = b'x' * 64 + b'\n'
+
+
+def loop_factories():
+    factories = {'default': asyncio.new_event_loop}
+
+    for name in 'EpollSelector', 'KqueueSelector', 'PollSelector', \
+            'SelectSelector':
+        selector = getattr(selectors, name, None)
+        if selector is not None:
+            factories[name] = (
+                lambda selector=selector:
+                    asyncio.SelectorEventLoop(selector()))
+
+    try:
+        import uvloop
+    except ImportError:
+        pass
+    else:
+        factories['uvloop'] = uvloop.new_event_loop
+
+    return factories
+
+
+async def echo(reader, writer):
+    while True:
+        line = await reader.readline()
+        if not line:
+            break
+        writer.write(line)
+        await writer.drain()
+    writer.close()
+
+
+async def client(port, messages):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    for _ in range(messages):
+        writer.write(MESSAGE)
+        await reader.readline()
+    writer.close()
+
+
+async def echo_workload(clients, messages):
+    server = await asyncio.start_server(echo, '127.0.0.1', 0)
+    port = server.sockets[0].getsockname()[1]
+
+    start = default_timer()
+    await asyncio.gather(*(client(port, messages) for _ in range(clients)))
+    elapsed = default_timer() - start
+
+    server.close()
+    await server.wait_closed()
+    return elapsed
+
+
+@autocommand(__name__)
+def main(clients=50, messages=2000, repeat=3):
+    '''
+    Measure CLIENTS clients each echoing MESSAGES messages, with each
+    available loop factory.
+    '''
+    results = {}
+    for name, factory in loop_factories().items():
+        run = autoasync(echo_workload, loop_factory=factory)
+        results[name] = min(run(clients, messages) for _ in range(repeat))
+
+    baseline = results['default']
+    for name, elapsed in results.items():
+        print('{:16} {:8.0f} ms {:8.0f} round trips/s {:6.2f}x'.format(
+            name, elapsed * 1000, clients * messages / elapsed,
+            baseline / elapsed))
@@ -0,0 +1,72 @@
+'''
+Compare a command that prints each record with one that yields them from a
+generator main function, which automain writes in batches, into a pipe, for
+plain text and for JSON lines.
+'''
+
+import os
+import subprocess
+import sys
+from timeit import default_timer
+from autocommand import autocommand
+
+
+PRINT_SCRIPT = '''\
+import json
+from autocommand import automain
+
+@automain(__name__)
+def main():
+    for i in range({count}):
+        print({expression})
+'''
+
+GENERATOR_SCRIPT = '''\
+from autocommand import automain
+
+@automain(__name__, encoder={encoder!r})
+def main():
+    for i in range({count}):
+        yield {item}
+'''
+
+FORMATS = {
+    'text': ("'record {}'.format(i)", "'record {}'.format(i)"),
+    'jsonl': ("json.dumps({'id': i, 'name': 'record'})",
+              "{'id': i, 'name': 'record'}"),
+}
+
+
+def best_time(code, repeat):
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+    env.pop('PYTHONUNBUFFERED', None)
+
+    times = []
+    for _ in range(repeat):
+        start = default_timer()
+        writer = subprocess.Popen(
+            [sys.executable, '-c', code], stdout=subprocess.PIPE, env=env)
+        reader = subprocess.Popen(
+            ['cat'], stdin=writer.stdout, stdout=subprocess.DEVNULL)
+        writer.stdout.close()
+        writer.wait()
+        reader.wait()
+        times.append(default_timer() - start)
+    return min(times)
+
+
+@autocommand(__name__)
+def main(count=1000000, repeat=3):
+    '''
+    Measure writing COUNT records into a pipe with print and with a
+    generator main function.
+    '''
+    for encoder, (expression, item) in FORMATS.items():
+        printed = best_time(PRINT_SCRIPT.format(
+            count=count, expression=expression), repeat)
+        generated = best_time(GENERATOR_SCRIPT.format(
+            count=count, encoder=encoder, item=item), repeat)
+        print('{}: print {:.0f} ms, generator {:.0f} ms, '
+              'speedup {:.2f}x'.format(
+                  encoder, printed * 1000, generated * 1000,
+                  printed / generated))
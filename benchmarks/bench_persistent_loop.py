@@ -0,0 +1,50 @@
+'''
+Compare the per-call cost of many small autoasync calls: with the default
+event loop, with a loop_factory that creates and tears down a new loop for
+each call, and inside a PersistentLoop, which runs every call in one loop.
+'''
+
+import asyncio
+import warnings
+from timeit import Timer
+from autocommand import autocommand
+from autocommand.autoasync import autoasync, PersistentLoop
+
+
+async def trivial(value):
+    await asyncio.sleep(0)
+    return value
+
+
+def per_call(command, calls, repeat):
+    timer = Timer(lambda: command(1))
+    return min(timer.repeat(repeat, calls)) / calls
+
+
+@autocommand(__name__)
+def main(calls=10000, repeat=5):
+    '''
+    Measure CALLS calls of a trivial coroutine in each configuration.
+    '''
+    results = {}
+
+    with warnings.catch_warnings():
+        # get_event_loop warns when there's no current loop on some versions
+        warnings.simplefilter('ignore', DeprecationWarning)
+        asyncio.set_event_loop(asyncio.new_event_loop())
+        results['default loop'] = per_call(
+            autoasync(trivial), calls, repeat)
+
+    results['loop_factory'] = per_call(
+        autoasync(trivial, loop_factory=asyncio.new_event_loop),
+        calls, repeat)
+
+    with PersistentLoop():
+        results['PersistentLoop'] = per_call(
+            autoasync(trivial, loop_factory=asyncio.new_event_loop),
+            calls, repeat)
+
+    baseline = results['loop_factory']
+    for name, elapsed in results.items():
+        print('{:16} {:8.1f} us/call {:6.1f}x'.format(
+            name, elapsed * 1e6, baseline / elapsed))
@@ -0,0 +1,92 @@
+'''
+Compare the startup time of a script with a 10 parameter command, run with
+and without autoparse's on-disk spec cache, with an eagerly built parser,
+and with lazy=True and fast=True, which don't build the ArgumentParser.
+
+Each run is a new interpreter that parses a command line and calls the
+command, so the times include everything the cache costs (its imports, and
+reading the cache file) and everything it saves (generating the specs). The
+cold runs start from an empty cache directory, which they then fill; the warm
+runs reuse it.
+'''
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from statistics import median
+from timeit import default_timer
+from autocommand import autocommand
+
+
+SCRIPT = '''
+from autocommand import autoparse
+
+@autoparse(cache={cache!r}, fast=True, lazy={lazy})
+def command(
+        source: 'The file to read',
+        destination: 'The file to write',
+        count: int =1,
+        ratio: float =0.5,
+        name='command',
+        mode='copy',
+        retries: int =3,
+        timeout: float =10.0,
+        verbose=False,
+        quiet=False):
+    \'\'\'
+    A command with many parameters
+    \'\'\'
+
+command(['in.txt', 'out.txt', '-c', '2', '-v'])
+'''
+
+
+def time_run(path):
+    # Bytecode is written and used, as it would be for an installed command
+    env = dict(os.environ)
+    env.pop('PYTHONDONTWRITEBYTECODE', None)
+
+    start = default_timer()
+    subprocess.run([sys.executable, path], env=env, check=True)
+    return default_timer() - start
+
+
+def measure(directory, lazy, repeat):
+    cache_dir = os.path.join(directory, 'cache')
+    shutil.rmtree(cache_dir, ignore_errors=True)
+    paths = {}
+    for name, cache in ('none', None), ('cache', cache_dir):
+        paths[name] = os.path.join(directory, name + '.py')
+        with open(paths[name], 'w') as file:
+            file.write(SCRIPT.format(cache=cache, lazy=lazy))
+
+    def cold():
+        shutil.rmtree(cache_dir, ignore_errors=True)
+        return time_run(paths['cache'])
+
+    results = {
+        'no cache': median(time_run(paths['none']) for _ in range(repeat)),
+        'cold cache': median(cold() for _ in range(repeat)),
+    }
+    time_run(paths['cache'])
+    results['warm cache'] = median(
+        time_run(paths['cache']) for _ in range(repeat))
+
+    print('lazy={}, median of {} runs'.format(lazy, repeat))
+    baseline = results['no cache']
+    for name, elapsed in results.items():
+        print('  {:12} {:8.2f} ms {:6.2f}x'.format(
+            name, elapsed * 1000, baseline / elapsed))
+
+
+@autocommand(__name__)
+def main(repeat=30):
+    '''
+    Measure the median wall time of REPEAT runs of the script, with no cache,
+    a cold cache, and a warm cache.
+    '''
+    with tempfile.TemporaryDirectory() as directory:
+        for lazy in False, True:
+            measure(directory, lazy, repeat)
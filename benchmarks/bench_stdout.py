@@ -0,0 +1,62 @@
+'''
+Compare a command that prints many lines into a pipe with the default
+sys.stdout against the same command with automain's stdout_buffer, which
+replaces sys.stdout with a stream that writes in 1 MiB chunks. Both are
+measured with Python's normal stdout buffering, and with PYTHONUNBUFFERED
+set (as it often is in containers and CI), which makes sys.stdout write
+every print call straight to the pipe.
+'''
+
+import os
+import subprocess
+import sys
+from timeit import default_timer
+from autocommand import autocommand
+
+
+SCRIPT = '''\
+from autocommand import automain
+
+@automain(__name__, stdout_buffer={stdout_buffer})
+def main():
+    for i in range({count}):
+        print('line', i)
+'''
+
+
+def run(stdout_buffer, unbuffered, count, repeat):
+    code = SCRIPT.format(stdout_buffer=stdout_buffer, count=count)
+
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+    env.pop('PYTHONUNBUFFERED', None)
+    if unbuffered:
+        env['PYTHONUNBUFFERED'] = '1'
+
+    times = []
+    for _ in range(repeat):
+        start = default_timer()
+        # The reader is cat, through a pipe, so the measurement includes the
+        # system calls of writing to it.
+        writer = subprocess.Popen(
+            [sys.executable, '-c', code], stdout=subprocess.PIPE, env=env)
+        reader = subprocess.Popen(
+            ['cat'], stdin=writer.stdout, stdout=subprocess.DEVNULL)
+        writer.stdout.close()
+        writer.wait()
+        reader.wait()
+        times.append(default_timer() - start)
+    return min(times)
+
+
+@autocommand(__name__)
+def main(count=1000000, repeat=3):
+    '''
+    Measure printing COUNT lines into a pipe, with and without stdout_buffer.
+    '''
+    for unbuffered in False, True:
+        default = run(None, unbuffered, count, repeat)
+        buffered = run(True, unbuffered, count, repeat)
+        print('{}: default stdout {:.0f} ms, stdout_buffer {:.0f} ms, '
+              'speedup {:.2f}x'.format(
+                  'PYTHONUNBUFFERED' if unbuffered else 'buffered',
+                  default * 1000, buffered * 1000, default / buffered))
@@ -0,0 +1,223 @@
+'''
+Startup and per-call overhead benchmarks for autocommand.
+
+Run this script to measure each metric. Use --save to store the results as a
+JSON baseline, and --compare to check the results against a stored baseline;
+in compare mode, the exit status is 1 if any metric regressed by more than the
+threshold.
+'''
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from statistics import median
+from timeit import Timer
+from autocommand import autocommand
+
+
+# Each metric is stored with its unit and whether a lower or higher value is
+# better, so that the comparison doesn't need to know anything about the
+# individual benchmarks.
+LOWER = 'lower'
+HIGHER = 'higher'
+
+IMPORT_TIMER = '''
+import time
+start = time.perf_counter()
+import autocommand
+from autocommand import autocommand
+print(time.perf_counter() - start)
+'''
+
+
+def per_call(stmt, setup='pass', namespace=None, repeat=5):
+    '''
+    Return the best per-call time of stmt, in seconds, over several repeats.
+    '''
+    timer = Timer(stmt, setup, globals=namespace)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat, number)) / number
+
+
+def bench_import_time(repeat):
+    times = []
+    for _ in range(repeat):
+        result = subprocess.run(
+            [sys.executable, '-c', IMPORT_TIMER],
+            check=True, stdout=subprocess.PIPE, universal_newlines=True)
+        times.append(float(result.stdout))
+    yield 'import_time', median(times), 's', LOWER
+
+
+def make_function(param_count):
+    '''
+    Create a function with param_count parameters. Half of them are
+    positional arguments, and the rest are options with int, str, and bool
+    defaults.
+    '''
+    params = []
+    for index in range(param_count):
+        if index < param_count // 2:
+            params.append('p{}'.format(index))
+        else:
+            default = ('1', "'x'", 'False')[index % 3]
+            params.append('p{}={}'.format(index, default))
+
+    namespace = {}
+    exec('def func({}): pass'.format(', '.join(params)), namespace)
+    return namespace['func']
+
+
+def bench_decoration(param_counts):
+    from autocommand import autoparse
+
+    for param_count in param_counts:
+        func = make_function(param_count)
+        yield (
+            'autoparse_decorate_{}_params'.format(param_count),
+            per_call(
+                'autoparse(func)',
+                namespace={'autoparse': autoparse, 'func': func},
+                repeat=5),
+            's', LOWER)
+
+
+def bench_autoparse_call():
+    from autocommand import autoparse
+
+    def func(source, dest, count: int =1, verbose=False):
+        pass
+
+    argv = ['source.txt', 'dest.txt', '-c', '10', '-v']
+    yield 'autoparse_call', per_call(
+        'func(argv)', namespace={'func': autoparse(func), 'argv': argv}
+    ), 's', LOWER
+    yield 'autoparse_call_fast', per_call(
+        'func(argv)', namespace={'func': autoparse(func, fast=True),
+                                 'argv': argv}
+    ), 's', LOWER
+
+
+def bench_autoasync_call():
+    import asyncio
+    from autocommand import autoasync
+
+    @autoasync
+    async def func(value):
+        return value
+
+    @autoasync(pass_loop=True)
+    async def func_with_loop(value, loop):
+        return value
+
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        yield 'autoasync_call', per_call(
+            'func(1)', namespace={'func': func}), 's', LOWER
+        yield 'autoasync_call_pass_loop', per_call(
+            'func(1)', namespace={'func': func_with_loop}), 's', LOWER
+    finally:
+        asyncio.set_event_loop(None)
+        loop.close()
+
+
+def bench_smart_open(size):
+    from autocommand import smart_open
+
+    chunk = os.urandom(1 << 16)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'data.bin')
+        with open(path, 'wb') as file:
+            for _ in range(size // len(chunk)):
+                file.write(chunk)
+
+        def read_all():
+            with smart_open(path, 'rb') as file:
+                while file.read(1 << 16):
+                    pass
+
+        seconds = per_call('read_all()', namespace={'read_all': read_all})
+
+    yield 'smart_open_read_throughput', size / seconds / 1e6, 'MB/s', HIGHER
+
+
+def run_benchmarks(quick):
+    results = {}
+    benchmarks = [
+        bench_import_time(5 if quick else 20),
+        bench_decoration([1, 10, 100] if quick else [1, 10, 100, 1000]),
+        bench_autoparse_call(),
+        bench_autoasync_call(),
+        bench_smart_open((8 if quick else 64) << 20),
+    ]
+
+    for benchmark in benchmarks:
+        for name, value, unit, better in benchmark:
+            results[name] = {'value': value, 'unit': unit, 'better': better}
+            print('{:<36} {:>14.6g} {}'.format(name, value, unit))
+
+    return results
+
+
+def compare_results(baseline, results, threshold):
+    '''
+    Compare results against a baseline. Print a report, and return the list of
+    metrics that regressed by more than threshold (a fraction of the baseline
+    value).
+    '''
+    regressions = []
+
+    print()
+    print('{:<36} {:>14} {:>14} {:>8}'.format(
+        'metric', 'baseline', 'current', 'change'))
+
+    for name, result in sorted(results.items()):
+        if name not in baseline:
+            continue
+
+        old = baseline[name]['value']
+        new = result['value']
+        change = (new - old) / old
+
+        # Normalize so that a positive change is always a regression
+        regression = change if result['better'] == LOWER else -change
+        regressed = regression > threshold
+        if regressed:
+            regressions.append(name)
+
+        print('{:<36} {:>14.6g} {:>14.6g} {:>+7.1%}{}'.format(
+            name, old, new, change, '  REGRESSION' if regressed else ''))
+
+    return regressions
+
+
+@autocommand(__name__)
+def main(
+        save: 'Write the results to this JSON file' =None,
+        compare: 'Compare the results against this JSON baseline' =None,
+        threshold: 'The largest allowed regression, as a fraction' =0.3,
+        quick: 'Run fewer iterations and smaller workloads' =False):
+    '''
+    Measure autocommand's startup and per-call overhead.
+    '''
+    results = run_benchmarks(quick)
+
+    if save is not None:
+        with open(save, 'w') as file:
+            json.dump(results, file, indent=2, sort_keys=True)
+            file.write('\n')
+
+    if compare is not None:
+        with open(compare) as file:
+            baseline = json.load(file)
+
+        regressions = compare_results(baseline, results, threshold)
+        if regressions:
+            print('\n{} metric(s) regressed by more than {:.0%}: {}'.format(
+                len(regressions), threshold, ', '.join(regressions)))
+            return 1
+
+    return 0
@@ -15,13 +15,65 @@
 # You should have received a copy of the GNU Lesser General Public License
 # along with autocommand.  If not, see <http://www.gnu.org/licenses/>.
 
-# flake8 flags all these imports as unused, hence the NOQAs everywhere.
+import sys
+from importlib import import_module
+from types import ModuleType
 
-from .automain import automain  # NOQA
-from .autoparse import autoparse, smart_open  # NOQA
-from .autocommand import autocommand  # NOQA
+# The public API is loaded lazily, so that each name only imports the modules
+# it needs; for instance, using automain doesn't import argparse or asyncio.
+# This maps each exported name to the submodule that defines it.
+_exports = {
+    'automain': 'automain',
+    'autoparse': 'autoparse',
+    'smart_open': 'smartopen',
+    'smart_copy': 'smartopen',
+    'autocommand': 'autocommand',
+    'autoasync': 'autoasync',
+    'smart_open_async': 'autoasync',
+    'PersistentLoop': 'autoasync',
+    'CommandGroup': 'group',
+    'Lines': 'argtypes',
+    'ArgStream': 'argtypes',
+    'File': 'argtypes',
+}
 
-try:
-    from .autoasync import autoasync  # NOQA
-except ImportError:  # pragma: no cover
-    pass
+__all__ = list(_exports)
+
+
+def __getattr__(name):
+    try:
+        module_name = _exports[name]
+    except KeyError:
+        raise AttributeError(
+            "module {!r} has no attribute {!r}".format(__name__, name)
+        ) from None
+
+    value = getattr(import_module('.' + module_name, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_exports))
+
+
+class _AutocommandPackage(ModuleType):
+    '''
+    Most of the exported functions share a name with the submodule that
+    defines them. When a submodule is first imported, the import system binds
+    it as an attribute of this package, which would hide the function of the
+    same name (for instance, after `import autocommand.autoparse`,
+    `autocommand.autoparse` would be the module). This module type binds the
+    function instead, just as the eager `from .autoparse import autoparse`
+    used to.
+    '''
+    def __setattr__(self, name, value):
+        if (isinstance(value, ModuleType) and
+                _exports.get(name) == name and
+                value.__name__ == '{}.{}'.format(__name__, name)):
+            value = getattr(value, name)
+
+        super().__setattr__(name, value)
+
+
+sys.modules[__name__].__class__ = _AutocommandPackage
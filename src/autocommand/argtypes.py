@@ -0,0 +1,422 @@
+# Copyright 2014-2016 Nathan West
+#
+# This file is part of autocommand.
+#
+# autocommand is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# autocommand is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with autocommand.  If not, see <http://www.gnu.org/licenses/>.
+
+'''
+Parameter types for autoparse functions, to be used as annotations. They
+convert the command-line argument into something more useful than a string.
+'''
+
+from autocommand.smartopen import smart_open, DEFAULT_BUFFER_SIZE
+
+
+class _RecordReader:
+    '''
+    The options shared by the types that read records from files, and the
+    method that reads them.
+    '''
+
+    delimiter = '\n'
+    buffer_size = DEFAULT_BUFFER_SIZE
+    encoding = None
+    errors = None
+
+    @classmethod
+    def using(cls, *, delimiter=None, buffer_size=None, encoding=None,
+              errors=None):
+        '''
+        Create a version of this type that splits the file on a different
+        delimiter, reads it with a different buffer size, or decodes it with
+        a different encoding or error handler.
+        '''
+        options = {
+            name: value for name, value in [
+                ('delimiter', delimiter),
+                ('buffer_size', buffer_size),
+                ('encoding', encoding),
+                ('errors', errors)]
+            if value is not None}
+
+        if options.get('delimiter') == '':
+            raise ValueError('{} delimiter must not be empty'.format(
+                cls.__name__))
+
+        return type(cls.__name__, (cls,), options)
+
+    def _read_records(self, filename):
+        from autocommand.batch import read_records
+
+        with smart_open(
+                filename,
+                encoding=self.encoding,
+                errors=self.errors,
+                buffer_size=self.buffer_size) as file:
+            delimiter = self.delimiter
+            if delimiter is None:
+                delimiter = _sniff_delimiter(file)
+            yield from read_records(file, delimiter, self.buffer_size)
+
+
+def _sniff_delimiter(file):
+    '''
+    Guess whether a text file is NUL-delimited or newline-delimited, by
+    looking for a NUL in the start of its binary buffer, without consuming it.
+    '''
+    peek = getattr(getattr(file, 'buffer', None), 'peek', None)
+    if peek is not None and b'\0' in peek(1 << 16):
+        return '\0'
+    return '\n'
+
+
+class Lines(_RecordReader):
+    '''
+    A lazy iterable of the lines of a file, given its filename, or '-' for
+    stdin. Use it as an annotation, for a filter-style command that handles a
+    file one line at a time, in constant memory:
+
+        @autocommand(__name__)
+        def grep(pattern, infile: Lines ='-'):
+            for line in infile:
+                if pattern in line:
+                    print(line)
+
+    The file isn't opened until the lines are iterated over, and it's closed
+    when the iteration is finished. It's opened with smart_open, so compressed
+    files are decompressed. The lines don't include their line endings.
+
+    To split the file into other records, or to set the encoding or the size
+    of the read buffer, use a type created by Lines.using:
+
+        def count(infile: Lines.using(delimiter='\\0') ='-'):
+            ...
+    '''
+
+    def __init__(self, filename):
+        self.filename = filename
+
+    def __repr__(self):
+        return '{}({!r})'.format(type(self).__name__, self.filename)
+
+    def __iter__(self):
+        return self._read_records(self.filename)
+
+
+class File:
+    '''
+    A file, given its filename, or '-' for stdin (or stdout, when it's opened
+    for writing), which is only opened when the function first uses it. Use it
+    as an annotation instead of a plain filename, for a command with several
+    files that it doesn't always need:
+
+        @autocommand(__name__)
+        def report(data: Lines, errors: File.using(mode='w') ='errors.txt'):
+            for line in data:
+                if not valid(line):
+                    print(line, file=errors)
+
+    The parameter gets a File, which behaves like the open file object: the
+    file is opened, with smart_open, the first time one of its methods or
+    attributes is used (or it's iterated over, or used in a with statement).
+    If the function never uses it, it's never opened, so an output file isn't
+    created. autoparse closes it when the function returns. The file object
+    itself is the file attribute; the mode, encoding, errors, buffer_size,
+    and compression attributes are the options it's opened with.
+
+    By default, files are opened for reading, in text mode. To set the mode,
+    encoding, error handler, buffer size, or compression, use a type created
+    by File.using:
+
+        def convert(infile: File.using(mode='rb', buffer_size=1 << 16)):
+            ...
+    '''
+
+    mode = 'r'
+    encoding = None
+    errors = None
+    buffer_size = DEFAULT_BUFFER_SIZE
+    compression = 'infer'
+
+    @classmethod
+    def using(cls, *, mode=None, encoding=None, errors=None, buffer_size=None,
+              compression='infer'):
+        '''
+        Create a version of this type that opens the file with a different
+        mode, encoding, error handler, buffer size, or compression (see
+        smart_open).
+        '''
+        options = {
+            name: value for name, value in [
+                ('mode', mode),
+                ('encoding', encoding),
+                ('errors', errors),
+                ('buffer_size', buffer_size)]
+            if value is not None}
+        options['compression'] = compression
+
+        return type(cls.__name__, (cls,), options)
+
+    def __init__(self, filename):
+        self.filename = filename
+        self._stack = None
+        self._file = None
+        self._closed = False
+
+    def __repr__(self):
+        return '{}({!r}, mode={!r})'.format(
+            type(self).__name__, self.filename, self.mode)
+
+    @property
+    def file(self):
+        '''The open file object, opening it if it isn't open yet'''
+        return self._get_file()
+
+    def _get_file(self):
+        if self._file is None:
+            if self._closed:
+                raise ValueError('I/O operation on closed file.')
+            self._file = self._open()
+        return self._file
+
+    def _open(self):
+        from contextlib import ExitStack
+
+        with ExitStack() as stack:
+            file = stack.enter_context(smart_open(
+                self.filename, self.mode,
+                buffering=self.buffer_size,
+                encoding=self.encoding,
+                errors=self.errors,
+                compression=self.compression,
+                buffer_size=self.buffer_size))
+            self._stack = stack.pop_all()
+
+        return file
+
+    @property
+    def opened(self):
+        '''True if the file has been opened'''
+        return self._file is not None
+
+    @property
+    def closed(self):
+        return self._closed
+
+    def close(self):
+        '''
+        Close the file, if it was opened. stdin and stdout are flushed, but
+        not closed. A File can't be reopened after it's closed.
+        '''
+        self._closed = True
+        file, stack = self._file, self._stack
+        self._file = self._stack = None
+
+        if stack is not None:
+            if not file.closed and hasattr(file, 'flush'):
+                file.flush()
+            stack.close()
+
+    def __getattr__(self, name):
+        # Private and special names are never forwarded, so that copying and
+        # pickling don't open the file.
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self._get_file(), name)
+
+    def __iter__(self):
+        return iter(self._get_file())
+
+    def __enter__(self):
+        self._get_file()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class ArgStream(_RecordReader):
+    '''
+    A lazy iterable of all the command-line arguments given for a parameter,
+    where an argument of the form @FILE is replaced by the items listed in
+    FILE, one per line or NUL-delimited (which is detected automatically);
+    @- reads the list from stdin. Use it as the annotation of a parameter that
+    would otherwise be *args, to accept more items than fit on a command line:
+
+        @autocommand(__name__)
+        def remove(paths: ArgStream):
+            for path in paths:
+                os.remove(path)
+
+        $ find . -name '*.tmp' -print0 | python remove.py @-
+
+    The parameter collects any number of arguments, like *args, but the
+    function gets an ArgStream instead of a tuple, and the argument files are
+    only read as it's iterated over, so the items never all have to be in
+    memory at once. To pass an argument that starts with @ literally, double
+    the @ (so @@name is passed as @name). ArgStream.using creates a version
+    with a fixed delimiter, a different buffer size, or an encoding.
+    '''
+
+    delimiter = None
+
+    def __init__(self, args):
+        self.args = list(args)
+
+    def __repr__(self):
+        return '{}({!r})'.format(type(self).__name__, self.args)
+
+    def __iter__(self):
+        for arg in self.args:
+            if arg.startswith('@@'):
+                yield arg[1:]
+            elif arg.startswith('@') and arg != '@':
+                yield from self._read_records(arg[1:])
+            else:
+                yield arg
+
+    @classmethod
+    def action(cls):
+        '''
+        Create the argparse Action that collects the arguments for a
+        parameter of this type into an instance of it.
+        '''
+        return _collecting_action(cls)
+
+
+def _collecting_action(collect):
+    '''
+    Create an argparse Action that stores collect(values), for the list of
+    all of the values of a nargs='*' argument. ValueErrors raised by collect
+    are reported as argument errors, with the ValueError's message.
+    '''
+    from argparse import Action, ArgumentError
+
+    class CollectingAction(Action):
+        def __call__(self, parser, namespace, values, option_string=None):
+            try:
+                value = collect(values)
+            except ValueError as e:
+                raise ArgumentError(self, str(e)) from e
+            setattr(namespace, self.dest, value)
+
+    # This lets autoparse's fast parser call it directly
+    CollectingAction.collect = staticmethod(collect)
+    return CollectingAction
+
+
+def sequence_element_type(annotation):
+    '''
+    If annotation is a list type with an element type, like list[int] or
+    typing.List[int], return the element type. Otherwise, return None.
+    '''
+    if getattr(annotation, '__origin__', None) is not list:
+        return None
+
+    element_types = getattr(annotation, '__args__', None) or ()
+    if len(element_types) != 1 or not isinstance(element_types[0], type):
+        return None
+
+    return element_types[0]
+
+
+class Array:
+    '''
+    A parameter type that collects any number of numeric arguments into a
+    compact array.array, rather than a list of int or float objects. autoparse
+    uses it for parameters annotated list[int] or list[float] (or
+    typing.List[int] or typing.List[float]):
+
+        @autocommand(__name__)
+        def fetch(ids: list[int]):
+            ...
+
+    The arguments are converted in bulk, and stored unboxed, as 64 bit signed
+    integers (typecode 'q') or doubles ('d'). Array.of(int, numpy=True)
+    creates a version that collects them into a NumPy array instead, when
+    NumPy is installed.
+    '''
+
+    element_type = int
+    numpy = False
+
+    _typecodes = {int: 'q', float: 'd'}
+
+    @classmethod
+    def of(cls, element_type, *, numpy=False):
+        '''
+        Create an Array type for int or float elements, optionally collected
+        into a NumPy array.
+        '''
+        if element_type not in cls._typecodes:
+            raise TypeError(
+                'Array elements must be int or float, not {!r}'.format(
+                    element_type))
+
+        return type(cls.__name__, (cls,), {
+            'element_type': element_type,
+            'numpy': numpy})
+
+    @classmethod
+    def convert(cls, values):
+        '''
+        Convert a list of strings into an array. Raises ValueError if any of
+        them isn't a valid int or float, or doesn't fit in 64 bits.
+        '''
+        element_type = cls.element_type
+        typecode = cls._typecodes[element_type]
+
+        try:
+            if cls.numpy:
+                try:
+                    import numpy
+                except ImportError:
+                    numpy = None
+
+                if numpy is not None:
+                    dtype = numpy.dtype(typecode)
+                    try:
+                        # NumPy can parse all the strings at once, in C
+                        return numpy.array(values, dtype=str).astype(dtype)
+                    except (ValueError, OverflowError):
+                        # Use Python's parsing, which accepts a few things
+                        # that NumPy doesn't, like 1_000
+                        return numpy.fromiter(
+                            map(element_type, values), dtype, len(values))
+
+            from array import array
+            return array(typecode, map(element_type, values))
+        except (ValueError, OverflowError):
+            pass
+
+        # Find the invalid value, for the error message
+        for value in values:
+            try:
+                converted = element_type(value)
+            except ValueError:
+                raise ValueError('invalid {} value: {!r}'.format(
+                    element_type.__name__, value)) from None
+            if element_type is int and not -2**63 <= converted < 2**63:
+                raise ValueError('{} value out of range: {!r}'.format(
+                    element_type.__name__, value))
+
+        raise ValueError('invalid {} values'.format(element_type.__name__))
+
+    @classmethod
+    def action(cls):
+        '''
+        Create the argparse Action that collects the arguments for a
+        parameter of this type into an array.
+        '''
+        return _collecting_action(cls.convert)
@@ -15,9 +15,33 @@
 # You should have received a copy of the GNU Lesser General Public License
 # along with autocommand.  If not, see <http://www.gnu.org/licenses/>.
 
-from asyncio import get_event_loop, iscoroutine
+import sys
+from asyncio import (
+    get_event_loop, get_running_loop, ensure_future, iscoroutine, wait,
+    wrap_future, Queue, StreamReader, StreamReaderProtocol, StreamWriter)
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
 from functools import wraps
-from inspect import signature
+from inspect import isasyncgen, signature
+from threading import Lock
+from autocommand.errors import AutocommandError
+from autocommand.smartopen import smart_open
+
+# File I/O for smart_open_async is done in a small pool of threads of its own,
+# so that streaming files can't starve the loop's default executor.
+_FILE_WORKERS = 4
+_file_executor = None
+_file_executor_lock = Lock()
+
+
+def _get_file_executor():
+    global _file_executor
+    with _file_executor_lock:
+        if _file_executor is None:
+            from concurrent.futures import ThreadPoolExecutor
+            _file_executor = ThreadPoolExecutor(
+                _FILE_WORKERS, thread_name_prefix='autocommand-file')
+        return _file_executor
 
 
 async def _run_forever_coro(coro, args, kwargs, loop):
@@ -51,7 +75,123 @@ async def _run_forever_coro(coro, args, kwargs, loop):
         await thing
 
 
-def autoasync(coro=None, *, loop=None, forever=False, pass_loop=False):
+class LoopFactoryError(AutocommandError, ValueError):
+    '''loop and loop_factory can't both be given'''
+
+
+@contextmanager
+def _new_loop(loop_factory):
+    '''
+    Create a new event loop with loop_factory (by default,
+    asyncio.new_event_loop), and tear it down at the end of the context:
+    cancel the remaining tasks, finalize async generators, shut down the
+    default executor, and close it. Yields the loop, and a function
+    that runs a coroutine in it. On Python 3.11 and later, this is done by
+    asyncio.Runner, which also cancels the coroutine on KeyboardInterrupt.
+
+    As with asyncio.Runner, a loop from an explicit loop_factory isn't made
+    the thread's current event loop, so the current loop is left alone.
+    '''
+    if sys.version_info >= (3, 11):
+        from asyncio import Runner
+
+        with Runner(loop_factory=loop_factory) as runner:
+            yield runner.get_loop(), runner.run
+        return
+
+    from asyncio import all_tasks, gather, new_event_loop, set_event_loop
+
+    set_current = loop_factory is None
+    new_loop = new_event_loop() if set_current else loop_factory()
+    if set_current:
+        set_event_loop(new_loop)
+    try:
+        yield new_loop, new_loop.run_until_complete
+    finally:
+        try:
+            tasks = all_tasks(new_loop)
+            for task in tasks:
+                task.cancel()
+            # gather() with no tasks would use the current loop
+            if tasks:
+                new_loop.run_until_complete(
+                    gather(*tasks, return_exceptions=True))
+            new_loop.run_until_complete(new_loop.shutdown_asyncgens())
+            shutdown_executor = getattr(
+                new_loop, 'shutdown_default_executor', None)
+            if shutdown_executor is not None:
+                new_loop.run_until_complete(shutdown_executor())
+        finally:
+            if set_current:
+                set_event_loop(None)
+            new_loop.close()
+
+
+# The PersistentLoop that autoasync functions run in, in this context
+_persistent_loop = ContextVar('autocommand_persistent_loop', default=None)
+
+
+class PersistentLoop:
+    '''
+    A long-lived event loop for autoasync functions that are called many
+    times in one process. Within its context, every call of an autoasync
+    function (except ones with an explicit `loop`) runs in this loop, instead
+    of the loop they would otherwise use:
+
+        with PersistentLoop():
+            for argv in commands:
+                main(argv)
+
+    This saves the cost of creating and tearing down a loop for each call,
+    with `loop_factory`, and lets connection pools, caches, and background
+    tasks created in the loop by one call be used by the next. The loop is
+    created by loop_factory (by default, asyncio.new_event_loop), and torn
+    down at the end of the context, as with `loop_factory`, or by close().
+
+    The loop can also be used directly, with the `loop` attribute and the
+    run method. The context only applies to the thread (or asyncio task)
+    that entered it, since event loops can't be shared between threads.
+    '''
+
+    def __init__(self, loop_factory=None):
+        # An explicit factory stops asyncio.Runner from replacing the
+        # thread's current event loop.
+        from asyncio import new_event_loop
+        self._context = _new_loop(loop_factory or new_event_loop)
+        self.loop, _ = self._context.__enter__()
+        self._tokens = []
+
+    def run(self, awaitable):
+        '''Run a coroutine or other awaitable in the loop; return its result'''
+        return self.loop.run_until_complete(awaitable)
+
+    def close(self):
+        '''
+        Cancel the tasks left in the loop, and close it. Does nothing if it's
+        already closed.
+        '''
+        context, self._context = self._context, None
+        if context is not None:
+            context.__exit__(None, None, None)
+
+    @property
+    def closed(self):
+        return self._context is None
+
+    def __enter__(self):
+        if self.closed:
+            raise RuntimeError('PersistentLoop is closed')
+        self._tokens.append(_persistent_loop.set(self))
+        return self
+
+    def __exit__(self, *exc_info):
+        _persistent_loop.reset(self._tokens.pop())
+        if not self._tokens:
+            self.close()
+
+
+def autoasync(coro=None, *, loop=None, forever=False, pass_loop=False,
+              encoder=None, loop_factory=None):
     '''
     Convert an asyncio coroutine into a function which, when called, is
     evaluted in an event loop, and the return value returned. This is intented
@@ -65,6 +205,15 @@ def autoasync(coro=None, *, loop=None, forever=False, pass_loop=False):
     callers can install custom event loops or event loop policies after
     @autoasync is applied.
 
+    If `loop_factory` is given, each call creates a new event loop by calling
+    it, and tears the loop down afterwards (cancelling any remaining tasks,
+    and closing it), as asyncio.Runner does; on Python 3.11 and later,
+    asyncio.Runner is used. Use it to run the coroutine in an alternative
+    loop implementation, like uvloop.new_event_loop, or a tuned selector
+    loop. `loop` and `loop_factory` can't both be given. Within the context
+    of a PersistentLoop, calls run in its loop instead, unless `loop` is
+    given.
+
     If `forever` is True, the loop is run forever after the decorated coroutine
     is finished. Use this for servers created with asyncio.start_server and the
     like.
@@ -75,6 +224,12 @@ def autoasync(coro=None, *, loop=None, forever=False, pass_loop=False):
     that autoparse can still be used on it without generating a parameter for
     `loop`.
 
+    If the decorated function is an async generator function, the generator
+    is run in the loop instead, and each item it yields is written to stdout,
+    as a line encoded by `encoder`, with write_items_async. The wrapper then
+    returns None. With `forever`, the loop keeps running after the generator
+    is exhausted.
+
     This coroutine can be called with ( @autoasync(...) ) or without
     ( @autoasync ) arguments.
 
@@ -95,11 +250,16 @@ def autoasync(coro=None, *, loop=None, forever=False, pass_loop=False):
     server('localhost', 8899)
 
     '''
+    if loop is not None and loop_factory is not None:
+        raise LoopFactoryError("loop and loop_factory can't both be given")
+
     if coro is None:
         return lambda c: autoasync(
             c, loop=loop,
             forever=forever,
-            pass_loop=pass_loop)
+            pass_loop=pass_loop,
+            encoder=encoder,
+            loop_factory=loop_factory)
 
     # The old and new signatures are required to correctly bind the loop
     # parameter in 100% of cases, even if it's a positional parameter.
@@ -111,12 +271,7 @@ def autoasync(coro=None, *, loop=None, forever=False, pass_loop=False):
             param for name, param in old_sig.parameters.items()
             if name != "loop"))
 
-    @wraps(coro)
-    def autoasync_wrapper(*args, **kwargs):
-        # Defer the call to get_event_loop so that, if a custom policy is
-        # installed after the autoasync decorator, it is respected at call time
-        local_loop = get_event_loop() if loop is None else loop
-
+    def run_in_loop(local_loop, run, args, kwargs):
         # Inject the 'loop' argument. We have to use this signature binding to
         # ensure it's injected in the correct place (positional, keyword, etc)
         if pass_loop:
@@ -128,11 +283,33 @@ def autoasync(coro=None, *, loop=None, forever=False, pass_loop=False):
 
         if forever:
             local_loop.create_task(_run_forever_coro(
-                coro, args, kwargs, local_loop
+                _writing_items(coro, encoder), args, kwargs, local_loop
             ))
             local_loop.run_forever()
         else:
-            return local_loop.run_until_complete(coro(*args, **kwargs))
+            result = coro(*args, **kwargs)
+            if isasyncgen(result):
+                result = write_items_async(result, encoder=encoder)
+            elif not iscoroutine(result):
+                # asyncio.Runner only runs coroutines, not other awaitables
+                run = local_loop.run_until_complete
+            return run(result)
+
+    @wraps(coro)
+    def autoasync_wrapper(*args, **kwargs):
+        persistent = _persistent_loop.get()
+        if persistent is not None and loop is None:
+            return run_in_loop(persistent.loop, persistent.run, args, kwargs)
+
+        if loop_factory is not None:
+            with _new_loop(loop_factory) as (new_loop, run):
+                return run_in_loop(new_loop, run, args, kwargs)
+
+        # Defer the call to get_event_loop so that, if a custom policy is
+        # installed after the autoasync decorator, it is respected at call time
+        local_loop = get_event_loop() if loop is None else loop
+        return run_in_loop(
+            local_loop, local_loop.run_until_complete, args, kwargs)
 
     # Attach the updated signature. This allows 'pass_loop' to be used with
     # autoparse
@@ -140,3 +317,385 @@ def autoasync(coro=None, *, loop=None, forever=False, pass_loop=False):
         autoasync_wrapper.__signature__ = new_sig
 
     return autoasync_wrapper
+
+
+def _writing_items(coro, encoder):
+    '''
+    Wrap a function so that, if it returns an async generator, it returns a
+    coroutine that writes the generator's items to stdout instead
+    '''
+    def call(*args, **kwargs):
+        result = coro(*args, **kwargs)
+        if isasyncgen(result):
+            return write_items_async(result, encoder=encoder)
+        return result
+
+    return call
+
+
+class AsyncFile:
+    '''
+    An asynchronous wrapper around a blocking file object. Reads, writes, and
+    line iteration are done in a thread pool, so they don't block the event
+    loop:
+
+        async for line in AsyncFile(file):
+            ...
+
+    Reading is done in chunks of chunk_size, in a background task that keeps
+    up to `prefetch` chunks ready ahead of the reader. Writes are buffered, up
+    to chunk_size, before they're sent to the file. The wrapped file is
+    available as the `file` attribute; it's not closed when the AsyncFile is
+    closed, except by smart_open_async.
+    '''
+
+    def __init__(self, file, *, executor=None, chunk_size=1 << 18, prefetch=4):
+        self.file = file
+        self._executor = _get_file_executor() if executor is None else executor
+        self._chunk_size = chunk_size
+        self._prefetch = prefetch
+
+        # The file is only ever used by one thread at a time
+        self._lock = Lock()
+
+        self._chunks = None
+        self._reader = None
+        self._buffer = None
+        self._position = 0
+        self._eof = False
+        self._empty = None
+
+        self._writes = []
+        self._write_size = 0
+
+    def _locked(self, method, *args):
+        with self._lock:
+            return method(*args)
+
+    def _run(self, method, *args):
+        return wrap_future(self._executor.submit(self._locked, method, *args))
+
+    async def _read_ahead(self):
+        while True:
+            chunk = await self._run(self.file.read, self._chunk_size)
+            await self._chunks.put(chunk)
+            if not chunk:
+                return
+
+    async def _next_chunk(self):
+        '''Get the next chunk read from the file; it's empty at the end'''
+        if not self._eof:
+            if self._reader is None:
+                self._chunks = Queue(self._prefetch)
+                self._reader = ensure_future(self._read_ahead())
+
+            chunk = await self._chunks.get()
+            if chunk:
+                return chunk
+
+            self._eof = True
+            self._empty = chunk
+
+        return self._empty
+
+    async def _fill(self):
+        '''
+        Add the next chunk to the buffer, dropping the data that's already
+        been taken. Returns False at the end of the file.
+        '''
+        chunk = await self._next_chunk()
+        if self._buffer is None:
+            self._buffer = chunk
+        elif chunk:
+            self._buffer = self._buffer[self._position:] + chunk
+            self._position = 0
+        return bool(chunk)
+
+    def _take(self, end=None):
+        data = self._buffer[self._position:end]
+        self._position = len(self._buffer) if end is None else end
+        return data
+
+    async def read(self, size=-1):
+        '''Read up to size bytes or characters, or until the end of the file'''
+        if size is None or size < 0:
+            parts = [] if self._buffer is None else [self._take()]
+            while True:
+                chunk = await self._next_chunk()
+                if not chunk:
+                    return chunk.join(parts)
+                parts.append(chunk)
+
+        while self._buffer is None or (
+                len(self._buffer) - self._position < size):
+            if not await self._fill():
+                break
+
+        return self._take(min(self._position + size, len(self._buffer)))
+
+    async def readline(self):
+        '''Read a line, including its line ending. It's empty at the end'''
+        searched = 0
+        while True:
+            if self._buffer is not None:
+                newline = '\n' if isinstance(self._buffer, str) else b'\n'
+                end = self._buffer.find(newline, self._position + searched)
+                if end != -1:
+                    return self._take(end + 1)
+                searched = len(self._buffer) - self._position
+
+            if not await self._fill():
+                return self._take()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        line = await self.readline()
+        if not line:
+            raise StopAsyncIteration
+        return line
+
+    async def write(self, data):
+        '''Write some data; it's buffered until there's chunk_size of it'''
+        self._writes.append(data)
+        self._write_size += len(data)
+        if self._write_size >= self._chunk_size:
+            await self._flush_writes()
+        return len(data)
+
+    async def writelines(self, lines):
+        for line in lines:
+            await self.write(line)
+
+    async def _flush_writes(self):
+        if self._writes:
+            data = self._writes[0][:0].join(self._writes)
+            self._writes = []
+            self._write_size = 0
+            await self._run(self.file.write, data)
+
+    async def flush(self):
+        '''Write any buffered data, and flush the file'''
+        await self._flush_writes()
+        flush = getattr(self.file, 'flush', None)
+        if flush is not None:
+            await self._run(flush)
+
+    async def close(self):
+        '''
+        Stop reading ahead, and flush any buffered writes. This doesn't close
+        the underlying file.
+        '''
+        if self._reader is not None:
+            self._reader.cancel()
+            await wait([self._reader])
+        await self.flush()
+
+
+@asynccontextmanager
+async def smart_open_async(
+        filename_or_file, *args,
+        executor=None,
+        chunk_size=1 << 18,
+        prefetch=4,
+        **kwargs):
+    '''
+    The asynchronous counterpart to smart_open, for use in async functions:
+
+        async with smart_open_async(filename) as file:
+            async for line in file:
+                ...
+
+    If filename_or_file is a str, bytes, or int, the file is opened with
+    smart_open (in a worker thread), with the given *args and **kwargs, and
+    closed at the end of the context. Other file objects, like sys.stdin, are
+    used without being closed. Either way, the context gets an AsyncFile
+    wrapping the file, which does its I/O in a thread pool (executor, if
+    given, or a small pool shared by all the files). asyncio StreamReaders
+    and StreamWriters, and AsyncFiles, are passed through unchanged.
+    '''
+    if isinstance(filename_or_file, (StreamReader, StreamWriter, AsyncFile)):
+        yield filename_or_file
+        return
+
+    if executor is None:
+        executor = _get_file_executor()
+
+    loop = get_running_loop()
+    context = smart_open(filename_or_file, *args, **kwargs)
+    file = await loop.run_in_executor(executor, context.__enter__)
+    async_file = AsyncFile(
+        file, executor=executor, chunk_size=chunk_size, prefetch=prefetch)
+
+    try:
+        yield async_file
+    finally:
+        try:
+            await async_file.close()
+        finally:
+            # AsyncFile's lock makes sure that any read that was in progress
+            # when it was closed has finished before the file is closed.
+            await async_file._run(context.__exit__, None, None, None)
+
+
+@asynccontextmanager
+async def _stdout_pipe():
+    '''
+    Connect a StreamWriter to stdout, if it's a pipe, socket, or terminal, so
+    that writes to it don't block the loop, and its drain method waits for the
+    reader to catch up. Yields None if stdout is anything else (like a
+    regular file, or a replacement for sys.stdout).
+    '''
+    import os
+    from autocommand.smartopen import _stdio
+
+    if os.name != 'posix' or _stdio(sys.stdout) is None:
+        yield None
+        return
+
+    loop = get_running_loop()
+    sys.stdout.flush()
+
+    # The transport is given its own file descriptor, since it closes it when
+    # it's done. It makes the pipe non-blocking, which affects stdout too, so
+    # that's undone at the end.
+    pipe = open(os.dup(1), 'wb', buffering=0)
+    try:
+        transport, protocol = await loop.connect_write_pipe(
+            lambda: StreamReaderProtocol(StreamReader()), pipe)
+    except ValueError:
+        # Regular files can't be used with the loop
+        pipe.close()
+        yield None
+        return
+
+    writer = StreamWriter(transport, protocol, None, loop)
+    try:
+        yield writer
+    except BaseException:
+        transport.abort()
+        raise
+    else:
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+    finally:
+        os.set_blocking(1, True)
+
+
+async def write_items_async(
+        items, file=None, *,
+        encoder=None,
+        batch_size=None):
+    '''
+    The asynchronous counterpart to autocommand.output.write_items: write
+    each item from an async iterable as a line of file (by default, stdout),
+    encoded by encoder ('text', 'jsonl', 'tsv', or a function).
+
+    Items are written as they arrive: the ones that are ready together, up to
+    batch_size of them, are combined into a single write. When stdout is a
+    pipe, socket, or terminal, it's written through the event loop, and
+    writing waits for the reader whenever it falls behind, without blocking
+    the loop. Other files are written with smart_open_async.
+
+    Returns None, or 1 if the reader of stdout went away, in which case the
+    generator is closed, and the rest of its items are discarded.
+    '''
+    from autocommand.output import DEFAULT_BATCH_SIZE, get_encoder
+
+    encode = get_encoder(encoder)
+    if batch_size is None:
+        batch_size = DEFAULT_BATCH_SIZE
+
+    async with _stdout_pipe() if file is None else _no_pipe() as pipe:
+        if pipe is not None:
+            encoding = sys.stdout.encoding
+            errors = sys.stdout.errors
+
+            def write(data):
+                # Once the reader is gone, the data is discarded
+                if not pipe.transport.is_closing():
+                    pipe.write(data.encode(encoding, errors))
+
+            async def drain():
+                try:
+                    if pipe.transport.is_closing():
+                        raise BrokenPipeError
+                    await pipe.drain()
+                except (BrokenPipeError, ConnectionResetError) as e:
+                    raise _ReaderGone from e
+
+            try:
+                await _write_batches(items, encode, batch_size, write, drain)
+            except _ReaderGone:
+                return 1
+            return None
+
+        async with smart_open_async(
+                sys.stdout if file is None else file, 'w') as out:
+            pending = []
+
+            async def drain():
+                if pending:
+                    data = ''.join(pending)
+                    pending.clear()
+                    await out.write(data)
+
+            await _write_batches(
+                items, encode, batch_size, pending.append, drain)
+            await drain()
+
+
+@asynccontextmanager
+async def _no_pipe():
+    yield None
+
+
+class _ReaderGone(Exception):
+    '''The reader of stdout went away'''
+
+
+async def _write_batches(items, encode, batch_size, write, drain):
+    '''
+    Encode the items, and write them in batches with write, which mustn't
+    block. A batch is written when it's full, or as soon as the loop is idle,
+    and drain is awaited before the next item after every write, so that a
+    slow reader holds back the items, however small the batches are.
+    '''
+    loop = get_running_loop()
+    batch = []
+    scheduled = None
+    written = False
+
+    def write_batch():
+        nonlocal scheduled, written
+        scheduled = None
+        if batch:
+            batch.append('')
+            write('\n'.join(batch))
+            batch.clear()
+            written = True
+
+    try:
+        async for item in items:
+            batch.append(encode(item))
+            if len(batch) >= batch_size:
+                write_batch()
+            elif scheduled is None:
+                scheduled = loop.call_soon(write_batch)
+
+            if written:
+                written = False
+                await drain()
+
+        write_batch()
+        await drain()
+    finally:
+        if scheduled is not None:
+            scheduled.cancel()
+        aclose = getattr(items, 'aclose', None)
+        if aclose is not None:
+            await aclose()
@@ -17,10 +17,15 @@
 
 from .autoparse import autoparse
 from .automain import automain
-try:
+
+
+def autoasync(coro, **kwargs):
+    '''
+    Defer importing autoasync (and with it, asyncio) until a command actually
+    asks for an event loop.
+    '''
     from .autoasync import autoasync
-except ImportError:  # pragma: no cover
-    pass
+    return autoasync(coro, **kwargs)
 
 
 def autocommand(
@@ -29,9 +34,19 @@ def autocommand(
         epilog=None,
         add_nos=False,
         parser=None,
+        lazy=False,
+        cache=None,
+        fast=False,
+        jobs=False,
+        chunk_size=None,
         loop=None,
         forever=False,
-        pass_loop=False):
+        pass_loop=False,
+        server=None,
+        idle_timeout=None,
+        stdout_buffer=None,
+        encoder=None,
+        loop_factory=None):
 
     if callable(module):
         raise TypeError('autocommand requires a module name argument')
@@ -42,12 +57,14 @@ def autocommand(
         # event that pass_loop is True, the `loop` parameter of the original
         # function will *not* be interpreted as a command-line argument by
         # autoparse
-        if loop is not None or forever or pass_loop:
+        if loop is not None or forever or pass_loop or loop_factory:
             func = autoasync(
                 func,
                 loop=None if loop is True else loop,
                 pass_loop=pass_loop,
-                forever=forever)
+                forever=forever,
+                encoder=encoder,
+                loop_factory=loop_factory)
 
         # Step 2: create parser. We do this second so that the arguments are
         # parsed and passed *before* entering the asyncio event loop, if it
@@ -59,11 +76,21 @@ def autocommand(
             description=description,
             epilog=epilog,
             add_nos=add_nos,
-            parser=parser)
+            parser=parser,
+            lazy=lazy,
+            cache=cache,
+            fast=fast,
+            jobs=jobs,
+            chunk_size=chunk_size)
 
         # Step 3: call the function automatically if __name__ == '__main__' (or
         # if True was provided)
-        func = automain(module)(func)
+        func = automain(
+            module,
+            server=server,
+            idle_timeout=idle_timeout,
+            stdout_buffer=stdout_buffer,
+            encoder=encoder)(func)
 
         return func
 
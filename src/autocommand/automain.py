@@ -23,7 +23,8 @@ class AutomainRequiresModuleError(AutocommandError, TypeError):
     pass
 
 
-def automain(module, *, args=(), kwargs=None):
+def automain(module, *, args=(), kwargs=None, server=None,
+             idle_timeout=None, stdout_buffer=None, encoder=None):
     '''
     This decorator automatically invokes a function if the module is being run
     as the "__main__" module. Optionally, provide args or kwargs with which to
@@ -40,6 +41,31 @@ def automain(module, *, args=(), kwargs=None):
 
     If __name__ is "__main__" here, the main function is called, and then
     sys.exit called with the return value.
+
+    If server is given, the first run starts a resident server in the
+    background, with the module already imported, and later runs of the
+    script have a forked child of the server run the function instead. Pass
+    True to name the server after the script, or a name to share between
+    scripts. The server exits after idle_timeout seconds (by default, 10
+    minutes) without being used. See autocommand.forkserver for details.
+
+    If the function returns a generator (that is, it's a generator function),
+    each item it yields is written to stdout, as a line of text, as soon as
+    it's produced; the generator's return value is the exit status. The items
+    are written in large batches, so a command can stream millions of
+    records with a few system calls, in constant memory. encoder sets how
+    each item is written: 'text' (the default) writes str(item), 'jsonl'
+    writes it as JSON, and 'tsv' writes a sequence of fields as
+    tab-separated values; it can also be a function that converts an item
+    to a line. See autocommand.output for details.
+
+    If stdout_buffer is given, sys.stdout is replaced, while the function
+    runs, by a stream with a buffer of that many bytes (or 1 MiB, if it's
+    True), which is flushed when the function returns (see smart_open). This
+    makes commands that print a lot of output much faster, since the output
+    is written in large chunks, rather than line by line. If the reader of
+    stdout goes away (as with `command | head`), the rest of the output is
+    discarded, and the exit status is 1.
     '''
 
     # Check that @automain(...) was called, rather than @automain
@@ -52,8 +78,91 @@ def automain(module, *, args=(), kwargs=None):
 
         # Use a function definition instead of a lambda for a neater traceback
         def automain_decorator(main):
+            main = _streaming_output(main, encoder)
+
+            if stdout_buffer:
+                main = _with_buffered_stdout(main, stdout_buffer)
+
+            if server:
+                from .forkserver import DEFAULT_IDLE_TIMEOUT, serve_or_run
+                sys.exit(serve_or_run(
+                    main, args, kwargs,
+                    name=None if server is True else server,
+                    idle_timeout=(
+                        DEFAULT_IDLE_TIMEOUT if idle_timeout is None
+                        else idle_timeout)))
+
             sys.exit(main(*args, **kwargs))
 
         return automain_decorator
     else:
         return lambda main: main
+
+
+def _streaming_output(main, encoder):
+    '''
+    Wrap main so that, if it returns a generator, the generator's items are
+    written to stdout, and its return value is returned instead.
+    '''
+    from functools import wraps
+    from types import GeneratorType
+
+    @wraps(main)
+    def streaming_main(*args, **kwargs):
+        result = main(*args, **kwargs)
+        if not isinstance(result, GeneratorType):
+            return result
+
+        from .output import write_items
+        try:
+            return write_items(result, encoder=encoder)
+        except BrokenPipeError:
+            _discard_stdout()
+            return 1
+
+    return streaming_main
+
+
+def _discard_stdout():
+    '''
+    Point the stdout file descriptor at /dev/null, after its reader has gone
+    away, so that Python doesn't report the broken pipe again when it flushes
+    stdout at exit.
+    '''
+    import os
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, 1)
+    os.close(devnull)
+
+
+def _with_buffered_stdout(main, buffer_size):
+    '''
+    Wrap main so that it's called with sys.stdout replaced by a stream with a
+    buffer of buffer_size bytes.
+    '''
+    from functools import wraps
+    from .smartopen import DEFAULT_BUFFER_SIZE, smart_open
+
+    if buffer_size is True:
+        buffer_size = DEFAULT_BUFFER_SIZE
+
+    @wraps(main)
+    def buffered_main(*args, **kwargs):
+        original = sys.stdout
+        replaced = False
+        try:
+            with smart_open(original, 'w', buffer_size=buffer_size) as stdout:
+                replaced = stdout is not original
+                sys.stdout = stdout
+                try:
+                    return main(*args, **kwargs)
+                finally:
+                    sys.stdout = original
+        except BrokenPipeError:
+            if not replaced:
+                raise
+
+            _discard_stdout()
+            return 1
+
+    return buffered_main
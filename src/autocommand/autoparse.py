@@ -16,16 +16,19 @@
 # along with autocommand.  If not, see <http://www.gnu.org/licenses/>.
 
 import sys
-from re import compile as compile_regex
-from inspect import signature, getdoc, Parameter
-from argparse import ArgumentParser
-from contextlib import contextmanager
-from functools import wraps
+from functools import update_wrapper
 from io import IOBase
+from types import GeneratorType
+from autocommand.argtypes import (
+    ArgStream, Array, File, sequence_element_type)
 from autocommand.errors import AutocommandError
+# smart_open used to be defined here, so it's still exported from here
+from autocommand.smartopen import smart_open  # noqa: F401
 
-
-_empty = Parameter.empty
+# argparse, inspect, and re are imported where they're used, rather than here.
+# They're only needed to build a parser, so a lazy autoparse function (in
+# particular, one called from a module generated by autocommand.compile) can
+# be created and run without importing them at all.
 
 
 class AnnotationError(AutocommandError):
@@ -46,6 +49,13 @@ class DocstringError(AutocommandError):
     '''Docstring error'''
 
 
+class JobsError(AutocommandError, TypeError):
+    '''
+    Jobs error: the jobs option requires a *args parameter, and can't be
+    combined with a custom parser
+    '''
+
+
 class TooManySplitsError(DocstringError):
     '''
     The docstring had too many ---- section splits. Currently we only support
@@ -60,7 +70,9 @@ def _get_type_description(annotation):
     If you provide an annotation that is somehow both a string and a callable,
     the behavior is undefined.
     '''
-    if annotation is _empty:
+    from inspect import Parameter
+
+    if annotation is Parameter.empty:
         return None, None
     elif callable(annotation):
         return annotation, None
@@ -80,20 +92,22 @@ def _get_type_description(annotation):
     raise AnnotationError(annotation)
 
 
-def _add_arguments(param, parser, used_char_args, add_nos):
+def _argument_specs(param, used_char_args, add_nos):
     '''
-    Add the argument(s) to an ArgumentParser (using add_argument) for a given
-    parameter. used_char_args is the set of -short options currently already in
-    use, and is updated (if necessary) by this function. If add_nos is True,
-    this will also add an inverse switch for all boolean options. For
-    instance, for the boolean parameter "verbose", this will create --verbose
-    and --no-verbose.
+    Generate the argument spec(s) for a given parameter. Each spec is a
+    (flags, arg_spec) pair, where flags is the list of positional arguments
+    and arg_spec is the dict of keyword arguments to pass to
+    ArgumentParser.add_argument. used_char_args is the set of -short options
+    currently already in use, and is updated (if necessary) by this function.
+    If add_nos is True, this will also generate an inverse switch for all
+    boolean options. For instance, for the boolean parameter "verbose", this
+    will create --verbose and --no-verbose.
     '''
 
-    # Impl note: This function is kept separate from make_parser because it's
-    # already very long and I wanted to separate out as much as possible into
-    # its own call scope, to prevent even the possibility of suble mutation
-    # bugs.
+    # Impl note: This function is kept separate from make_argument_specs
+    # because it's already very long and I wanted to separate out as much as
+    # possible into its own call scope, to prevent even the possibility of
+    # suble mutation bugs.
     if param.kind is param.POSITIONAL_ONLY:
         raise PositionalArgError(param)
     elif param.kind is param.VAR_KEYWORD:
@@ -111,20 +125,33 @@ def _add_arguments(param, parser, used_char_args, add_nos):
 
     # If there is no explicit type, and the default is present and not None,
     # infer the type from the default.
-    if arg_type is None and default not in {_empty, None}:
+    if arg_type is None and default not in {param.empty, None}:
         arg_type = type(default)
 
     # Add default. The presence of a default means this is an option, not an
     # argument.
-    if default is not _empty:
+    if default is not param.empty:
         arg_spec['default'] = default
         is_option = True
 
+    # list[int] and list[float] are collected into arrays, and other lists
+    # just collect arguments of their element type.
+    element_type = sequence_element_type(arg_type)
+    if element_type is not None:
+        if param.kind is param.VAR_POSITIONAL:
+            raise AnnotationError(param.annotation)
+        arg_type = None
+        arg_spec['nargs'] = '*'
+        if element_type in (int, float):
+            arg_spec['action'] = Array.of(element_type).action()
+        elif element_type is not str:
+            arg_spec['type'] = element_type
+
     # Add the type
     if arg_type is not None:
         # Special case for bool: make it just a --switch
         if arg_type is bool:
-            if not default or default is _empty:
+            if not default or default is param.empty:
                 arg_spec['action'] = 'store_true'
             else:
                 arg_spec['action'] = 'store_false'
@@ -132,16 +159,26 @@ def _add_arguments(param, parser, used_char_args, add_nos):
             # Switches are always options
             is_option = True
 
+        # Special case for ArgStream and Array: collect any number of
+        # arguments into a single lazy stream or array. *args can't be one of
+        # these, because the function would get the arguments as a tuple
+        # anyway.
+        elif isinstance(arg_type, type) and issubclass(
+                arg_type, (ArgStream, Array)):
+            if param.kind is param.VAR_POSITIONAL:
+                raise AnnotationError(param.annotation)
+            arg_spec['nargs'] = '*'
+            arg_spec['action'] = arg_type.action()
+
+        # Special case for File: convert the filename to a lazily opened
+        # File, even if the default is an already open file object.
+        elif isinstance(arg_type, type) and issubclass(arg_type, File):
+            arg_spec['type'] = arg_type
+
         # Special case for file types: make it a string type, for filename
         elif isinstance(default, IOBase):
             arg_spec['type'] = str
 
-        # TODO: special case for list type.
-        #   - How to specificy type of list members?
-        #       - param: [int]
-        #       - param: int =[]
-        #   - action='append' vs nargs='*'
-
         else:
             arg_spec['type'] = arg_type
 
@@ -177,23 +214,21 @@ def _add_arguments(param, parser, used_char_args, add_nos):
     else:
         flags.append(name)
 
-    parser.add_argument(*flags, **arg_spec)
+    yield flags, arg_spec
 
     # Create the --no- version for boolean switches
     if add_nos and arg_type is bool:
-        parser.add_argument(
-            '--no-{}'.format(name),
-            action='store_const',
-            dest=name,
-            const=default if default is not _empty else False)
+        yield ['--no-{}'.format(name)], {
+            'action': 'store_const',
+            'dest': name,
+            'const': default if default is not param.empty else False}
 
 
-def make_parser(func_sig, description, epilog, add_nos):
+def make_argument_specs(func_sig, add_nos):
     '''
-    Given the signature of a function, create an ArgumentParser
+    Given the signature of a function, create the list of argument specs for
+    its ArgumentParser, as (flags, arg_spec) pairs.
     '''
-    parser = ArgumentParser(description=description, epilog=epilog)
-
     used_char_args = {'h'}
 
     # Arange the params so that single-character arguments are first. This
@@ -203,13 +238,38 @@ def make_parser(func_sig, description, epilog, add_nos):
         func_sig.parameters.values(),
         key=lambda param: len(param.name) > 1)
 
-    for param in params:
-        _add_arguments(param, parser, used_char_args, add_nos)
+    return [
+        spec
+        for param in params
+        for spec in _argument_specs(param, used_char_args, add_nos)]
+
+
+def make_parser_from_specs(specs, description, epilog):
+    '''
+    Create an ArgumentParser from a list of argument specs, as returned by
+    make_argument_specs
+    '''
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser(description=description, epilog=epilog)
+
+    for flags, arg_spec in specs:
+        parser.add_argument(*flags, **arg_spec)
 
     return parser
 
 
-_DOCSTRING_SPLIT = compile_regex(r'\n\s*-{4,}\s*\n')
+def make_parser(func_sig, description, epilog, add_nos):
+    '''
+    Given the signature of a function, create an ArgumentParser
+    '''
+    return make_parser_from_specs(
+        make_argument_specs(func_sig, add_nos),
+        description,
+        epilog)
+
+
+_DOCSTRING_SPLIT = r'\n\s*-{4,}\s*\n'
 
 
 def parse_docstring(docstring):
@@ -219,7 +279,9 @@ def parse_docstring(docstring):
     if docstring is None:
         return '', ''
 
-    parts = _DOCSTRING_SPLIT.split(docstring)
+    from re import split
+
+    parts = split(_DOCSTRING_SPLIT, docstring)
 
     if len(parts) == 1:
         return docstring, ''
@@ -229,12 +291,531 @@ def parse_docstring(docstring):
         raise TooManySplitsError()
 
 
+def _conversion_errors():
+    '''
+    Get the exception types that argparse treats as a failed type conversion.
+    A type can only raise ArgumentTypeError if argparse has been imported, so
+    this doesn't import it.
+    '''
+    argparse = sys.modules.get('argparse')
+    if argparse is None:
+        return TypeError, ValueError
+    return argparse.ArgumentTypeError, TypeError, ValueError
+
+
+class _FastParser:
+    '''
+    A fast matcher for the simple argument lists that make_argument_specs
+    generates: positional arguments, an optional trailing *args, typed
+    --options, and boolean switches (including --no- switches). Flags are
+    looked up in a dict and converted directly, without going through
+    argparse.
+
+    The parse method only handles argument lists that it can parse exactly as
+    the equivalent ArgumentParser would. For anything else- --help, parse
+    errors, abbreviated or combined flags, `--`, and so on- it returns None,
+    and the caller should fall back to the real parser, which will produce the
+    correct result or error message.
+    '''
+
+    # Option kinds
+    _STORE = 'store'
+    _CONST = 'const'
+
+    @classmethod
+    def from_specs(cls, specs):
+        '''
+        Create a _FastParser from a list of argument specs, or return None if
+        any of the specs use a feature that the fast parser doesn't support.
+        '''
+        positionals = []
+        varargs = None
+        options = {}
+        defaults = {}
+
+        for flags, arg_spec in specs:
+            arg_spec = dict(arg_spec)
+            arg_type = arg_spec.pop('type', None)
+            # These only affect the help text
+            arg_spec.pop('help', None)
+            arg_spec.pop('metavar', None)
+
+            if not flags[0].startswith('-'):
+                # Positionals after *args are allowed by argparse, but the way
+                # it splits values between them isn't worth emulating.
+                nargs = arg_spec.pop('nargs', None)
+
+                # Actions that collect all the values at once (from
+                # autocommand.argtypes) expose the function that does it.
+                action = arg_spec.pop('action', None)
+                collect = getattr(action, 'collect', None)
+                if action is not None and (collect is None or nargs != '*'):
+                    return None
+
+                if arg_spec or varargs is not None:
+                    return None
+                elif nargs is None:
+                    positionals.append((flags[0], arg_type))
+                elif nargs == '*':
+                    varargs = (flags[0], arg_type, collect)
+                else:
+                    return None
+                continue
+
+            dest = arg_spec.pop('dest')
+            action = arg_spec.pop('action', 'store')
+            has_default = 'default' in arg_spec
+            default = arg_spec.pop('default', None)
+
+            if action == 'store':
+                option = (dest, cls._STORE, arg_type)
+            elif action == 'store_true':
+                option = (dest, cls._CONST, True)
+                if not has_default:
+                    default = False
+            elif action == 'store_false':
+                option = (dest, cls._CONST, False)
+                if not has_default:
+                    default = True
+            elif action == 'store_const':
+                option = (dest, cls._CONST, arg_spec.pop('const'))
+            else:
+                return None
+
+            if arg_spec or (arg_type is not None and action != 'store'):
+                return None
+
+            for flag in flags:
+                options[flag] = option
+
+            # As with argparse, the first action for a dest sets its default.
+            if dest not in defaults:
+                defaults[dest] = (default, arg_type)
+
+        return cls(positionals, varargs, options, defaults)
+
+    def __init__(self, positionals, varargs, options, defaults):
+        self._positionals = positionals
+        self._varargs = varargs
+        self._options = options
+        self._defaults = defaults
+
+    def parse(self, argv):
+        '''
+        Parse argv into a dict of {dest: value}, or return None if argv needs
+        to be handled by the full ArgumentParser.
+        '''
+        store = self._STORE
+        options = self._options
+        values = {}
+        positional_args = []
+        positional_runs = 0
+        in_run = False
+
+        # If none of the arguments start with '-' (as with a long list of
+        # trailing arguments), they're all positional. That can be checked in
+        # bulk, rather than one argument at a time.
+        argv = list(argv)
+        if '\0-' not in '\0' + '\0'.join(argv):
+            positional_args = argv
+            positional_runs = 1 if argv else 0
+            argv = ()
+
+        argv = iter(argv)
+        for arg in argv:
+            # argparse treats a lone '-' as a positional argument
+            if arg[:1] != '-' or arg == '-':
+                if not in_run:
+                    positional_runs += 1
+                    in_run = True
+                positional_args.append(arg)
+                continue
+
+            in_run = False
+            option = options.get(arg)
+            explicit_value = None
+
+            if option is None:
+                if not arg.startswith('--') or '=' not in arg:
+                    return None
+                flag, explicit_value = arg.split('=', 1)
+                option = options.get(flag)
+                if option is None or option[1] is not store:
+                    return None
+
+            dest, kind, arg_type = option
+
+            if kind is store:
+                if explicit_value is None:
+                    explicit_value = next(argv, None)
+                    if explicit_value is None or (
+                            explicit_value[:1] == '-' and
+                            explicit_value != '-'):
+                        return None
+                try:
+                    values[dest] = (
+                        explicit_value if arg_type is None
+                        else arg_type(explicit_value))
+                except _conversion_errors():
+                    return None
+            else:
+                # For switches, the "type" slot holds the stored constant
+                values[dest] = arg_type
+
+        positional_count = len(self._positionals)
+        if len(positional_args) < positional_count:
+            return None
+
+        for (dest, arg_type), arg in zip(self._positionals, positional_args):
+            try:
+                values[dest] = arg if arg_type is None else arg_type(arg)
+            except _conversion_errors():
+                return None
+
+        extra_args = positional_args[positional_count:]
+        if self._varargs is None:
+            if extra_args:
+                return None
+        else:
+            # argparse can't match *args across more than one group of
+            # positional arguments, so let it report that error.
+            if positional_runs > 1:
+                return None
+
+            dest, arg_type, collect = self._varargs
+            try:
+                if collect is not None:
+                    values[dest] = collect(extra_args)
+                elif arg_type is None:
+                    values[dest] = extra_args
+                else:
+                    values[dest] = [arg_type(arg) for arg in extra_args]
+            except _conversion_errors():
+                return None
+
+        for dest, (default, arg_type) in self._defaults.items():
+            if dest not in values:
+                # argparse applies the type to string defaults
+                if isinstance(default, str) and arg_type is not None:
+                    try:
+                        default = arg_type(default)
+                    except _conversion_errors():
+                        return None
+                values[dest] = default
+
+        return values
+
+
+def _call_layout(func_sig):
+    '''
+    Given the signature of a function, return the names of its positional
+    parameters, its *args parameter (or None), and its keyword-only
+    parameters. This is used to call the function directly from a complete
+    dict of parsed arguments.
+    '''
+    params = func_sig.parameters.values()
+    return (
+        [param.name for param in params
+         if param.kind is param.POSITIONAL_OR_KEYWORD],
+        next((param.name for param in params
+              if param.kind is param.VAR_POSITIONAL), None),
+        [param.name for param in params if param.kind is param.KEYWORD_ONLY])
+
+
+class _AutoparseWrapper:
+    '''
+    The callable returned by autoparse. It holds the decorated function along
+    with everything needed to build its parser. The function signature,
+    docstring, and argument specs are computed by `_build`, and the parser is
+    then created from the specs. This is either done immediately or, in lazy
+    mode, deferred until the wrapper is first called or its `parser` attribute
+    is first accessed.
+    '''
+    def __init__(
+            self, func, description, epilog, add_nos, parser, lazy, cache,
+            fast, jobs, chunk_size):
+        # TODO: attach an updated __signature__ to the wrapper, just in case.
+        update_wrapper(self, func)
+        self.func = func
+        self._description = description
+        self._epilog = epilog
+        self._add_nos = add_nos
+        self._parser = parser
+        self._cache = cache
+        self._fast = fast
+        self._jobs = jobs
+        self._chunk_size = chunk_size
+        self._signature = None
+        self._specs = None
+        self._fast_parser = None
+        self._call_layout = None
+        self._prog = None
+        self._built = False
+
+        # Build everything now, so that errors are raised at decoration time
+        if not lazy:
+            self.parser
+
+    @property
+    def _func_sig(self):
+        # This is only inspected when it's needed, since a warm spec cache
+        # makes it unnecessary to import inspect at all.
+        if self._signature is None:
+            from inspect import signature
+            self._signature = signature(self.func)
+        return self._signature
+
+    def _build(self):
+        if self._built:
+            return
+
+        if self._parser is not None:
+            if self._jobs:
+                raise JobsError('jobs can\'t be used with a custom parser')
+            self._func_sig
+        else:
+            specs, description, epilog, call_layout = (
+                self._cached_specs() if self._cache else self._make_specs())
+
+            if self._jobs and call_layout[1] is None:
+                raise JobsError('jobs requires a *args parameter')
+
+            self._description = self._description or description
+            self._epilog = self._epilog or epilog
+            self._call_layout = call_layout
+            self._specs = specs
+
+            # The --jobs option isn't part of the function's signature, so
+            # it's added after the specs are (possibly) cached.
+            if self._jobs:
+                from autocommand.jobs import jobs_spec
+                self._specs = self._specs + [jobs_spec({
+                    flag for flags, _ in self._specs for flag in flags})]
+
+            if self._fast:
+                self._fast_parser = _FastParser.from_specs(self._specs)
+
+        # Only set this once everything is built, so that an error raised
+        # while building is raised again on the next attempt.
+        self._built = True
+
+    def _make_specs(self):
+        '''
+        Inspect the function's signature and docstring, and create its
+        argument specs. Returns the specs, the description and epilog from
+        the docstring, and the call layout.
+        '''
+        from inspect import getdoc
+
+        func_sig = self._func_sig
+        description, epilog = parse_docstring(getdoc(self.func))
+
+        return (
+            make_argument_specs(func_sig, self._add_nos),
+            description, epilog, _call_layout(func_sig))
+
+    def _cached_specs(self):
+        from autocommand import speccache
+
+        cache_dir = (
+            speccache.default_cache_dir() if self._cache is True
+            else self._cache)
+
+        cached = speccache.load_specs(cache_dir, self.func, self._add_nos)
+        if cached is not None:
+            return cached
+
+        built = self._make_specs()
+        speccache.store_specs(cache_dir, self.func, self._add_nos, *built)
+        return built
+
+    @property
+    def parser(self):
+        self._build()
+
+        if self._parser is None:
+            self._parser = make_parser_from_specs(
+                self._specs, self._description, self._epilog)
+            if self._prog is not None:
+                self._parser.prog = self._prog
+
+        return self._parser
+
+    @property
+    def prog(self):
+        '''
+        The program name shown in usage and error messages. Setting it doesn't
+        build the parser, if it hasn't been built yet; it's applied when the
+        parser is built.
+        '''
+        return self._prog if self._parser is None else self._parser.prog
+
+    @prog.setter
+    def prog(self, prog):
+        self._prog = prog
+        if self._parser is not None:
+            self._parser.prog = prog
+
+    def __reduce__(self):
+        # Pickle by reference, so that autoparse functions can be sent to
+        # other processes (for instance, by batch). The module attribute with
+        # the function's name is the wrapper itself, not the function.
+        from autocommand.group import resolve_target
+        return resolve_target, ('{}:{}'.format(
+            self.__module__, self.__qualname__),)
+
+    def batch(
+            self, source=None, *,
+            delimiter='\n',
+            workers=None,
+            processes=False):
+        '''
+        Run the function once for each record in source, parsing each record
+        as a separate command line, in this process. This avoids paying for
+        interpreter startup and imports for each invocation.
+
+        source is a filename, a text file object, or an iterable of strings,
+        and defaults to sys.stdin. Records are separated by delimiter (for
+        instance, '\0' for NUL-delimited input), and each record is split
+        into arguments with shlex.split; blank records are skipped.
+
+        By default, the records are run one by one. If workers is given, they
+        are run concurrently in a pool of that many threads or, if processes
+        is True, processes; in that case, the function must be importable by
+        name, and its arguments, return values, and exceptions must be
+        picklable.
+
+        Returns a list of autocommand.batch.BatchResult, one per record, with
+        the exit code, return value, and exception of each run. sys.exit is
+        never called, and a failed record doesn't stop the batch.
+        '''
+        from autocommand.batch import run_batch
+        return run_batch(
+            self, source,
+            delimiter=delimiter, workers=workers, processes=processes)
+
+    def __call__(self, argv=None):
+        self._build()
+
+        if argv is None:
+            argv = sys.argv[1:]
+
+        if self._fast_parser is not None:
+            parsed = self._fast_parser.parse(argv)
+            if parsed is not None:
+                # The fast parser always produces a value for every
+                # parameter, so we can skip the signature binding.
+                positional_names, varargs_name, keyword_names = (
+                    self._call_layout)
+                args = [parsed[name] for name in positional_names]
+                if varargs_name is not None:
+                    args.extend(parsed[varargs_name])
+
+                return self._call(args, {
+                    name: parsed[name] for name in keyword_names}, parsed)
+
+        # Get empty argument binding, to fill with parsed arguments. This
+        # object does all the heavy lifting of turning named arguments into
+        # into correctly bound *args and **kwargs.
+        parsed = vars(self.parser.parse_args(argv))
+        parsed_args = self._func_sig.bind_partial()
+        parsed_args.arguments.update(parsed)
+
+        return self._call(parsed_args.args, parsed_args.kwargs, parsed)
+
+    def _call(self, args, kwargs, parsed):
+        # Files from File parameters are closed when the function returns
+        files = _file_arguments(parsed.values())
+        if not files:
+            return self._call_func(args, kwargs, parsed)
+
+        return _closing_files(files, self._call_func, args, kwargs, parsed)
+
+    def _call_func(self, args, kwargs, parsed):
+        if self._jobs:
+            from autocommand.jobs import JOBS_DEST, run_jobs
+
+            jobs = parsed[JOBS_DEST]
+            if jobs > 1:
+                return run_jobs(
+                    self, args, kwargs, len(self._call_layout[0]), jobs,
+                    self._chunk_size)
+
+        return self.func(*args, **kwargs)
+
+
+def _file_arguments(values):
+    '''
+    Get the Files among the parsed argument values, including the ones
+    collected in lists by *args or nargs parameters.
+    '''
+    files = []
+    for value in values:
+        if isinstance(value, File):
+            files.append(value)
+        # All the values in a list have the same type, so only the first one
+        # needs to be checked.
+        elif (isinstance(value, (list, tuple)) and value and
+                isinstance(value[0], File)):
+            files.extend(item for item in value if isinstance(item, File))
+
+    return files
+
+
+def _closing_files(files, func, *args, **kwargs):
+    '''
+    Call func, and close files when it returns. If it returns a generator (so
+    it's a generator function, which hasn't run yet), the files are closed
+    when the generator finishes instead.
+    '''
+    try:
+        result = func(*args, **kwargs)
+    except BaseException:
+        _close_files(files)
+        raise
+
+    if isinstance(result, GeneratorType):
+        return _close_files_after(result, files)
+
+    _close_files(files)
+    return result
+
+
+def _close_files_after(generator, files):
+    try:
+        return (yield from generator)
+    finally:
+        _close_files(files)
+
+
+def _close_files(files):
+    '''
+    Close all of the files, even if closing one of them fails. The first
+    error is raised after they're all closed.
+    '''
+    error = None
+    for file in files:
+        try:
+            file.close()
+        except Exception as e:
+            if error is None:
+                error = e
+
+    if error is not None:
+        raise error
+
+
 def autoparse(
         func=None, *,
         description=None,
         epilog=None,
         add_nos=False,
-        parser=None):
+        parser=None,
+        lazy=False,
+        cache=None,
+        fast=False,
+        jobs=False,
+        chunk_size=None):
     '''
     This decorator converts a function that takes normal arguments into a
     function which takes a single optional argument, argv, parses it using an
@@ -264,6 +845,48 @@ def autoparse(
     used to parse the argv argument. The parser's results' argument names must
     match up with the parameter names of the decorated function.
 
+    If lazy is True, the function signature isn't inspected and the parser
+    isn't created until the decorated function is first called, or its `parser`
+    attribute is first accessed; the parser is then reused for every later
+    call. This makes decorating a function nearly free, which helps the import
+    time of modules that define many commands, at the cost of reporting
+    signature and docstring errors at the first call rather than at decoration
+    time.
+
+    If cache is given, the generated argument specs (flags, types, defaults,
+    help text, and so on) are stored in an on-disk cache, so that later runs of
+    the same program can skip inspecting the function's signature. Pass True
+    to use the default cache directory ($XDG_CACHE_HOME/autocommand), or a
+    path to use a specific directory. Cached specs are keyed by the function's
+    qualified name and a checksum of its parameters and docstring, so they are
+    automatically invalidated when either changes. Specs that can't be
+    reliably restored, such as ones with lambda types, are never cached. The
+    cache has no effect if a custom parser is given.
+
+    If fast is True, argument lists are first matched by a lightweight parser
+    built from the same argument specs, which looks up flags in a dict and
+    converts values directly. It handles positional arguments, *args, typed
+    --options given as `--option value` or `--option=value`, and switches;
+    anything else (--help, errors, abbreviated or combined flags, and so on)
+    falls back to the full ArgumentParser, so the results are always the
+    same. This makes each call much cheaper for programs that call the
+    decorated function many times in-process. In lazy mode, the ArgumentParser
+    itself isn't built until the first fallback.
+
+    If jobs is True, the function must have a *args parameter, and a --jobs N
+    option is added to its parser (along with -j, if it isn't already used).
+    When N is more than 1, the trailing arguments are split into chunks, and
+    the function is called once per chunk in a pool of N worker processes
+    (or threads, on free-threaded builds of Python), with the same values for
+    all the other parameters; --jobs 0 uses one worker per CPU. The chunks
+    are sized to give each worker about 4 of them, unless chunk_size is given.
+    The return value is the first one that's a failed exit status (in the
+    sense of sys.exit), or else the first one. With processes, the
+    arguments and return value must be picklable. The workers are forked
+    where possible, so they inherit the function; when they can't be (on
+    platforms without fork, or when the process has other threads running),
+    the function must also be importable by name.
+
     The decorated function is attached to the result as the `func` attribute,
     and the parser is attached as the `parser` attribute.
     '''
@@ -274,60 +897,21 @@ def autoparse(
             f, description=description,
             epilog=epilog,
             add_nos=add_nos,
-            parser=parser)
-
-    func_sig = signature(func)
-
-    docstr_description, docstr_epilog = parse_docstring(getdoc(func))
-
-    if parser is None:
-        parser = make_parser(
-            func_sig,
-            description or docstr_description,
-            epilog or docstr_epilog,
-            add_nos)
-
-    @wraps(func)
-    def autoparse_wrapper(argv=None):
-        if argv is None:
-            argv = sys.argv[1:]
-
-        # Get empty argument binding, to fill with parsed arguments. This
-        # object does all the heavy lifting of turning named arguments into
-        # into correctly bound *args and **kwargs.
-        parsed_args = func_sig.bind_partial()
-        parsed_args.arguments.update(vars(parser.parse_args(argv)))
-
-        return func(*parsed_args.args, **parsed_args.kwargs)
-
-    # TODO: attach an updated __signature__ to autoparse_wrapper, just in case.
-
-    # Attach the wrapped function and parser, and return the wrapper.
-    autoparse_wrapper.func = func
-    autoparse_wrapper.parser = parser
-    return autoparse_wrapper
-
-
-@contextmanager
-def smart_open(filename_or_file, *args, **kwargs):
-    '''
-    This context manager allows you to open a filename, if you want to default
-    some already-existing file object, like sys.stdout, which shouldn't be
-    closed at the end of the context. If the filename argument is a str, bytes,
-    or int, the file object is created via a call to open with the given *args
-    and **kwargs, sent to the context, and closed at the end of the context,
-    just like "with open(filename) as f:". If it isn't one of the openable
-    types, the object simply sent to the context unchanged, and left unclosed
-    at the end of the context. Example:
-
-        def work_with_file(name=sys.stdout):
-            with smart_open(name) as f:
-                # Works correctly if name is a str filename or sys.stdout
-                print("Some stuff", file=f)
-                # If it was a filename, f is closed at the end here.
-    '''
-    if isinstance(filename_or_file, (str, bytes, int)):
-        with open(filename_or_file, *args, **kwargs) as file:
-            yield file
-    else:
-        yield filename_or_file
+            parser=parser,
+            lazy=lazy,
+            cache=cache,
+            fast=fast,
+            jobs=jobs,
+            chunk_size=chunk_size)
+
+    return _AutoparseWrapper(
+        func,
+        description=description,
+        epilog=epilog,
+        add_nos=add_nos,
+        parser=parser,
+        lazy=lazy,
+        cache=cache,
+        fast=fast,
+        jobs=jobs,
+        chunk_size=chunk_size)
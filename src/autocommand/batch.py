@@ -0,0 +1,155 @@
+# Copyright 2014-2016 Nathan West
+#
+# This file is part of autocommand.
+#
+# autocommand is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# autocommand is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with autocommand.  If not, see <http://www.gnu.org/licenses/>.
+
+'''
+Run an autoparse function many times in one process, with a different argv
+for each run. This is the implementation of the `batch` method of autoparse
+functions.
+'''
+
+import sys
+from collections import namedtuple
+from functools import partial
+from itertools import repeat
+from shlex import split
+from autocommand.smartopen import smart_open
+
+
+BatchResult = namedtuple('BatchResult', 'index argv exit_code result error')
+BatchResult.__doc__ = '''
+The outcome of one record of a batch. index is the position of the record in
+the input (counting blank records), and argv is the record split into
+arguments, or None if it couldn't be split. exit_code is the exit status that
+the command would have had if it was run on its own: it's derived from the
+return value of the function, or from the SystemExit it raised, with the same
+rules as sys.exit. result is the return value, and error is the exception
+raised, if any.
+'''
+
+
+def exit_code(value):
+    '''
+    Get the exit status that sys.exit(value) would cause: 0 for None, the
+    value itself for integers, and 1 for anything else.
+    '''
+    if value is None:
+        return 0
+    elif isinstance(value, int):
+        return value
+    else:
+        return 1
+
+
+def read_records(file, delimiter='\n', chunk_size=1 << 16):
+    '''
+    Read the delimited records from a text file, as an iterator of strings.
+    The final record doesn't need to be terminated by the delimiter. For
+    delimiters other than newlines, the file is read in chunks of chunk_size.
+    '''
+    if delimiter == '\n':
+        for line in file:
+            yield line[:-1] if line.endswith('\n') else line
+        return
+
+    pending = ''
+    for chunk in iter(partial(file.read, chunk_size), ''):
+        pending += chunk
+        records = pending.split(delimiter)
+        pending = records.pop()
+        yield from records
+
+    if pending:
+        yield pending
+
+
+def _run_record(command, record):
+    '''
+    Run the command for a single record. Returns the argv, exit code, return
+    value, and exception for the record.
+    '''
+    try:
+        argv = split(record)
+    except ValueError as e:
+        return None, 2, None, e
+
+    try:
+        result = command(argv)
+    except SystemExit as e:
+        return argv, exit_code(e.code), None, e
+    except Exception as e:
+        return argv, 1, None, e
+    else:
+        return argv, exit_code(result), result, None
+
+
+def run_batch(
+        command, source=None, *,
+        delimiter='\n',
+        workers=None,
+        processes=False):
+    '''
+    Run an autoparse function once for each record read from source, which is
+    a filename, a text file object, or an iterable of strings; it defaults to
+    sys.stdin. See the `batch` method of autoparse functions for details.
+    Returns a list of BatchResults, in the order of the records.
+    '''
+    if source is None:
+        source = sys.stdin
+
+    if isinstance(source, (str, bytes)) or hasattr(source, 'read'):
+        with smart_open(source) as file:
+            records = list(read_records(file, delimiter))
+    else:
+        records = list(source)
+
+    # Blank records are skipped, but still counted in the indexes
+    indexes = [index for index, record in enumerate(records) if record.strip()]
+    records = [records[index] for index in indexes]
+
+    # Build the parser once, up front, rather than racing to build it in each
+    # worker thread.
+    command.parser
+
+    if workers is None:
+        outcomes = map(_run_record, repeat(command), records)
+        return _collect(indexes, outcomes)
+
+    if processes:
+        from concurrent.futures import ProcessPoolExecutor
+        from autocommand.jobs import _worker_context
+
+        # Don't fork the workers if there are other threads
+        context, _ = _worker_context()
+        executor = ProcessPoolExecutor(workers, mp_context=context)
+    else:
+        from concurrent.futures import ThreadPoolExecutor
+        executor = ThreadPoolExecutor(workers)
+
+    # Each record takes a round trip to a worker process, so send them in
+    # chunks, a few per worker.
+    chunksize = max(1, len(records) // (workers * 4))
+
+    with executor:
+        outcomes = executor.map(
+            _run_record, repeat(command), records, chunksize=chunksize)
+        return _collect(indexes, outcomes)
+
+
+def _collect(indexes, outcomes):
+    return [
+        BatchResult(index, *outcome)
+        for index, outcome in zip(indexes, outcomes)]
@@ -0,0 +1,409 @@
+# Copyright 2014-2016 Nathan West
+#
+# This file is part of autocommand.
+#
+# autocommand is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# autocommand is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with autocommand.  If not, see <http://www.gnu.org/licenses/>.
+
+'''
+Ahead-of-time compilation of autoparse functions. Given a "module:function"
+target, this generates a standalone Python module with a `main` entry point
+that parses the command line with straight-line code, specialized for that
+function's arguments, and calls the function directly.
+
+The generated module only falls back to the function's real ArgumentParser
+for --help, usage errors, and the argument forms the fast parser doesn't
+handle (see autoparse's `fast` option), so if the target is decorated with
+`lazy=True`, a typical run imports neither argparse nor inspect.
+
+The generated module embeds a description of the function's parameters (the
+same one the spec cache uses), and refuses to run if they have changed since
+it was generated. Usage:
+
+    python -m autocommand.compile mypackage.cli:main -o mypackage/_cli.py
+'''
+
+import math
+from autocommand.autocommand import autocommand
+from autocommand.argtypes import File
+from autocommand.autoparse import _AutoparseWrapper, _FastParser, _call_layout
+from autocommand.errors import AutocommandError
+from autocommand.group import resolve_target
+from autocommand.speccache import (
+    _type_reference, _UncacheableSpecError, parameters_key)
+
+
+class CompileError(AutocommandError, ValueError):
+    '''Compile error: the target can't be compiled to a standalone parser'''
+
+
+def _is_literal(value):
+    '''
+    Check if value can be written into the generated module as its repr
+    '''
+    if isinstance(value, float):
+        return math.isfinite(value)
+    elif isinstance(value, tuple):
+        return all(map(_is_literal, value))
+    return value is None or isinstance(value, (bool, int, str, bytes))
+
+
+class _ModuleWriter:
+    '''
+    Accumulates the lines of the generated module, along with the imports
+    needed by the type references in it.
+    '''
+    def __init__(self):
+        self.imports = []
+        self.lines = []
+        self._names = {}
+
+    def line(self, indent, text):
+        self.lines.append('    ' * indent + text if text else '')
+
+    def reference(self, obj):
+        '''
+        Get an expression that evaluates to obj in the generated module, by
+        importing it from where it's defined.
+        '''
+        if getattr(obj, '__module__', None) == 'builtins':
+            return obj.__qualname__
+
+        try:
+            reference = _type_reference(obj)
+        except _UncacheableSpecError as e:
+            raise CompileError(
+                'type {!r} must be importable by its qualified name'.format(
+                    obj)) from e
+
+        name = self._names.get(reference)
+        if name is None:
+            name = self._names[reference] = '_type_{}'.format(len(self._names))
+            module, qualname = reference.split(':', 1)
+            if '.' in qualname:
+                self.imports.append('import {} as {}_module'.format(
+                    module, name))
+                self.imports.append('{} = {}_module.{}'.format(
+                    name, name, qualname))
+            else:
+                self.imports.append('from {} import {} as {}'.format(
+                    module, qualname, name))
+        return name
+
+    def convert(self, arg_type, value):
+        '''Get an expression applying an (optional) argument type to value'''
+        if arg_type is None or arg_type is str:
+            return value
+        return '{}({})'.format(self.reference(arg_type), value)
+
+
+def _value_expression(value, dest):
+    if _is_literal(value):
+        return repr(value)
+    # Anything else is the default of a parameter, which is retrieved from the
+    # function at runtime
+    return '_defaults[{!r}]'.format(dest)
+
+
+def _has_files(parser):
+    '''
+    Check if any of a _FastParser's arguments are Files, which have to be
+    closed after the function is called
+    '''
+    arg_types = [arg_type for _, arg_type in parser._positionals]
+    arg_types.extend(
+        arg_type for _, kind, arg_type in parser._options.values()
+        if kind is parser._STORE)
+    if parser._varargs is not None:
+        arg_types.append(parser._varargs[1])
+
+    return any(
+        isinstance(arg_type, type) and issubclass(arg_type, File)
+        for arg_type in arg_types)
+
+
+def _write_parse(writer, parser, layout):
+    '''Write the _parse function, specialized for a _FastParser's arguments'''
+    line = writer.line
+    positionals = parser._positionals
+    varargs = parser._varargs
+
+    line(0, 'def _parse(argv):')
+    line(1, "'''")
+    line(1, 'Parse argv into the positional and keyword arguments for the')
+    line(1, 'function, or return None if argv needs the full ArgumentParser')
+    line(1, "'''")
+
+    # Initialize each option to its default. String defaults are converted
+    # by the argument type, but only if the option isn't given.
+    converted_defaults = {}
+    for dest, (default, arg_type) in parser._defaults.items():
+        if isinstance(default, str) and arg_type not in (None, str):
+            converted_defaults[dest] = writer.convert(arg_type, repr(default))
+            line(1, 'v_{} = _UNSET'.format(dest))
+        else:
+            line(1, 'v_{} = {}'.format(dest, _value_expression(default, dest)))
+
+    line(1, 'positional = []')
+    if varargs is not None:
+        line(1, 'runs = 0')
+        line(1, 'in_run = False')
+    line(1, 'args = iter(argv)')
+    line(1, 'for arg in args:')
+    line(2, "# argparse treats a lone '-' as a positional argument")
+    line(2, "if arg[:1] != '-' or arg == '-':")
+    if varargs is not None:
+        line(3, 'if not in_run:')
+        line(4, 'runs += 1')
+        line(4, 'in_run = True')
+    line(3, 'positional.append(arg)')
+    line(3, 'continue')
+    if varargs is not None:
+        line(2, 'in_run = False')
+
+    # Group the flags by option, in the order they were declared
+    options = []
+    for flag, option in parser._options.items():
+        if options and options[-1][1] is option:
+            options[-1][0].append(flag)
+        else:
+            options.append(([flag], option))
+
+    keyword = 'if'
+    for flags, (dest, kind, arg_type) in options:
+        line(2, '{} arg in {!r}:'.format(keyword, tuple(flags)))
+        if kind is parser._STORE:
+            line(3, 'value = next(args, None)')
+            line(3, "if value is None or value[:1] == '-' and value != '-':")
+            line(4, 'return None')
+            _write_store(writer, 3, dest, arg_type)
+        else:
+            # For switches, the "type" slot holds the stored constant
+            line(3, 'v_{} = {}'.format(
+                dest, _value_expression(arg_type, dest)))
+        keyword = 'elif'
+
+    long_options = [
+        (flags, option) for flags, option in options
+        if option[1] is parser._STORE and
+        any(flag.startswith('--') for flag in flags)]
+    if long_options:
+        line(2, "{} arg[:2] == '--' and '=' in arg:".format(keyword))
+        line(3, "flag, value = arg.split('=', 1)")
+        keyword = 'if'
+        for flags, (dest, _, arg_type) in long_options:
+            long_flags = tuple(flag for flag in flags if flag.startswith('--'))
+            line(3, '{} flag in {!r}:'.format(keyword, long_flags))
+            _write_store(writer, 4, dest, arg_type)
+            keyword = 'elif'
+        line(3, 'else:')
+        line(4, 'return None')
+        keyword = 'elif'
+
+    if options:
+        line(2, 'else:')
+        line(3, 'return None')
+    else:
+        line(2, 'return None')
+
+    line(0, '')
+    if varargs is None:
+        line(1, 'if len(positional) != {}:'.format(len(positionals)))
+        line(2, 'return None')
+    else:
+        line(1, 'if len(positional) < {} or runs > 1:'.format(
+            len(positionals)))
+        line(2, 'return None')
+
+    if positionals or varargs is not None or converted_defaults:
+        line(1, 'try:')
+        for index, (dest, arg_type) in enumerate(positionals):
+            line(2, 'v_{} = {}'.format(dest, writer.convert(
+                arg_type, 'positional[{}]'.format(index))))
+        if varargs is not None:
+            dest, arg_type, _ = varargs
+            if arg_type is None:
+                line(2, 'v_{} = positional[{}:]'.format(
+                    dest, len(positionals)))
+            else:
+                line(2, 'v_{} = [{} for arg in positional[{}:]]'.format(
+                    dest, writer.convert(arg_type, 'arg'), len(positionals)))
+        for dest, expression in converted_defaults.items():
+            line(2, 'if v_{} is _UNSET:'.format(dest))
+            line(3, 'v_{} = {}'.format(dest, expression))
+        line(1, 'except _conversion_errors():')
+        line(2, 'return None')
+
+    positional_names, varargs_name, keyword_names = layout
+    args = ['v_{}'.format(name) for name in positional_names]
+    if varargs_name is not None:
+        args.append('*v_{}'.format(varargs_name))
+    kwargs = ['{!r}: v_{}'.format(name, name) for name in keyword_names]
+
+    line(0, '')
+    line(1, 'return [{}], {{{}}}'.format(', '.join(args), ', '.join(kwargs)))
+
+
+def _write_store(writer, indent, dest, arg_type):
+    if arg_type is None or arg_type is str:
+        writer.line(indent, 'v_{} = value'.format(dest))
+    else:
+        writer.line(indent, 'try:')
+        writer.line(indent + 1, 'v_{} = {}'.format(
+            dest, writer.convert(arg_type, 'value')))
+        writer.line(indent, 'except _conversion_errors():')
+        writer.line(indent + 1, 'return None')
+
+
+_HEADER = '''\
+# This module was generated by `python -m autocommand.compile {target}`.
+# Don't edit it; generate it again after changing the signature of
+# {target}.
+
+\'\'\'
+Precompiled command-line parser for {target}. Call main(), optionally with an
+argv list, to parse the command line and run it.
+\'\'\'
+
+import sys
+from autocommand.autoparse import (
+    _closing_files, _conversion_errors, _file_arguments)
+from autocommand.speccache import (
+    _parameter_defaults, _UncacheableSpecError, parameters_key)
+'''
+
+_FOOTER = '''\
+def main(argv=None):
+    \'\'\'Parse argv (by default, sys.argv[1:]) and call {target}\'\'\'
+    if not _fresh:
+        raise SystemExit(
+            'The signature of {target} has changed since this parser was '
+            'generated; run `python -m autocommand.compile {target}` again')
+
+    if argv is None:
+        argv = sys.argv[1:]
+
+    parsed = _parse(argv)
+    if parsed is None:
+        # Use the full ArgumentParser for --help, usage errors, and anything
+        # else the generated parser doesn't handle.
+        return _command(argv)
+
+    args, kwargs = parsed
+    if _HAS_FILES:
+        files = _file_arguments(args + list(kwargs.values()))
+        if files:
+            return _closing_files(files, _command.func, *args, **kwargs)
+
+    return _command.func(*args, **kwargs)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
+'''
+
+
+def generate(target):
+    '''
+    Generate the source code of a standalone parser module for target, which
+    is an autoparse function or a "module:function" string naming one. A
+    function can only be compiled from a "module:function" string.
+    '''
+    if not isinstance(target, str):
+        raise CompileError(
+            'target must be a "module:function" string, not {!r}'.format(
+                target))
+
+    module_name, _, attr_path = target.partition(':')
+    if not module_name or not attr_path:
+        raise CompileError(
+            'target must be a "module:function" string, not {!r}'.format(
+                target))
+
+    command = resolve_target(target)
+    if not isinstance(command, _AutoparseWrapper):
+        raise CompileError('{} is not an autoparse function'.format(target))
+
+    command._build()
+    if command._jobs:
+        raise CompileError(
+            '{} uses jobs, which the compiled parser doesn\'t support'.format(
+                target))
+
+    if command._specs is None:
+        raise CompileError(
+            '{} has a custom parser, which can\'t be compiled'.format(target))
+
+    parser = _FastParser.from_specs(command._specs)
+    if parser is None or (
+            parser._varargs is not None and parser._varargs[2] is not None):
+        raise CompileError(
+            '{} has arguments that the compiled parser doesn\'t '
+            'support'.format(target))
+
+    try:
+        key = parameters_key(command.func, command._add_nos)
+    except _UncacheableSpecError as e:
+        raise CompileError(
+            'the parameters of {} can\'t be described exactly'.format(
+                target)) from e
+
+    writer = _ModuleWriter()
+    _write_parse(writer, parser, _call_layout(command._func_sig))
+
+    if '.' in attr_path:
+        command_import = 'import {} as _module\n_command = _module.{}'.format(
+            module_name, attr_path)
+    else:
+        command_import = 'from {} import {} as _command'.format(
+            module_name, attr_path)
+
+    sections = [
+        _HEADER.format(target=target) + command_import + '\n' +
+        ''.join(line + '\n' for line in writer.imports),
+        'PARAMETERS_KEY = {!r}\n\n_UNSET = object()\n\n'
+        '_HAS_FILES = {!r}\n'.format(key, _has_files(parser)),
+        '_defaults = _parameter_defaults(_command.func)\n\n'
+        'try:\n'
+        '    _fresh = parameters_key(\n'
+        '        _command.func, _command._add_nos) == PARAMETERS_KEY\n'
+        'except _UncacheableSpecError:\n'
+        '    _fresh = False\n',
+    ]
+    sections.append('\n'.join(writer.lines) + '\n')
+    sections.append(_FOOTER.format(target=target))
+
+    return '\n\n'.join(sections)
+
+
+@autocommand(__name__)
+def main(
+        target: 'The command to compile, as "module:function"',
+        output: 'Write the generated module to this file' ='-'):
+    '''
+    Generate a standalone parser module for an autoparse function.
+
+    The function must be decorated with autoparse or autocommand. Its
+    generated module has a `main` entry point that parses the command line
+    without argparse, and calls the function directly.
+    '''
+    try:
+        source = generate(target)
+    except CompileError as e:
+        raise SystemExit('error: {}'.format(e))
+
+    if output == '-':
+        print(source, end='')
+    else:
+        with open(output, 'w') as file:
+            file.write(source)
@@ -0,0 +1,299 @@
+# Copyright 2014-2016 Nathan West
+#
+# This file is part of autocommand.
+#
+# autocommand is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# autocommand is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with autocommand.  If not, see <http://www.gnu.org/licenses/>.
+
+'''
+Static shell completion scripts for autoparse functions. The scripts are
+generated from the function's ArgumentParser, and complete its flags
+(including the --no- switches created by add_nos) and, in zsh, describe its
+positional arguments. Option values and positional arguments are completed as
+file names.
+
+Completion runs entirely in the shell; Python is only involved in generating
+the script. Scripts are cached on disk, and only generated again when the
+signature of the function changes. Usage:
+
+    source "$(python -m autocommand.completion mypackage.cli:main mycommand)"
+'''
+
+import os
+from hashlib import sha256
+from re import sub
+from shlex import quote
+from tempfile import NamedTemporaryFile
+from autocommand.autocommand import autocommand
+from autocommand.errors import AutocommandError
+
+
+# Bump this whenever the generated scripts change
+COMPLETION_VERSION = 1
+
+SHELLS = ('bash', 'zsh', 'fish')
+
+
+class UnknownShellError(AutocommandError, ValueError):
+    '''Unknown shell error: completion is available for bash, zsh, and fish'''
+
+
+def _function_name(prog):
+    return '_autocommand_' + sub(r'\W', '_', prog)
+
+
+def _options(parser):
+    '''
+    Get the options of a parser, as (flags, takes_value, help) tuples, and its
+    positional arguments, as (name, repeated) pairs.
+    '''
+    options = []
+    positionals = []
+
+    for action in parser._actions:
+        if action.option_strings:
+            options.append((
+                action.option_strings,
+                action.nargs != 0,
+                action.help or ''))
+        else:
+            positionals.append((
+                action.metavar or action.dest,
+                action.nargs in ('*', '+')))
+
+    return options, positionals
+
+
+def _bash_script(parser, prog):
+    options, _ = _options(parser)
+    function = _function_name(prog)
+
+    value_flags = [
+        flag for flags, takes_value, _ in options if takes_value
+        for flag in flags]
+    all_flags = [flag for flags, _, _ in options for flag in flags]
+
+    lines = [
+        '# bash completion for {}, generated by autocommand'.format(prog),
+        '{}() {{'.format(function),
+        '    local cur="${COMP_WORDS[COMP_CWORD]}"',
+        '    local prev="${COMP_WORDS[COMP_CWORD-1]}"',
+    ]
+
+    if value_flags:
+        lines += [
+            '    case "$prev" in',
+            '        {})'.format('|'.join(value_flags)),
+            '            COMPREPLY=($(compgen -f -- "$cur"))',
+            '            return;;',
+            '    esac',
+        ]
+
+    lines += [
+        '    if [[ "$cur" == -* ]]; then',
+        '        COMPREPLY=($(compgen -W {} -- "$cur"))'.format(
+            quote(' '.join(all_flags))),
+        '    else',
+        '        COMPREPLY=($(compgen -f -- "$cur"))',
+        '    fi',
+        '}',
+        'complete -o filenames -F {} {}'.format(function, quote(prog)),
+    ]
+
+    return '\n'.join(lines) + '\n'
+
+
+def _zsh_escape(text):
+    # Escape the characters that are special in _arguments specs
+    return sub(r'([\[\]:\\])', r'\\\1', ' '.join(text.split()))
+
+
+def _zsh_script(parser, prog):
+    options, positionals = _options(parser)
+    function = _function_name(prog)
+
+    specs = []
+    for flags, takes_value, help in options:
+        value_name = max(flags, key=len).lstrip('-')
+        for flag in flags:
+            spec = flag
+            if help:
+                spec += '[{}]'.format(_zsh_escape(help))
+            if takes_value:
+                spec += ':{}:_files'.format(_zsh_escape(value_name))
+            specs.append(spec)
+
+    for name, repeated in positionals:
+        specs.append('{}:{}:_files'.format(
+            '*' if repeated else '', _zsh_escape(name)))
+
+    lines = [
+        '# zsh completion for {}, generated by autocommand'.format(prog),
+        '{}() {{'.format(function),
+        '    _arguments -s \\',
+    ]
+    lines += ['        {} \\'.format(quote(spec)) for spec in specs]
+    lines += [
+        '        && return 0',
+        '}',
+        'compdef {} {}'.format(function, quote(prog)),
+    ]
+
+    return '\n'.join(lines) + '\n'
+
+
+def _fish_script(parser, prog):
+    options, _ = _options(parser)
+
+    lines = ['# fish completion for {}, generated by autocommand'.format(prog)]
+    for flags, takes_value, help in options:
+        parts = ['complete', '-c', quote(prog)]
+        for flag in flags:
+            if flag.startswith('--'):
+                parts += ['-l', quote(flag[2:])]
+            elif len(flag) == 2:
+                parts += ['-s', quote(flag[1])]
+            else:
+                parts += ['-o', quote(flag[1:])]
+        if takes_value:
+            parts.append('-r')
+        if help:
+            parts += ['-d', quote(' '.join(help.split()))]
+        lines.append(' '.join(parts))
+
+    return '\n'.join(lines) + '\n'
+
+
+_GENERATORS = {
+    'bash': _bash_script,
+    'zsh': _zsh_script,
+    'fish': _fish_script,
+}
+
+
+def completion_script(parser, shell, prog):
+    '''
+    Generate the completion script for an ArgumentParser, for the command
+    named prog, in the given shell: 'bash', 'zsh', or 'fish'.
+    '''
+    try:
+        generator = _GENERATORS[shell]
+    except KeyError:
+        raise UnknownShellError(shell) from None
+
+    return generator(parser, prog)
+
+
+def _command_key(command):
+    '''
+    Get the string identifying the version of an autoparse function that a
+    completion script is generated from, the same way the spec cache does.
+    Returns None if it can't be identified without generating the script:
+    if it has a custom parser, or parameters that the spec cache can't
+    describe exactly.
+    '''
+    from autocommand.speccache import _UncacheableSpecError, function_key
+
+    if command._specs is None and command._parser is not None:
+        return None
+
+    try:
+        return '{}\0{}'.format(
+            function_key(command.func, command._add_nos),
+            bool(command._jobs))
+    except _UncacheableSpecError:
+        return None
+
+
+def completion_path(command, shell, prog, cache_dir=None):
+    '''
+    Get the path of the completion script for an autoparse function, for the
+    command named prog, generating it if it isn't already cached. Scripts for
+    older versions of the function are removed. The scripts are stored in
+    cache_dir, which defaults to the "completion" subdirectory of the
+    autoparse spec cache directory.
+    '''
+    if shell not in _GENERATORS:
+        raise UnknownShellError(shell)
+
+    if cache_dir is None:
+        from autocommand.speccache import default_cache_dir
+        cache_dir = os.path.join(default_cache_dir(), 'completion')
+
+    # If the command can't be identified, the script is identified by its
+    # own content instead, so it has to be generated every time.
+    script = None
+    key = _command_key(command)
+    if key is None:
+        script = key = completion_script(command.parser, shell, prog)
+
+    stem = sub(r'[^\w-]', '_', prog)
+    key = '\0'.join((str(COMPLETION_VERSION), shell, prog, key))
+    digest = sha256(key.encode('utf-8', 'surrogatepass')).hexdigest()
+    path = os.path.join(cache_dir, '{}.{}.{}'.format(
+        stem, digest[:32], shell))
+
+    if os.path.exists(path):
+        return path
+
+    if script is None:
+        script = completion_script(command.parser, shell, prog)
+    os.makedirs(cache_dir, exist_ok=True)
+
+    # Write to a temporary file and rename it into place, so that a shell
+    # never sources a partially written script.
+    with NamedTemporaryFile(
+            'w', dir=cache_dir, suffix='.tmp', delete=False) as file:
+        try:
+            file.write(script)
+        except BaseException:
+            os.remove(file.name)
+            raise
+    os.replace(file.name, path)
+
+    for filename in os.listdir(cache_dir):
+        parts = filename.split('.')
+        if (filename != os.path.basename(path) and len(parts) == 3 and
+                parts[0] == stem and parts[2] == shell):
+            os.remove(os.path.join(cache_dir, filename))
+
+    return path
+
+
+@autocommand(__name__)
+def main(
+        target: 'The command, as "module:function"',
+        prog: 'The name of the installed command',
+        shell: 'The shell to complete in: bash, zsh, or fish' ='bash',
+        cache_dir: 'Where to store the completion scripts' =None,
+        print_script: 'Print the script, rather than its path' =False):
+    '''
+    Generate a shell completion script for an autoparse function.
+
+    Prints the path of the cached script, which can be sourced by the shell;
+    the script is only generated again if the function's signature changes.
+    '''
+    from autocommand.group import resolve_target
+
+    command = resolve_target(target)
+    if shell not in _GENERATORS:
+        raise SystemExit('error: unknown shell {!r}; use one of {}'.format(
+            shell, ', '.join(SHELLS)))
+
+    path = completion_path(command, shell, prog, cache_dir)
+
+    if print_script:
+        with open(path) as file:
+            print(file.read(), end='')
+    else:
+        print(path)
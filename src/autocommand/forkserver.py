@@ -0,0 +1,619 @@
+# Copyright 2014-2016 Nathan West
+#
+# This file is part of autocommand.
+#
+# autocommand is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# autocommand is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with autocommand.  If not, see <http://www.gnu.org/licenses/>.
+
+'''
+A resident fork server for commands that are run very often. The first run of
+a command starts a server in the background, with the command's module already
+imported; later runs connect to it over a Unix socket, send their argv, cwd,
+environment, and standard streams, and the server forks a child process to run
+the command. The child's exit status becomes the exit status of the run.
+
+The server is enabled with automain's (or autocommand's) `server` option. To
+also skip importing the command's module when the server is running, call
+`client()` at the very top of the script, before any other imports:
+
+    from autocommand.forkserver import client
+    client()
+
+    import numpy
+    ...
+
+    @autocommand(__name__, server=True)
+    def main(...):
+        ...
+
+The server exits after `idle_timeout` seconds without a connection, or when
+the script is modified (the next run then starts a new one). It can be stopped
+or restarted explicitly with `python -m autocommand.forkserver stop --name
+NAME` (or `restart`); `list` shows the names of the running servers. Set
+AUTOCOMMAND_NO_SERVER=1 in the environment to bypass the server entirely.
+Servers are only available on platforms with fork and Unix sockets;
+elsewhere, the command simply runs normally.
+
+This module is imported by the client before anything else, so it only uses
+cheap imports at module level.
+'''
+
+import marshal
+import os
+import sys
+from zlib import crc32
+
+
+DEFAULT_IDLE_TIMEOUT = 600
+
+_DISABLE_VARIABLE = 'AUTOCOMMAND_NO_SERVER'
+
+# Set by restart, to make the script start a server without running the command
+_START_VARIABLE = 'AUTOCOMMAND_START_SERVER'
+
+# Messages are length-prefixed, marshalled dicts; requests are sent along with
+# the client's stdin, stdout, and stderr file descriptors. marshal is built in
+# to the interpreter, so unlike json, it costs nothing to import. Only the
+# current user can connect to the sockets, so the data is trusted.
+_LENGTH_BYTES = 4
+_MAX_MESSAGE = 1 << 24
+_STDIO = (0, 1, 2)
+
+
+def available():
+    '''Check if fork servers are supported on this platform'''
+    import socket
+    return hasattr(os, 'fork') and hasattr(socket, 'AF_UNIX') and hasattr(
+        socket.socket, 'sendmsg')
+
+
+def runtime_dir():
+    '''
+    Get the directory for the sockets: $XDG_RUNTIME_DIR/autocommand, or a
+    per-user directory in the temporary directory. It's created, if
+    necessary, with permissions that prevent other users from connecting to
+    the servers. Raises PermissionError if it exists but isn't private.
+    '''
+    base = os.environ.get('XDG_RUNTIME_DIR')
+    if base:
+        path = os.path.join(base, 'autocommand')
+    else:
+        path = os.path.join(
+            os.environ.get('TMPDIR') or '/tmp',
+            'autocommand-{}'.format(os.getuid()))
+
+    try:
+        os.mkdir(path, 0o700)
+    except FileExistsError:
+        pass
+
+    stat = os.lstat(path)
+    if stat.st_uid != os.getuid() or stat.st_mode & 0o077 or not (
+            os.path.isdir(path) and not os.path.islink(path)):
+        raise PermissionError(
+            '{} is not a private directory owned by the current '
+            'user'.format(path))
+
+    return path
+
+
+def _main_file():
+    main = sys.modules.get('__main__')
+    path = getattr(main, '__file__', None)
+    return None if path is None else os.path.abspath(path)
+
+
+def server_name(path=None):
+    '''
+    Get the default server name for a script: its file name and a hash of
+    its path. The path defaults to the script being run.
+    '''
+    if path is None:
+        path = _main_file() or 'python'
+
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return '{}-{:08x}'.format(
+        ''.join(c if c.isalnum() or c in '-_' else '_' for c in stem),
+        crc32(os.fsencode(path)))
+
+
+def _socket_path(name):
+    return os.path.join(runtime_dir(), name + '.sock')
+
+
+# Helpers for passing file descriptors. socket.send_fds and socket.recv_fds
+# only exist in Python 3.9 and later.
+
+def _send_fds(sock, data, fds):
+    import socket
+    from array import array
+    return sock.sendmsg([data], [
+        (socket.SOL_SOCKET, socket.SCM_RIGHTS, array('i', fds))])
+
+
+def _recv_fds(sock, size, max_fds):
+    import socket
+    from array import array
+
+    fds = array('i')
+    data, ancdata, _, _ = sock.recvmsg(
+        size, socket.CMSG_SPACE(max_fds * fds.itemsize))
+
+    for level, kind, cmsg_data in ancdata:
+        if level == socket.SOL_SOCKET and kind == socket.SCM_RIGHTS:
+            usable = len(cmsg_data) - len(cmsg_data) % fds.itemsize
+            fds.frombytes(cmsg_data[:usable])
+
+    return data, list(fds)
+
+
+def _recv_exactly(sock, size, data=b''):
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise EOFError()
+        data += chunk
+    return data
+
+
+def _encode(message):
+    data = marshal.dumps(message)
+    return len(data).to_bytes(_LENGTH_BYTES, 'big') + data
+
+
+def _decode_size(header):
+    size = int.from_bytes(header, 'big')
+    if size > _MAX_MESSAGE:
+        raise ValueError(size)
+    return size
+
+
+def _recv_request(sock):
+    data, fds = _recv_fds(sock, 1 << 16, len(_STDIO))
+    try:
+        header = _recv_exactly(sock, _LENGTH_BYTES, data[:_LENGTH_BYTES])
+        body = _recv_exactly(
+            sock, _decode_size(header), data[_LENGTH_BYTES:])
+        return marshal.loads(body), fds
+    except BaseException:
+        for fd in fds:
+            os.close(fd)
+        raise
+
+
+def _send_response(sock, response):
+    sock.sendall(_encode(response))
+
+
+def _connect(name):
+    import socket
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(_socket_path(name))
+    except BaseException:
+        sock.close()
+        raise
+    return sock
+
+
+def _responses(sock):
+    '''Iterate over the responses from the server, until it disconnects'''
+    while True:
+        try:
+            header = _recv_exactly(sock, _LENGTH_BYTES)
+            body = _recv_exactly(sock, _decode_size(header))
+        except EOFError:
+            return
+        yield marshal.loads(body)
+
+
+def _forward_signals(pid):
+    '''Forward the signals that would stop the client to the child'''
+    import signal
+
+    def forward(signum, frame):
+        try:
+            os.kill(pid, signum)
+        except ProcessLookupError:
+            pass
+
+    for signum in (signal.SIGINT, signal.SIGTERM, signal.SIGHUP):
+        signal.signal(signum, forward)
+
+
+def run_in_server(name=None, argv=None):
+    '''
+    Run a command line in a running server. argv is the complete command line,
+    including the program name, and defaults to sys.argv. Returns the exit
+    status of the command, or None if the command couldn't be started in a
+    server (because none is running, or it's running an outdated version of
+    the script). In that case, the caller should run the command itself.
+    '''
+    if os.environ.get(_DISABLE_VARIABLE) or os.environ.get(_START_VARIABLE):
+        return None
+    if not available():
+        return None
+
+    if name is None:
+        name = server_name()
+    if argv is None:
+        argv = sys.argv
+
+    request = _encode({
+        'command': 'run',
+        'argv': list(argv),
+        'cwd': os.getcwd(),
+        'env': dict(os.environ),
+    })
+
+    try:
+        sock = _connect(name)
+    except OSError:
+        return None
+
+    pid = None
+    with sock:
+        try:
+            _send_fds(sock, request, _STDIO)
+            for response in _responses(sock):
+                if 'pid' in response:
+                    pid = response['pid']
+                    _forward_signals(pid)
+                elif 'exit' in response:
+                    return response['exit']
+        except (OSError, ValueError):
+            pass
+
+    # The server disconnected without an exit status. If the command never
+    # started, it's safe to run it elsewhere; otherwise, the child was killed.
+    return None if pid is None else 1
+
+
+def client(name=None):
+    '''
+    If a server is running for this script, run the command line in it, and
+    exit with its exit status; otherwise, return. Call this at the top of the
+    script, so that when a server is running, nothing else is imported.
+    '''
+    code = run_in_server(name)
+    if code is not None:
+        # Skip the interpreter's cleanup; there's nothing to clean up yet.
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os._exit(code)
+
+
+def stop(name):
+    '''
+    Stop a running server. Commands it already started keep running. Returns
+    a dict describing the server, with the 'script' it was running, and the
+    Python 'executable', 'cwd', and 'env' it was started with, or None if it
+    wasn't running.
+    '''
+    try:
+        sock = _connect(name)
+    except OSError:
+        return None
+
+    with sock:
+        try:
+            sock.sendall(_encode({'command': 'stop'}))
+            for response in _responses(sock):
+                if response.get('stopped'):
+                    return response
+        except (OSError, ValueError):
+            pass
+
+    return None
+
+
+def restart(name):
+    '''
+    Restart a running server, by stopping it and running its script again, in
+    the same directory and environment, in a mode that only starts a new
+    server. Returns True if a server was running.
+    '''
+    import subprocess
+
+    server = stop(name)
+    if server is None:
+        return False
+
+    if server.get('script') is not None:
+        subprocess.run(
+            [server['executable'], server['script']],
+            cwd=server['cwd'],
+            env=dict(server['env'], **{_START_VARIABLE: '1'}),
+            stdin=subprocess.DEVNULL, check=False)
+
+    return True
+
+
+def running_servers():
+    '''Get the names of the servers that are accepting connections'''
+    names = []
+    for filename in sorted(os.listdir(runtime_dir())):
+        if filename.endswith('.sock'):
+            name = filename[:-len('.sock')]
+            try:
+                _connect(name).close()
+            except OSError:
+                continue
+            names.append(name)
+    return names
+
+
+def _exit_status(code):
+    '''Convert a sys.exit argument to an exit status, like the interpreter'''
+    if code is None:
+        return 0
+    elif isinstance(code, int):
+        return code & 0xff
+    else:
+        print(code, file=sys.stderr)
+        return 1
+
+
+def _run_child(sock, request, fds, main, args, kwargs):
+    '''
+    Run the command in a freshly forked child of the server, with the client's
+    standard streams, cwd, environment, and argv. Never returns.
+    '''
+    import signal
+    import traceback
+
+    code = 1
+    try:
+        signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+
+        for target, fd in zip(_STDIO, fds):
+            os.dup2(fd, target)
+            os.close(fd)
+
+        # The standard streams were created for the server's /dev/null
+        for stream in (sys.stdout, sys.stderr):
+            if stream is not None and hasattr(stream, 'reconfigure'):
+                stream.reconfigure(line_buffering=(
+                    stream is sys.stderr or stream.isatty()))
+
+        _send_response(sock, {'pid': os.getpid()})
+
+        os.chdir(request['cwd'])
+        os.environ.clear()
+        os.environ.update(request['env'])
+        sys.argv = request['argv']
+
+        try:
+            code = _exit_status(main(*args, **kwargs))
+        except SystemExit as e:
+            code = _exit_status(e.code)
+        except BaseException:
+            traceback.print_exc()
+            code = 1
+
+        for stream in (sys.stdout, sys.stderr):
+            try:
+                stream.flush()
+            except (AttributeError, OSError, ValueError):
+                pass
+
+        _send_response(sock, {'exit': code})
+    finally:
+        os._exit(code)
+
+
+def _serve(listener, path, main, args, kwargs, idle_timeout):
+    '''The server's accept loop'''
+    import signal
+    import socket
+
+    # Children are never waited for; let the kernel reap them
+    signal.signal(signal.SIGCHLD, signal.SIG_IGN)
+
+    script = _main_file()
+    mtime = None if script is None else os.stat(script).st_mtime_ns
+    listener.settimeout(idle_timeout)
+
+    while True:
+        try:
+            sock, _ = listener.accept()
+        except socket.timeout:
+            return
+
+        with sock:
+            sock.settimeout(5)
+            try:
+                request, fds = _recv_request(sock)
+            except (OSError, EOFError, ValueError, TypeError):
+                continue
+
+            try:
+                command = request.get('command')
+                if command == 'stop':
+                    _send_response(sock, {
+                        'stopped': True,
+                        'script': script,
+                        'executable': sys.executable,
+                        'cwd': os.getcwd(),
+                        'env': dict(os.environ)})
+                    return
+
+                try:
+                    stale = mtime is not None and (
+                        os.stat(script).st_mtime_ns != mtime)
+                except OSError:
+                    stale = True
+
+                if stale:
+                    _send_response(sock, {'stale': True})
+                    return
+
+                if command != 'run' or len(fds) != len(_STDIO):
+                    continue
+
+                sock.settimeout(None)
+                if os.fork() == 0:
+                    listener.close()
+                    _run_child(sock, request, fds, main, args, kwargs)
+            except OSError:
+                continue
+            finally:
+                for fd in fds:
+                    os.close(fd)
+
+
+def _daemon(name, main, args, kwargs, idle_timeout):
+    '''Run the server in a daemon process. Never returns.'''
+    import socket
+
+    code = 0
+    try:
+        os.setsid()
+        if os.fork() != 0:
+            return
+
+        devnull = os.open(os.devnull, os.O_RDWR)
+        for fd in _STDIO:
+            os.dup2(devnull, fd)
+        os.close(devnull)
+
+        path = _socket_path(name)
+        temporary_path = '{}.{}.tmp'.format(path, os.getpid())
+
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as listener:
+            listener.bind(temporary_path)
+            listener.listen(64)
+            # Renaming the bound socket into place is atomic, so clients never
+            # see a socket that isn't accepting connections yet.
+            os.replace(temporary_path, path)
+            identity = os.stat(path)
+
+            try:
+                _serve(listener, path, main, args, kwargs, idle_timeout)
+            finally:
+                # Only remove the socket if it hasn't been replaced by a newer
+                # server
+                try:
+                    current = os.stat(path)
+                    if (current.st_ino, current.st_dev) == (
+                            identity.st_ino, identity.st_dev):
+                        os.remove(path)
+                except OSError:
+                    pass
+    except BaseException:
+        code = 1
+    finally:
+        os._exit(code)
+
+
+def start_server(name, main, args=(), kwargs=None, *,
+                 idle_timeout=DEFAULT_IDLE_TIMEOUT):
+    '''
+    Start a server in the background, which calls main(*args, **kwargs) for
+    each command line it's sent. Returns without waiting for it to start
+    accepting connections. Any errors are ignored; the command will simply
+    run normally next time, too.
+    '''
+    if kwargs is None:
+        kwargs = {}
+
+    # Anything left in these buffers would be copied into the server
+    for stream in (sys.stdout, sys.stderr):
+        try:
+            stream.flush()
+        except (AttributeError, OSError, ValueError):
+            pass
+
+    try:
+        runtime_dir()
+        pid = os.fork()
+    except OSError:
+        return
+
+    if pid == 0:
+        _daemon(name, main, args, kwargs, idle_timeout)
+    else:
+        os.waitpid(pid, 0)
+
+
+def serve_or_run(main, args=(), kwargs=None, *, name=None,
+                 idle_timeout=DEFAULT_IDLE_TIMEOUT):
+    '''
+    Run main(*args, **kwargs) in a running server, if there is one, and
+    return its exit status. Otherwise, start a server for next time, and run
+    main in this process, returning its return value. This is what automain
+    does with the `server` option.
+    '''
+    if kwargs is None:
+        kwargs = {}
+
+    if os.environ.get(_DISABLE_VARIABLE) or not available():
+        return main(*args, **kwargs)
+
+    if name is None:
+        name = server_name()
+
+    start_only = os.environ.pop(_START_VARIABLE, None)
+    if not start_only:
+        code = run_in_server(name)
+        if code is not None:
+            return code
+
+    # main might be wrapped (by automain, for instance) around the autoparse
+    # function that has the parser. Its parser is a lazy property, so look
+    # for it on the type, without building it yet.
+    command = main
+    while not hasattr(type(command), 'parser') and hasattr(
+            command, '__wrapped__'):
+        command = command.__wrapped__
+
+    # The parser must exist before the fork, so the children share it
+    # rather than each building it.
+    if hasattr(type(command), 'parser'):
+        command.parser
+
+    start_server(name, main, args, kwargs, idle_timeout=idle_timeout)
+
+    if start_only:
+        return 0
+
+    return main(*args, **kwargs)
+
+
+def _cli():
+    from autocommand.autocommand import autocommand
+
+    @autocommand('__main__')
+    def forkserver(
+            command: 'list, stop, or restart',
+            name: 'The name of the server to stop or restart' =None):
+        '''
+        Manage autocommand fork servers.
+        '''
+        if command == 'list':
+            for name in running_servers():
+                print(name)
+        elif command in ('stop', 'restart'):
+            if name is None:
+                raise SystemExit(
+                    'error: {} requires a server --name'.format(command))
+            action = stop if command == 'stop' else restart
+            if not action(name):
+                raise SystemExit('no server named {} is running'.format(name))
+        else:
+            raise SystemExit('error: unknown command {!r}'.format(command))
+
+
+if __name__ == '__main__':
+    _cli()
@@ -0,0 +1,196 @@
+# Copyright 2014-2016 Nathan West
+#
+# This file is part of autocommand.
+#
+# autocommand is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# autocommand is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with autocommand.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import sys
+from importlib import import_module
+from .errors import AutocommandError
+
+
+class CommandTargetError(AutocommandError, ValueError):
+    '''
+    Command target error: targets must be callables or "module:function"
+    strings
+    '''
+
+
+class DuplicateCommandError(AutocommandError, ValueError):
+    '''Duplicate command error: a command with this name already exists'''
+
+
+def resolve_target(target):
+    '''
+    Resolve a "module:function" string to the object it names, importing the
+    module. The function part can be a dotted path, like "module:Class.method".
+    Non-string targets are returned unchanged.
+    '''
+    if not isinstance(target, str):
+        return target
+
+    module_name, attr_path = target.split(':', 1)
+    obj = import_module(module_name)
+    for attr in attr_path.split('.'):
+        obj = getattr(obj, attr)
+    return obj
+
+
+class CommandGroup:
+    '''
+    A command-line program made of several subcommands, dispatched on the
+    first command-line argument. Each subcommand is registered with a name and
+    a target, which is either a "module:function" string or the function
+    itself. The targets are usually functions decorated with autoparse or
+    autocommand; other functions are wrapped with autoparse when they are run.
+
+    String targets are only imported when their subcommand is run, so
+    programs with many subcommands don't pay for importing all of them (and
+    all of their dependencies) on every run. The top-level --help is rendered
+    from the registered names and help text alone, and subcommand --help is
+    rendered from the subcommand's source code, when possible.
+
+    The group is called like an autoparse function: with an optional argv,
+    which defaults to sys.argv[1:]. It returns the return value of the
+    subcommand. Example:
+
+        group = CommandGroup(description='Tools for working with widgets')
+        group.register('build', 'widgets.build:main', help='Build a widget')
+        group.register('test', 'widgets.test:main', help='Test a widget')
+
+        if __name__ == '__main__':
+            sys.exit(group())
+    '''
+    def __init__(self, *, prog=None, description=None, epilog=None):
+        self.prog = prog
+        self.description = description
+        self.epilog = epilog
+        self._commands = {}
+
+    def register(self, name, target, *, help=None):
+        '''
+        Register a subcommand. `target` is a callable or a "module:function"
+        string, which is imported only when the subcommand is run. `help` is
+        shown next to the command name in the top-level --help.
+        '''
+        if name in self._commands:
+            raise DuplicateCommandError(name)
+
+        if isinstance(target, str):
+            module_name, _, attr_path = target.partition(':')
+            if not module_name or not attr_path:
+                raise CommandTargetError(target)
+        elif not callable(target):
+            raise CommandTargetError(target)
+
+        self._commands[name] = (target, help)
+
+    @property
+    def commands(self):
+        '''The names of the registered subcommands, in registration order'''
+        return list(self._commands)
+
+    def load(self, name):
+        '''
+        Import (if necessary) and return the function for a subcommand,
+        wrapped with autoparse if it isn't already an autoparse function.
+        '''
+        target, _ = self._commands[name]
+        command = resolve_target(target)
+        prog = self._subcommand_prog(name)
+
+        if isinstance(command, CommandGroup):
+            command.prog = prog
+            return command
+
+        from .autoparse import _AutoparseWrapper, autoparse
+
+        if not isinstance(command, _AutoparseWrapper):
+            if getattr(command, 'parser', None) is not None:
+                command.parser.prog = prog
+                return command
+            command = autoparse(command)
+
+        # This doesn't build the parser, which isn't needed at all if the
+        # fast parser handles the arguments.
+        command.prog = prog
+        return command
+
+    def _subcommand_prog(self, name):
+        # Make the subcommand's usage and error messages show the full
+        # command line, like `prog build`
+        return '{} {}'.format(
+            self.prog or os.path.basename(sys.argv[0]), name)
+
+    def static_parser(self, name):
+        '''
+        Get a parser for rendering the --help of a subcommand without
+        importing it, or None if that isn't possible. See
+        autocommand.statichelp for details.
+        '''
+        target, _ = self._commands[name]
+        if not isinstance(target, str):
+            return None
+
+        from .statichelp import static_parser
+
+        parser = static_parser(target)
+        if parser is not None:
+            parser.prog = self._subcommand_prog(name)
+        return parser
+
+    @property
+    def parser(self):
+        '''
+        The top-level ArgumentParser. It's used to render --help and usage
+        errors, and is built from the registered metadata, without importing
+        any subcommands.
+        '''
+        from argparse import ArgumentParser
+
+        parser = ArgumentParser(
+            prog=self.prog,
+            description=self.description,
+            epilog=self.epilog)
+
+        subparsers = parser.add_subparsers(
+            dest='command', metavar='<command>', title='commands')
+        subparsers.required = True
+
+        for name, (_, help) in self._commands.items():
+            subparsers.add_parser(name, help=help, add_help=False)
+
+        return parser
+
+    def __call__(self, argv=None):
+        if argv is None:
+            argv = sys.argv[1:]
+
+        if argv and argv[0] in self._commands:
+            # `prog command --help` is rendered from the command's source, if
+            # possible, so that it doesn't import the command's dependencies.
+            if argv[1:] in (['-h'], ['--help']):
+                parser = self.static_parser(argv[0])
+                if parser is not None:
+                    return parser.parse_args(argv[1:])
+
+            return self.load(argv[0])(argv[1:])
+
+        # This isn't a valid command line (or it's a request for --help), so
+        # let argparse print the appropriate message. In the unlikely event
+        # that it's valid anyway (for instance, `-- command`), run the command
+        # that argparse found.
+        args, remaining = self.parser.parse_known_args(argv)
+        return self.load(args.command)(remaining)
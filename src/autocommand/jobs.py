@@ -0,0 +1,182 @@
+# Copyright 2014-2016 Nathan West
+#
+# This file is part of autocommand.
+#
+# autocommand is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# autocommand is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with autocommand.  If not, see <http://www.gnu.org/licenses/>.
+
+'''
+Sharding of *args across worker processes, for autoparse's `jobs` option.
+'''
+
+import os
+import sys
+from itertools import repeat
+from autocommand.batch import exit_code
+
+
+# The dest of the --jobs option. It's not a valid parameter name, so it can't
+# collide with any of the function's parameters.
+JOBS_DEST = 'autocommand-jobs'
+
+
+def job_count(value):
+    '''
+    The type of the --jobs option: a non-negative number of jobs, where 0
+    means one job per CPU.
+    '''
+    jobs = int(value)
+    if jobs < 0:
+        raise ValueError(value)
+    return jobs or os.cpu_count() or 1
+
+
+def jobs_spec(used_flags):
+    '''
+    Create the argument spec for the --jobs option, given the flags already
+    used by the function's parameters.
+    '''
+    flags = ['--jobs']
+    if '-j' not in used_flags:
+        flags.insert(0, '-j')
+
+    return flags, {
+        'type': job_count,
+        'default': 1,
+        'dest': JOBS_DEST,
+        'metavar': 'N',
+        'help': 'Split the trailing arguments between N worker processes '
+                '(0 for one per CPU)'}
+
+
+def chunk(items, jobs, chunk_size=None):
+    '''
+    Split items into chunks of chunk_size items. By default, the chunk size is
+    picked so that there are about 4 chunks per job, which balances the load
+    between the jobs without too much overhead per chunk.
+    '''
+    if chunk_size is None:
+        chunk_size = max(1, -(-len(items) // (jobs * 4)))
+
+    return [
+        items[start:start + chunk_size]
+        for start in range(0, len(items), chunk_size)]
+
+
+def _free_threaded():
+    is_gil_enabled = getattr(sys, '_is_gil_enabled', None)
+    return is_gil_enabled is not None and not is_gil_enabled()
+
+
+def _call_chunk(command, args, kwargs):
+    return command.func(*args, **kwargs)
+
+
+# The command being run by run_jobs, for the worker processes it forks. They
+# inherit it, so it doesn't have to be pickled, which would require it to be
+# importable by name: a __main__ script's command isn't, since automain
+# calls it before its name is bound.
+_forked_command = None
+
+
+def _call_forked_chunk(args, kwargs):
+    return _forked_command.func(*args, **kwargs)
+
+
+def _worker_context():
+    '''
+    Get the multiprocessing context for the worker processes, and whether it
+    forks them. Forking a process that has other threads can deadlock the
+    child (if another thread held a lock at the time), so they're only forked
+    when fork is available and this is the only thread. Otherwise, they're
+    started with the default start method, or with spawn, if that's fork.
+    '''
+    import multiprocessing
+    import threading
+
+    if threading.active_count() == 1 and (
+            'fork' in multiprocessing.get_all_start_methods()):
+        return multiprocessing.get_context('fork'), True
+
+    context = multiprocessing.get_context()
+    if context.get_start_method() == 'fork':
+        context = multiprocessing.get_context('spawn')
+    return context, False
+
+
+def combine_results(results):
+    '''
+    Combine the return values of several chunks into the return value of the
+    whole command: the first one that would be a failed exit status, or the
+    first one if they all succeeded.
+    '''
+    for result in results:
+        if exit_code(result) != 0:
+            return result
+
+    return results[0] if results else None
+
+
+def run_jobs(command, args, kwargs, positional_count, jobs, chunk_size=None):
+    '''
+    Call the function of an autoparse command once per chunk of its *args,
+    in a pool of `jobs` worker processes, and combine the results. args is the
+    full list of positional arguments, of which the first positional_count
+    are passed to every call. On free-threaded builds of Python, a thread pool
+    is used instead.
+
+    Where it's available, and there are no other threads, the workers are
+    forked, and inherit the command; otherwise, the command is pickled by
+    name, so it must be importable.
+    '''
+    global _forked_command
+
+    fixed_args = list(args[:positional_count])
+    chunks = chunk(list(args[positional_count:]), jobs, chunk_size)
+
+    if len(chunks) <= 1:
+        return command.func(*args, **kwargs)
+
+    workers = min(jobs, len(chunks))
+    chunk_args = [fixed_args + items for items in chunks]
+
+    if _free_threaded():
+        from concurrent.futures import ThreadPoolExecutor
+
+        with ThreadPoolExecutor(workers) as executor:
+            results = list(executor.map(
+                _call_chunk, repeat(command), chunk_args, repeat(kwargs)))
+
+        return combine_results(results)
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    context, forked = _worker_context()
+    if not forked:
+        with ProcessPoolExecutor(workers, mp_context=context) as executor:
+            results = list(executor.map(
+                _call_chunk, repeat(command), chunk_args, repeat(kwargs)))
+
+        return combine_results(results)
+
+    # The workers are forked when the chunks are submitted, so the command
+    # has to be set first.
+    previous, _forked_command = _forked_command, command
+    try:
+        with ProcessPoolExecutor(workers, mp_context=context) as executor:
+            results = list(executor.map(
+                _call_forked_chunk, chunk_args, repeat(kwargs)))
+    finally:
+        _forked_command = previous
+
+    return combine_results(results)
@@ -0,0 +1,150 @@
+# Copyright 2014-2016 Nathan West
+#
+# This file is part of autocommand.
+#
+# autocommand is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# autocommand is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with autocommand.  If not, see <http://www.gnu.org/licenses/>.
+
+'''
+Streaming output for commands that produce many records. automain uses
+write_items to write the items yielded by generator main functions, one
+record per line, with one of these encoders:
+
+- 'text' writes str(item)
+- 'jsonl' writes each item as JSON (JSON Lines)
+- 'tsv' writes each item, a sequence of fields, as tab-separated values,
+  with backslash escapes for tabs, newlines, carriage returns, and
+  backslashes in the fields
+
+An encoder can also be any function that converts an item to a line of text,
+without the line ending.
+'''
+
+import sys
+from autocommand.errors import AutocommandError
+from autocommand.smartopen import smart_open, DEFAULT_BUFFER_SIZE
+
+# The number of records encoded and written at a time
+DEFAULT_BATCH_SIZE = 1000
+
+
+class UnknownEncoderError(AutocommandError, ValueError):
+    '''Unknown encoder: the encoder isn't a callable or a known name'''
+
+
+def encode_text(item):
+    '''The 'text' encoder: str(item)'''
+    return item if type(item) is str else str(item)
+
+
+def _json_encoder():
+    from json import JSONEncoder
+    return JSONEncoder(ensure_ascii=False, separators=(',', ':')).encode
+
+
+_TSV_ESCAPES = str.maketrans({
+    '\\': '\\\\',
+    '\t': '\\t',
+    '\n': '\\n',
+    '\r': '\\r',
+})
+
+
+def encode_tsv(item):
+    '''
+    The 'tsv' encoder: the fields of item, escaped and separated by tabs. A
+    string, or anything else that isn't iterable, is a single field, and None
+    is an empty field.
+    '''
+    if isinstance(item, (str, bytes)) or not hasattr(item, '__iter__'):
+        item = (item,)
+
+    return '\t'.join(
+        ('' if field is None else str(field)).translate(_TSV_ESCAPES)
+        for field in item)
+
+
+def get_encoder(encoder):
+    '''
+    Get the function for an encoder, given its name ('text', 'jsonl', or
+    'tsv'; None means 'text') or the function itself.
+    '''
+    if callable(encoder):
+        return encoder
+    elif encoder is None or encoder == 'text':
+        return encode_text
+    elif encoder == 'jsonl':
+        return _json_encoder()
+    elif encoder == 'tsv':
+        return encode_tsv
+
+    raise UnknownEncoderError(encoder)
+
+
+def write_items(
+        items, file=None, *,
+        encoder=None,
+        batch_size=DEFAULT_BATCH_SIZE,
+        buffer_size=DEFAULT_BUFFER_SIZE):
+    '''
+    Write each item from an iterable as a line of file (by default, stdout),
+    encoded by encoder. The items are encoded and written in batches of
+    batch_size, so each batch is one write, and stdout is written through a
+    buffer of buffer_size bytes (see smart_open), so a large result is
+    written with a few large system calls, in constant memory. file is
+    flushed at the end.
+
+    If items is a generator, its return value is returned. The generator is
+    closed if writing fails.
+    '''
+    encode = get_encoder(encoder)
+    if file is None:
+        file = sys.stdout
+
+    with smart_open(file, 'w', buffer_size=buffer_size) as out:
+        write = out.write
+        returned = []
+        iterator = _returning(items, returned)
+        batch = []
+        append = batch.append
+
+        try:
+            while True:
+                for item in iterator:
+                    append(encode(item))
+                    if len(batch) >= batch_size:
+                        break
+                else:
+                    break
+
+                batch.append('')
+                write('\n'.join(batch))
+                batch.clear()
+
+            if batch:
+                batch.append('')
+                write('\n'.join(batch))
+            out.flush()
+        except BaseException:
+            iterator.close()
+            raise
+
+    return returned[0] if returned else None
+
+
+def _returning(items, returned):
+    '''
+    Iterate over items, appending the return value to returned when it's a
+    generator that finishes
+    '''
+    returned.append((yield from items))
@@ -0,0 +1,592 @@
+# Copyright 2014-2016 Nathan West
+#
+# This file is part of autocommand.
+#
+# autocommand is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# autocommand is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with autocommand.  If not, see <http://www.gnu.org/licenses/>.
+
+'''
+smart_open, smart_copy, and the file opening machinery behind them.
+'''
+
+import io
+import os
+import sys
+from contextlib import contextmanager, ExitStack
+
+# The default size of the buffer used for reading files. Reading in large
+# chunks saves a lot of system calls (and decompressor calls) when a command
+# streams through a big file.
+DEFAULT_BUFFER_SIZE = 1 << 20
+
+# The filename that means stdin, or stdout for files opened for writing
+STDIO_FILENAME = '-'
+
+# The compression formats, with the file extensions each one is inferred from
+# and the magic bytes each one starts with. "BZh" alone is plain text, so bz2
+# files are recognized by the full stream header: the block size, and the
+# magic number of the first block (or of the end of an empty stream).
+_COMPRESSIONS = {
+    'gzip': (('.gz',), (b'\x1f\x8b',)),
+    'bz2': (('.bz2',), tuple(
+        b'BZh%c' % level + block
+        for level in b'123456789'
+        for block in (b'1AY&SY', b'\x17rE8P\x90'))),
+    'xz': (('.xz', '.lzma'), (b'\xfd7zXZ\x00',)),
+}
+
+_MAGIC_SIZE = max(
+    len(magic)
+    for _, magics in _COMPRESSIONS.values()
+    for magic in magics)
+
+# The parameters of open, after file and mode, in order
+_OPEN_PARAMETERS = (
+    'buffering', 'encoding', 'errors', 'newline', 'closefd', 'opener')
+
+_TEXT_PARAMETERS = ('encoding', 'errors', 'newline')
+
+
+def infer_compression(filename):
+    '''
+    Get the compression format implied by a filename's extension: 'gzip',
+    'bz2', 'xz', or None.
+    '''
+    if isinstance(filename, int):
+        return None
+
+    name = os.fsdecode(filename).lower()
+    for compression, (extensions, _) in _COMPRESSIONS.items():
+        if name.endswith(extensions):
+            return compression
+
+    return None
+
+
+def sniff_compression(file):
+    '''
+    Get the compression format of a buffered binary file from its magic
+    bytes, or None, without consuming any data.
+    '''
+    head = file.peek(_MAGIC_SIZE)[:_MAGIC_SIZE]
+    for compression, (_, magics) in _COMPRESSIONS.items():
+        if head.startswith(magics):
+            return compression
+
+    return None
+
+
+def _compressed(compression, raw, mode):
+    '''Wrap a binary file in a binary file that (de)compresses it'''
+    if compression == 'gzip':
+        from gzip import GzipFile
+        return GzipFile(fileobj=raw, mode=mode)
+    elif compression == 'bz2':
+        from bz2 import BZ2File
+        return BZ2File(raw, mode)
+    else:
+        from lzma import LZMAFile
+        return LZMAFile(raw, mode)
+
+
+def _fileno(file):
+    try:
+        return file.fileno()
+    except (AttributeError, OSError, ValueError):
+        return None
+
+
+def _map_file(stack, fd):
+    '''
+    Map a whole file into memory, read-only, registering the mapping to be
+    unmapped with stack. Returns None if fd isn't a mappable file: only
+    non-empty regular files can be mapped.
+    '''
+    from mmap import mmap, ACCESS_READ
+    from stat import S_ISREG
+
+    try:
+        stat = os.fstat(fd)
+        if not S_ISREG(stat.st_mode) or stat.st_size == 0:
+            return None
+        return stack.enter_context(mmap(fd, 0, access=ACCESS_READ))
+    except (OSError, ValueError):
+        return None
+
+
+def _open_mapped(stack, filename_or_file, compression, buffer_size, kwargs):
+    '''
+    Map a file, or an open file object, into memory, if possible. Otherwise,
+    return a binary stream for it.
+    '''
+    if not isinstance(filename_or_file, (str, bytes, int)):
+        fd = _fileno(filename_or_file)
+        mapping = None if fd is None else _map_file(stack, fd)
+        if mapping is None:
+            return getattr(filename_or_file, 'buffer', filename_or_file)
+        return mapping
+
+    file = _open_file(
+        stack, filename_or_file, 'rb', compression, buffer_size, kwargs)
+    if compression not in ('infer', None):
+        return file
+
+    mapping = _map_file(stack, file.fileno())
+    return file if mapping is None else mapping
+
+
+def _stdio(file):
+    '''
+    If file is sys.stdout, and it's still attached to the process's real
+    stdout file descriptor, return that descriptor. Otherwise (for instance,
+    if stdout is redirected to a StringIO), return None.
+    '''
+    if file is not sys.stdout:
+        return None
+
+    return 1 if _fileno(file) == 1 else None
+
+
+def _open_stdio(stack, mode, compression, buffer_size, kwargs):
+    '''
+    Open a new stream for stdout's file descriptor, which isn't closed with
+    it, with a large buffer. Writes are flushed when the stream is closed,
+    rather than line by line, unless it's a terminal.
+    '''
+    stdout = sys.stdout
+    binary = 'b' in mode
+    mode = 'wb' if binary else 'w'
+
+    # Anything already written to sys.stdout has to come first
+    stdout.flush()
+
+    kwargs.setdefault('buffering', buffer_size)
+    kwargs['closefd'] = False
+    if not binary:
+        for key in 'encoding', 'errors':
+            if kwargs.get(key) is None:
+                kwargs[key] = getattr(stdout, key, None)
+
+    file = _open_file(stack, 1, mode, compression, buffer_size, kwargs)
+    if not binary and stdout.isatty():
+        file.reconfigure(line_buffering=True)
+
+    return file
+
+
+def _open_stdin(stack, mode, compression, buffer_size, kwargs):
+    '''
+    Get a stream for stdin: sys.stdin itself, or its binary buffer in binary
+    modes, so that nothing it has already read ahead is lost. If stdin is
+    compressed (which, as with files, is only inferred from its magic bytes
+    in text mode), the stream decompresses its binary buffer instead.
+    '''
+    stdin = sys.stdin
+    binary = 'b' in mode
+    buffer = getattr(stdin, 'buffer', None)
+
+    if buffer is None:
+        # It's been replaced by an object without a binary buffer
+        return stdin
+
+    if compression == 'infer':
+        sniff = not binary and hasattr(buffer, 'peek')
+        compression = sniff_compression(buffer) if sniff else None
+
+    if compression is None:
+        return buffer if binary else stdin
+
+    file = stack.enter_context(_compressed(compression, buffer, 'rb'))
+    file = stack.enter_context(io.BufferedReader(file, buffer_size))
+    if binary:
+        return file
+
+    text_kwargs = {key: kwargs.get(key) for key in _TEXT_PARAMETERS}
+    for key in 'encoding', 'errors':
+        if text_kwargs[key] is None:
+            text_kwargs[key] = getattr(stdin, key, None)
+
+    text = stack.enter_context(io.TextIOWrapper(file, **text_kwargs))
+    text.mode = mode
+    return text
+
+
+def _open_file(stack, filename, mode, compression, buffer_size, kwargs):
+    '''
+    Open a file that might be compressed, registering everything that needs
+    to be closed with stack. Returns the file object.
+    '''
+    reading = 'r' in mode and '+' not in mode
+    binary = 'b' in mode
+
+    if reading:
+        kwargs.setdefault('buffering', buffer_size)
+
+    # Sniffing is only done for text reads, which would fail on compressed
+    # data anyway; binary files that happen to start with a magic number are
+    # left alone.
+    sniff = compression == 'infer' and reading and not binary
+    if compression in ('infer', None) and not sniff:
+        return stack.enter_context(open(filename, mode, **kwargs))
+
+    text_kwargs = {
+        key: kwargs.pop(key) for key in _TEXT_PARAMETERS if key in kwargs}
+    if binary and any(value is not None for value in text_kwargs.values()):
+        raise ValueError("binary mode doesn't take {} arguments".format(
+            '/'.join(sorted(text_kwargs))))
+
+    buffering = kwargs.get('buffering', -1)
+    if buffering == 0 and not binary:
+        raise ValueError("can't have unbuffered text I/O")
+    elif buffering == 1:
+        # Line buffering only applies to the text layer
+        kwargs['buffering'] = -1
+
+    raw_mode = mode.replace('t', '').replace('b', '') + 'b'
+    file = stack.enter_context(open(filename, raw_mode, **kwargs))
+
+    if sniff:
+        compression = sniff_compression(file)
+
+    if compression is not None:
+        file = stack.enter_context(_compressed(compression, file, raw_mode))
+        if reading:
+            file = stack.enter_context(io.BufferedReader(file, buffer_size))
+
+    if binary:
+        return file
+
+    text = stack.enter_context(io.TextIOWrapper(file, **text_kwargs))
+    text.mode = mode
+    return text
+
+
+@contextmanager
+def smart_open(
+        filename_or_file, mode='r', *args,
+        compression='infer',
+        buffer_size=DEFAULT_BUFFER_SIZE,
+        mmap=False,
+        **kwargs):
+    '''
+    This context manager allows you to open a filename, if you want to default
+    some already-existing file object, like sys.stdout, which shouldn't be
+    closed at the end of the context. If the filename argument is a str, bytes,
+    or int, the file object is created via a call to open with the given *args
+    and **kwargs, sent to the context, and closed at the end of the context,
+    just like "with open(filename) as f:". If it isn't one of the openable
+    types, the object simply sent to the context unchanged, and left unclosed
+    at the end of the context. Example:
+
+        def work_with_file(name=sys.stdout):
+            with smart_open(name) as f:
+                # Works correctly if name is a str filename or sys.stdout
+                print("Some stuff", file=f)
+                # If it was a filename, f is closed at the end here.
+
+    Compressed files are transparently decompressed when reading, and
+    compressed when writing. compression is one of 'gzip', 'bz2', or 'xz', to
+    force a format; None, to disable compression; or 'infer' (the default),
+    to infer it from the file extension (.gz, .bz2, .xz, or .lzma) or, when
+    reading in text mode, from the magic bytes at the start of the file.
+    Compressed files are streamed, so they're never loaded into memory all at
+    once.
+
+    Files opened for reading are read in chunks of buffer_size bytes, unless
+    an explicit buffering argument is given.
+
+    The filename '-' means stdin, or stdout if the mode is for writing. For
+    stdin, the context gets sys.stdin (or sys.stdin.buffer, in binary modes),
+    so that it picks up where any earlier reads of sys.stdin left off, or a
+    stream that decompresses it, if it's compressed. For stdout, and for
+    sys.stdout itself, the context gets a new stream for the underlying file
+    descriptor, in the given mode (text or binary), with a buffer of
+    buffer_size bytes. This is much faster than sys.stdout for commands that
+    write a lot of output, because writes are combined into large ones,
+    instead of being written line by line (except to a terminal).
+    Compression applies to it as well. The stream is flushed, but the file
+    descriptor isn't closed, at the end of the context. Don't also use
+    sys.stdout directly while the context is open, since the two aren't
+    flushed in order. If sys.stdout has been replaced by another file object
+    (as it is in some test frameworks), that object is sent to the context
+    instead, as usual.
+
+    With mmap=True, the file is read-only and binary, and it's memory-mapped,
+    rather than read: the context gets a read-only mmap object of the whole
+    file, which supports slicing, find, and memoryview, without copying the
+    data. This also applies to file objects, like sys.stdin, if they're backed
+    by a regular file (these aren't closed, but the mapping is). Files that
+    can't be mapped (pipes, terminals, empty files, and compressed files) are
+    opened as buffered binary streams instead, as are file objects (using
+    their binary buffer, if they're text files). The mapping is unmapped at
+    the end of the context, so any memoryviews of it must be released by
+    then.
+    '''
+    if mmap and mode not in ('r', 'rb'):
+        raise ValueError("mmap mode is read-only, so can't open with mode "
+                         "{!r}".format(mode))
+
+    stdin = False
+    if isinstance(filename_or_file, str) and (
+            filename_or_file == STDIO_FILENAME):
+        stdin = 'r' in mode and '+' not in mode
+        filename_or_file = sys.stdin if stdin else sys.stdout
+        if 'b' in mode and not stdin and _stdio(filename_or_file) is None:
+            filename_or_file = getattr(
+                filename_or_file, 'buffer', filename_or_file)
+
+    stdin = stdin and not mmap
+    stdio_fd = None if mmap else _stdio(filename_or_file)
+
+    if stdio_fd is None and not mmap and not stdin and not isinstance(
+            filename_or_file, (str, bytes, int)):
+        yield filename_or_file
+        return
+
+    if compression not in ('infer', None) and compression not in _COMPRESSIONS:
+        raise ValueError('unknown compression: {!r}'.format(compression))
+
+    if len(args) > len(_OPEN_PARAMETERS):
+        raise TypeError('too many arguments for open')
+    for key, value in zip(_OPEN_PARAMETERS, args):
+        if key in kwargs:
+            raise TypeError(
+                'got multiple values for argument {!r}'.format(key))
+        kwargs[key] = value
+
+    if compression == 'infer' and isinstance(filename_or_file, (str, bytes)):
+        compression = infer_compression(filename_or_file) or compression
+
+    if compression not in ('infer', None) and '+' in mode:
+        raise ValueError("compressed files can't be opened for updating")
+
+    with ExitStack() as stack:
+        if mmap:
+            yield _open_mapped(
+                stack, filename_or_file, compression, buffer_size, kwargs)
+        elif stdin:
+            yield _open_stdin(stack, mode, compression, buffer_size, kwargs)
+        elif stdio_fd is not None:
+            yield _open_stdio(stack, mode, compression, buffer_size, kwargs)
+        else:
+            yield _open_file(
+                stack, filename_or_file, mode, compression, buffer_size,
+                kwargs)
+
+
+# The errors that mean a zero-copy system call can't be used with a pair of
+# file descriptors (because of their types, their file systems, or the OS),
+# so the copy should fall back to another method.
+_UNSUPPORTED_COPY_ERRNOS = {
+    'EBADF', 'EINVAL', 'ENOSYS', 'ENOTSUP', 'EOPNOTSUPP', 'ESPIPE', 'EXDEV'}
+
+# The most to copy in each zero-copy system call
+_ZERO_COPY_CHUNK = 1 << 30
+
+
+def _raw_fd(file):
+    '''
+    Get the file descriptor of a file object that reads or writes it directly,
+    without transforming the data (so not a compressed file), or None.
+    '''
+    raw = getattr(file, 'raw', file)
+    if not isinstance(raw, io.FileIO):
+        return None
+    return _fileno(raw)
+
+
+def _zero_copy(in_fd, out_fd):
+    '''
+    Copy everything from in_fd to out_fd in the kernel, with copy_file_range,
+    sendfile, or splice, whichever is the first to work for these file
+    descriptors. Returns the number of bytes copied, or None if none of them
+    copied anything, in which case nothing was read.
+    '''
+    from errno import errorcode
+
+    chunk = _ZERO_COPY_CHUNK
+    calls = []
+    if hasattr(os, 'copy_file_range'):
+        calls.append(lambda: os.copy_file_range(in_fd, out_fd, chunk))
+    if hasattr(os, 'sendfile'):
+        calls.append(lambda: os.sendfile(out_fd, in_fd, None, chunk))
+    if hasattr(os, 'splice'):
+        calls.append(lambda: os.splice(in_fd, out_fd, chunk))
+
+    for call in calls:
+        total = 0
+        try:
+            while True:
+                copied = call()
+                if not copied:
+                    break
+                total += copied
+        except OSError as e:
+            if total or errorcode.get(e.errno) not in _UNSUPPORTED_COPY_ERRNOS:
+                raise
+            continue
+
+        # Some files (like the ones in /proc) report an empty read through
+        # these calls, even though they have data, so they only count if
+        # they copied something; an empty file is copied by the read loop.
+        if total:
+            return total
+
+    return None
+
+
+def _write_all(dest, data):
+    # Unbuffered files can write less than they're given
+    with memoryview(data) as view:
+        while view:
+            written = dest.write(view)
+            if written is None:
+                raise BlockingIOError('destination would block')
+            view = view[written:]
+
+
+def _copy_stream(source, dest, buffer_size):
+    '''Copy source to dest through a reused buffer of buffer_size bytes'''
+    total = 0
+    readinto = getattr(source, 'readinto', None)
+
+    if readinto is None:
+        while True:
+            data = source.read(buffer_size)
+            if not data:
+                return total
+            _write_all(dest, data)
+            total += len(data)
+
+    buffer = bytearray(buffer_size)
+    with memoryview(buffer) as view:
+        while True:
+            size = readinto(view)
+            if not size:
+                return total
+            _write_all(dest, view[:size])
+            total += size
+
+
+def _copy_text(source, dest, buffer_size):
+    '''
+    Copy a text file to a binary file, encoding it as the text file decodes
+    it, buffer_size characters at a time
+    '''
+    encoding = getattr(source, 'encoding', None) or 'utf-8'
+    errors = getattr(source, 'errors', None) or 'strict'
+    total = 0
+
+    while True:
+        data = source.read(buffer_size)
+        if not data:
+            return total
+        data = data.encode(encoding, errors)
+        _write_all(dest, data)
+        total += len(data)
+
+
+def _text_buffer(file):
+    '''
+    Get the binary buffer of a text file, positioned where the text file is,
+    or None if the text file can't seek, in which case it might have read
+    ahead of its buffer.
+    '''
+    buffer = getattr(file, 'buffer', None)
+    if buffer is None or not file.seekable():
+        return None
+
+    # Seeking the text file to where it is drops its read-ahead, and moves
+    # the buffer back to the same place, unless the position is in the middle
+    # of a multibyte character.
+    position = file.tell()
+    file.seek(position)
+    return buffer if buffer.tell() == position else None
+
+
+def smart_copy(
+        src, dst, *,
+        compression='infer',
+        buffer_size=DEFAULT_BUFFER_SIZE):
+    '''
+    Copy all of the data from src to dst, each of which is a filename or a
+    file object, as with smart_open; file objects are read or written from
+    their current position, and aren't closed. Returns the number of bytes
+    copied. For instance, to write a file to stdout:
+
+        smart_copy(filename, sys.stdout)
+
+    When both ends are uncompressed files with file descriptors (including
+    pipes, and sys.stdin or sys.stdout), the data is copied by the kernel,
+    with copy_file_range, sendfile, or splice, so it never passes through
+    Python. Otherwise, it's copied through a single reused buffer of
+    buffer_size bytes. Text file objects are copied through their binary
+    buffer, from the text file's position (or after they're flushed, for
+    dst). A text src that can't seek, like sys.stdin on a pipe, might have
+    read ahead of its buffer, so it's copied through the text file itself,
+    encoded as it's decoded; pass sys.stdin.buffer (or '-') to copy stdin's
+    binary buffer directly.
+
+    compression applies to both ends, as with smart_open: by default,
+    filenames with a compressed extension are decompressed or compressed.
+    Pass compression=None to copy compressed files as they are.
+    '''
+    # Text files are copied through their binary buffers, where possible
+    text_source = None
+    if isinstance(src, io.TextIOBase):
+        buffer = _text_buffer(src)
+        if buffer is None:
+            text_source = src
+        else:
+            src = buffer
+    if not isinstance(dst, (str, bytes, int)):
+        dst.flush()
+        dst = getattr(dst, 'buffer', dst)
+
+    if text_source is not None:
+        with smart_open(
+                dst, 'wb', buffering=0, compression=compression) as dest:
+            total = _copy_text(text_source, dest, buffer_size)
+            dest.flush()
+            return total
+
+    # Files opened here are unbuffered, so there's never data in a Python
+    # buffer that the kernel copy would skip.
+    with smart_open(
+            src, 'rb', buffering=0,
+            compression=compression,
+            buffer_size=buffer_size) as source, \
+            smart_open(
+                dst, 'wb', buffering=0,
+                compression=compression) as dest:
+        total = 0
+        in_fd = _raw_fd(source)
+        out_fd = _raw_fd(dest)
+
+        if in_fd is not None and out_fd is not None:
+            # A buffered file object might have read ahead; that data needs
+            # to be written before the rest of the file.
+            if isinstance(source, io.BufferedReader):
+                pending = source.peek(1)
+                source.read(len(pending))
+                _write_all(dest, pending)
+                total += len(pending)
+            dest.flush()
+
+            copied = _zero_copy(in_fd, out_fd)
+            if copied is not None:
+                return total + copied
+
+        total += _copy_stream(source, dest, buffer_size)
+        dest.flush()
+        return total
@@ -0,0 +1,360 @@
+# Copyright 2014-2016 Nathan West
+#
+# This file is part of autocommand.
+#
+# autocommand is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# autocommand is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with autocommand.  If not, see <http://www.gnu.org/licenses/>.
+
+'''
+An on-disk cache for the argument specs generated by autoparse. Each decorated
+function gets a file in the cache directory, named after the function's
+qualified name, a checksum of the file that defines it, and a checksum of its
+parameters and docstring, so that changing either one automatically
+invalidates the cached specs. The file also records the parameters and
+docstring in full, so that a checksum collision can't load the wrong specs.
+The defining file is part of the name because the main function of every
+script is called __main__.main, and each script needs its own entry.
+
+The point of the cache is a fast start, so a warm start doesn't inspect the
+function's signature (importing inspect costs more than generating the specs
+does). The parameters are described straight from the function's code
+object, defaults, and annotations, and the file holds everything else
+autoparse needs to parse a command line: the description, the epilog, and
+the names of the positional, *args, and keyword-only parameters. The data is
+stored with marshal, which, unlike json and ast, doesn't have to be imported;
+like the bytecode in __pycache__, the files are trusted.
+
+Only specs that can be faithfully reconstructed are cached. Types are stored
+as references to importable module attributes, and defaults are stored either
+as scalars (None, bools, ints, floats, and strings) or as references to the
+default of the parameter with the same name, which is retrieved from the
+function at load time. Functions whose parameters can't be described exactly,
+and specs that can't be stored this way (for instance, because a type is a
+lambda), are simply not cached.
+'''
+
+import os
+import sys
+from io import IOBase
+from marshal import dumps, loads
+from zlib import crc32
+
+
+# Bump this whenever the format of the cache files, or the way that autoparse
+# creates argument specs, changes.
+CACHE_VERSION = 3
+
+_SCALARS = (type(None), bool, int, float, str)
+
+_SAFE_FILENAME_CHARS = frozenset('.-_')
+
+
+class _UncacheableSpecError(Exception):
+    '''Raised internally when an argument spec can't be stored'''
+
+
+def default_cache_dir():
+    '''
+    Get the default cache directory: $XDG_CACHE_HOME/autocommand, or
+    ~/.cache/autocommand if XDG_CACHE_HOME isn't set.
+    '''
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(
+        os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'autocommand')
+
+
+def _unwrap(func):
+    '''
+    Follow the __wrapped__ chain of func, the same way inspect.signature does.
+    Return the innermost function and its __signature__, if it has one.
+    '''
+    while True:
+        func_sig = getattr(func, '__signature__', None)
+        if func_sig is not None or not hasattr(func, '__wrapped__'):
+            return func, func_sig
+        func = func.__wrapped__
+
+
+def _parameter_defaults(func):
+    '''Get the defaults of the parameters of func, as a dict'''
+    func, func_sig = _unwrap(func)
+    if func_sig is not None:
+        return {
+            param.name: param.default
+            for param in func_sig.parameters.values()}
+
+    code = func.__code__
+    names = code.co_varnames[:code.co_argcount]
+    defaults = func.__defaults__ or ()
+    result = dict(zip(names[len(names) - len(defaults):], defaults))
+    result.update(func.__kwdefaults__ or {})
+    return result
+
+
+def _describe(value, default):
+    '''
+    Describe an annotation, or a default, exactly: literals by their repr,
+    tuples by their items, and types (or, for defaults, the types of other
+    values) by an importable reference. Raises _UncacheableSpecError for
+    anything else.
+    '''
+    if type(value) in _SCALARS:
+        return repr(value)
+    elif type(value) is tuple and not default:
+        return '({})'.format(
+            ', '.join(_describe(item, default) for item in value))
+    elif default and isinstance(value, IOBase):
+        # autoparse treats all stream defaults the same way, and their exact
+        # type can vary (for instance, when sys.stdout is redirected).
+        return '<stream>'
+    elif default:
+        # Only the type of other defaults affects the specs
+        return '<{}>'.format(_type_reference(type(value)))
+    else:
+        return _type_reference(value)
+
+
+def parameters_key(func, add_nos):
+    '''
+    Get the string identifying the parts of a function that determine how its
+    command line is parsed: its parameters, and whether it has --no-
+    switches. Unless the function has a __signature__, it's described
+    without inspecting its signature. Raises _UncacheableSpecError if the
+    parameters can't be described exactly (for instance, if func isn't a
+    plain Python function).
+    '''
+    inner, func_sig = _unwrap(func)
+    parts = [str(bool(add_nos))]
+
+    if func_sig is not None:
+        for param in func_sig.parameters.values():
+            parts.extend((param.name, str(int(param.kind))))
+            for value, default in (
+                    (param.default, True), (param.annotation, False)):
+                parts.append(
+                    '-' if value is param.empty else _describe(value, default))
+        return '\0'.join(parts)
+
+    code = getattr(inner, '__code__', None)
+    if code is None:
+        raise _UncacheableSpecError(func)
+
+    flags = code.co_flags
+    parts.extend((
+        str(code.co_argcount),
+        str(getattr(code, 'co_posonlyargcount', 0)),
+        str(code.co_kwonlyargcount),
+        str(flags & 0x0C)))
+
+    parts.extend(code.co_varnames[
+        :code.co_argcount + code.co_kwonlyargcount +
+        bool(flags & 0x04) + bool(flags & 0x08)])
+
+    for default in inner.__defaults__ or ():
+        parts.append(_describe(default, True))
+    for name, default in sorted((inner.__kwdefaults__ or {}).items()):
+        parts.extend((name, _describe(default, True)))
+    for name, annotation in sorted(inner.__annotations__.items()):
+        if name != 'return':
+            parts.extend((name, _describe(annotation, False)))
+
+    return '\0'.join(parts)
+
+
+def function_key(func, add_nos):
+    '''
+    Get the string identifying a particular version of a function's
+    parameters and docstring, in a particular file, without inspecting its
+    signature. Raises _UncacheableSpecError if they can't be described
+    exactly, or if the function has a __signature__.
+    '''
+    inner, func_sig = _unwrap(func)
+    if func_sig is not None or not hasattr(inner, '__code__'):
+        raise _UncacheableSpecError(func)
+
+    return '\0'.join((
+        str(CACHE_VERSION),
+        sys.implementation.cache_tag or '',
+        func.__module__,
+        func.__qualname__,
+        inner.__code__.co_filename,
+        func.__doc__ or '',
+        parameters_key(func, add_nos)))
+
+
+def _cache_stem(func):
+    '''
+    Get the part of the name of a function's cache files that stays the same
+    across versions of the function: its qualified name, and a checksum of
+    the file that defines it. Older versions are evicted by this prefix.
+    '''
+    filename = _unwrap(func)[0].__code__.co_filename
+    name = ''.join(
+        char if char.isalnum() or char in _SAFE_FILENAME_CHARS else '_'
+        for char in '{}.{}'.format(func.__module__, func.__qualname__))
+    return '{}.{:08x}'.format(
+        name, crc32(filename.encode('utf-8', 'surrogatepass')))
+
+
+def _cache_path(cache_dir, func, key):
+    return os.path.join(cache_dir, '{}.{:08x}.spec'.format(
+        _cache_stem(func), crc32(key.encode('utf-8', 'surrogatepass'))))
+
+
+def _type_reference(arg_type):
+    '''
+    Get a "module:qualname" reference to a type. Raises _UncacheableSpecError
+    if the type can't be retrieved by importing that reference.
+    '''
+    module = getattr(arg_type, '__module__', None)
+    qualname = getattr(arg_type, '__qualname__', None)
+
+    if module is None or qualname is None or '<' in qualname:
+        raise _UncacheableSpecError(arg_type)
+
+    reference = '{}:{}'.format(module, qualname)
+
+    try:
+        resolved = _resolve_type_reference(reference)
+    except (ImportError, AttributeError) as e:
+        raise _UncacheableSpecError(arg_type) from e
+
+    if resolved is not arg_type:
+        raise _UncacheableSpecError(arg_type)
+
+    return reference
+
+
+def _resolve_type_reference(reference):
+    module, qualname = reference.split(':', 1)
+    obj = sys.modules.get(module)
+    if obj is None:
+        __import__(module)
+        obj = sys.modules[module]
+    for attr in qualname.split('.'):
+        obj = getattr(obj, attr)
+    return obj
+
+
+def _encode_spec(flags, arg_spec, defaults):
+    encoded = {}
+    for key, value in arg_spec.items():
+        if key == 'type':
+            encoded[key] = ('$type', _type_reference(value))
+        elif type(value) in _SCALARS:
+            encoded[key] = value
+        else:
+            name = arg_spec.get('dest', flags[0])
+            if name not in defaults or value is not defaults[name]:
+                raise _UncacheableSpecError(value)
+            encoded[key] = ('$default', name)
+
+    return tuple(flags), encoded
+
+
+def _decode_spec(flags, encoded, defaults):
+    arg_spec = {}
+    for key, value in encoded.items():
+        if type(value) is tuple:
+            kind, reference = value
+            if kind == '$type':
+                value = _resolve_type_reference(reference)
+            else:
+                value = defaults[reference]
+        arg_spec[key] = value
+
+    return list(flags), arg_spec
+
+
+def load_specs(cache_dir, func, add_nos):
+    '''
+    Load the cached argument specs for a function, and the rest of what was
+    stored with them. Returns (specs, description, epilog, call_layout), or
+    None if there are no cached specs for this version of the function, or if
+    they can't be loaded for any reason.
+    '''
+    try:
+        key = function_key(func, add_nos)
+
+        with open(_cache_path(cache_dir, func, key), 'rb') as file:
+            data = loads(file.read())
+
+        if data['key'] != key:
+            return None
+
+        defaults = _parameter_defaults(func)
+        positional, varargs, keyword = data['layout']
+        return (
+            [_decode_spec(flags, spec, defaults)
+             for flags, spec in data['specs']],
+            data['description'],
+            data['epilog'],
+            (list(positional), varargs, list(keyword)))
+    except (OSError, EOFError, ValueError, LookupError, TypeError,
+            ImportError, AttributeError, _UncacheableSpecError):
+        return None
+
+
+def store_specs(
+        cache_dir, func, add_nos, specs, description, epilog, call_layout):
+    '''
+    Store the argument specs for a function, along with its description,
+    epilog, and call layout (see autoparse), replacing any cached specs for
+    older versions of the same function. Returns True if the specs were
+    stored. Errors writing the cache are ignored.
+    '''
+    try:
+        key = function_key(func, add_nos)
+        defaults = _parameter_defaults(func)
+        positional, varargs, keyword = call_layout
+        data = dumps({
+            'key': key,
+            'description': description,
+            'epilog': epilog,
+            'layout': (tuple(positional), varargs, tuple(keyword)),
+            'specs': tuple(
+                _encode_spec(flags, arg_spec, defaults)
+                for flags, arg_spec in specs)})
+    except (_UncacheableSpecError, ValueError):
+        return False
+
+    path = _cache_path(cache_dir, func, key)
+    prefix = _cache_stem(func) + '.'
+
+    # tempfile is slow to import, and only needed on a cache miss
+    from tempfile import NamedTemporaryFile
+
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+
+        # Write to a temporary file and rename it into place, so that
+        # concurrent invocations never see a partially written cache file.
+        with NamedTemporaryFile(
+                'wb', dir=cache_dir, suffix='.tmp', delete=False) as file:
+            try:
+                file.write(data)
+            except BaseException:
+                os.remove(file.name)
+                raise
+        os.replace(file.name, path)
+
+        for filename in os.listdir(cache_dir):
+            stale = os.path.join(cache_dir, filename)
+            if (filename.startswith(prefix) and
+                    filename.endswith('.spec') and stale != path and
+                    filename.count('.') == prefix.count('.') + 1):
+                os.remove(stale)
+    except OSError:
+        return False
+
+    return True
@@ -0,0 +1,390 @@
+# Copyright 2014-2016 Nathan West
+#
+# This file is part of autocommand.
+#
+# autocommand is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# autocommand is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with autocommand.  If not, see <http://www.gnu.org/licenses/>.
+
+'''
+Render the --help of a command without importing its module. The module's
+source is parsed with `ast`, and the decorated function's parameters,
+annotations, defaults, and docstring are read from the syntax tree. This is
+enough to build the same ArgumentParser that autoparse would, as far as --help
+is concerned: the help text doesn't depend on the types of the parameters,
+only on their names, whether they have defaults, whether they are bool
+switches, and their descriptions.
+
+Anything that can't be determined from the source alone makes static_parser
+return None, and the caller should import the command instead. That includes
+unknown decorators, custom parsers, the jobs option, `from __future__ import
+annotations`, and defaults that refer to names imported from other modules.
+In an annotation, a name imported from another module is assumed to be a
+plain type, unless it comes from autocommand or typing: those might be types
+that autoparse handles specially, like ArgStream or List[int], which collect
+any number of arguments. Subscripted annotations, like list[int], can't be
+handled statically for the same reason.
+'''
+
+import ast
+import builtins
+import sys
+from importlib.util import find_spec
+from inspect import Parameter, Signature, cleandoc
+from autocommand.autoparse import make_parser, parse_docstring
+
+
+# The names of the decorators that static_parser understands
+_AUTOPARSE = 'autoparse'
+_AUTOCOMMAND = 'autocommand'
+_AUTOASYNC = 'autoasync'
+
+_HELP_FLAGS = (['-h'], ['--help'])
+
+
+class _Unresolvable(Exception):
+    '''Raised internally when something can't be determined statically'''
+
+
+class _Opaque:
+    '''
+    Stands in for a default value that can't be evaluated statically, but
+    which is known not to be a bool, str, or None (for instance, sys.stdout).
+    '''
+
+
+def _placeholder_type(value):
+    '''Stands in for a parameter type that isn't bool'''
+    return value
+
+
+# Bindings of module-level names
+_LITERAL = 'literal'
+_DEFINITION = 'definition'
+_IMPORTED = 'imported'
+_UNKNOWN = 'unknown'
+
+# Modules whose types autoparse might handle specially
+_SPECIAL_MODULES = frozenset({'autocommand', 'typing', 'typing_extensions'})
+
+
+def _module_bindings(statements):
+    '''
+    Determine what each module-level name is bound to by a list of statements.
+    Returns a dict mapping names to (kind, value) pairs. Only simple,
+    unconditional definitions, assignments, and imports are understood; names
+    bound by anything else are _UNKNOWN. The value of an _IMPORTED name is the
+    dotted name of what it was imported from.
+    '''
+    bindings = {}
+
+    for statement in statements:
+        if isinstance(statement, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            bindings[statement.name] = (_DEFINITION, None)
+        elif isinstance(statement, ast.ClassDef):
+            # A subclass of ArgStream (for instance) is handled specially
+            bindings[statement.name] = (_UNKNOWN, None) if any(
+                _special_annotation(base, bindings)
+                for base in statement.bases) else (_DEFINITION, None)
+        elif isinstance(statement, ast.Import):
+            for alias in statement.names:
+                if alias.asname is None:
+                    name = alias.name.partition('.')[0]
+                    bindings[name] = (_IMPORTED, name)
+                else:
+                    bindings[alias.asname] = (_IMPORTED, alias.name)
+        elif isinstance(statement, ast.ImportFrom):
+            module = '.' * statement.level + (statement.module or '')
+            for alias in statement.names:
+                bindings[alias.asname or alias.name] = (
+                    _IMPORTED, '{}.{}'.format(module, alias.name))
+        elif (isinstance(statement, ast.Assign) and
+                len(statement.targets) == 1 and
+                isinstance(statement.targets[0], ast.Name)):
+            try:
+                value = (_LITERAL, ast.literal_eval(statement.value))
+            except (ValueError, TypeError):
+                value = (_UNKNOWN, None)
+            bindings[statement.targets[0].id] = value
+        else:
+            for node in ast.walk(statement):
+                if isinstance(node, ast.Name) and not isinstance(
+                        node.ctx, ast.Load):
+                    bindings[node.id] = (_UNKNOWN, None)
+                elif isinstance(node, ast.alias):
+                    name = node.asname or node.name.partition('.')[0]
+                    bindings[name] = (_UNKNOWN, None)
+                elif isinstance(node, (
+                        ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                    bindings[node.name] = (_UNKNOWN, None)
+
+    return bindings
+
+
+def _special_annotation(node, bindings):
+    '''
+    Check if an annotation might be a type that autoparse handles specially,
+    which changes how the parameter is shown in the help. That's anything
+    subscripted, or anything that comes from autocommand or typing, or from a
+    name that isn't bound to something known.
+    '''
+    while isinstance(node, (ast.Attribute, ast.Call, ast.Subscript)):
+        if isinstance(node, ast.Subscript):
+            return True
+        node = node.func if isinstance(node, ast.Call) else node.value
+
+    if not isinstance(node, ast.Name):
+        return False
+
+    kind, value = bindings.get(node.id, (None, None))
+    if kind is None:
+        return not hasattr(builtins, node.id)
+    elif kind is _IMPORTED:
+        return value.partition('.')[0] in _SPECIAL_MODULES
+    else:
+        return kind is _UNKNOWN
+
+
+def _evaluate(node, bindings, annotation):
+    '''
+    Statically evaluate a default or annotation. Returns the value, if it can
+    be determined, or a stand-in with the same effect on the help text.
+    Raises _Unresolvable if neither is possible.
+    '''
+    try:
+        return ast.literal_eval(node)
+    except (ValueError, TypeError):
+        pass
+
+    if annotation and _special_annotation(node, bindings):
+        raise _Unresolvable(node)
+
+    if isinstance(node, ast.Name):
+        kind, value = bindings.get(node.id, (None, None))
+        if kind is _LITERAL:
+            return value
+        elif kind is _DEFINITION:
+            return _placeholder_type
+        elif kind is None and hasattr(builtins, node.id):
+            return getattr(builtins, node.id)
+        elif not annotation:
+            raise _Unresolvable(node.id)
+
+    elif isinstance(node, ast.Tuple):
+        return tuple(
+            _evaluate(element, bindings, annotation)
+            for element in node.elts)
+
+    elif isinstance(node, (ast.JoinedStr, ast.BinOp)):
+        # These could evaluate to strings, which are meaningful as both
+        # annotations and defaults
+        raise _Unresolvable(node)
+
+    # Anything else (an attribute, call, subscript, lambda, etc) is assumed
+    # to be a type, when used as an annotation, or an opaque object, when
+    # used as a default.
+    return _placeholder_type if annotation else _Opaque()
+
+
+def _decorator_options(decorator):
+    '''
+    Get the name and keyword arguments of a decorator, if it's one of the
+    autocommand decorators. Returns None for any other decorator.
+    '''
+    options = {}
+    if isinstance(decorator, ast.Call):
+        for keyword in decorator.keywords:
+            if keyword.arg is None:
+                return None
+            options[keyword.arg] = keyword.value
+        decorator = decorator.func
+
+    if isinstance(decorator, ast.Name):
+        name = decorator.id
+    elif isinstance(decorator, ast.Attribute):
+        name = decorator.attr
+    else:
+        return None
+
+    if name not in (_AUTOPARSE, _AUTOCOMMAND, _AUTOASYNC):
+        return None
+
+    return name, options
+
+
+def _literal_option(options, name, default):
+    node = options.get(name)
+    if node is None:
+        return default
+
+    try:
+        return ast.literal_eval(node)
+    except ValueError as e:
+        raise _Unresolvable(name) from e
+
+
+def _parameters(args, bindings):
+    '''Convert an ast.arguments into a list of inspect.Parameters'''
+    if getattr(args, 'posonlyargs', None) or args.kwarg is not None:
+        # Let autoparse raise the appropriate error
+        raise _Unresolvable(args)
+
+    def make_param(arg, kind, default=None):
+        return Parameter(
+            arg.arg, kind,
+            default=(
+                Parameter.empty if default is None
+                else _evaluate(default, bindings, annotation=False)),
+            annotation=(
+                Parameter.empty if arg.annotation is None
+                else _evaluate(arg.annotation, bindings, annotation=True)))
+
+    params = []
+    defaults = [None] * (len(args.args) - len(args.defaults)) + args.defaults
+    for arg, default in zip(args.args, defaults):
+        params.append(
+            make_param(arg, Parameter.POSITIONAL_OR_KEYWORD, default))
+
+    if args.vararg is not None:
+        params.append(make_param(args.vararg, Parameter.VAR_POSITIONAL))
+
+    for arg, default in zip(args.kwonlyargs, args.kw_defaults):
+        params.append(make_param(arg, Parameter.KEYWORD_ONLY, default))
+
+    return params
+
+
+def _find_function(tree, name):
+    '''
+    Find the last unconditional, module-level definition of a function.
+    Returns the definition and the bindings of the module-level names at the
+    point where it's defined.
+    '''
+    for index in reversed(range(len(tree.body))):
+        node = tree.body[index]
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) and (
+                node.name == name):
+            return node, _module_bindings(tree.body[:index])
+
+    raise _Unresolvable(name)
+
+
+def _future_annotations(tree):
+    return any(
+        isinstance(node, ast.ImportFrom) and node.module == '__future__' and
+        any(alias.name == 'annotations' for alias in node.names)
+        for node in tree.body)
+
+
+def _static_parser(source, function_name):
+    tree = ast.parse(source)
+
+    # With postponed evaluation, every annotation is a string, so the help
+    # text depends on exactly how each annotation is rendered.
+    if _future_annotations(tree):
+        raise _Unresolvable('annotations')
+
+    function, bindings = _find_function(tree, function_name)
+
+    decorators = [
+        _decorator_options(decorator)
+        for decorator in function.decorator_list]
+    if not decorators or None in decorators:
+        raise _Unresolvable(function.decorator_list)
+
+    description = epilog = None
+    add_nos = pass_loop = False
+
+    for name, options in decorators:
+        if name == _AUTOASYNC:
+            pass_loop = _literal_option(options, 'pass_loop', pass_loop)
+            continue
+
+        if 'parser' in options or 'jobs' in options:
+            raise _Unresolvable('parser')
+
+        description = _literal_option(options, 'description', description)
+        epilog = _literal_option(options, 'epilog', epilog)
+        add_nos = _literal_option(options, 'add_nos', add_nos)
+        if name == _AUTOCOMMAND:
+            pass_loop = _literal_option(options, 'pass_loop', pass_loop)
+
+    params = _parameters(function.args, bindings)
+    if pass_loop:
+        params = [param for param in params if param.name != 'loop']
+
+    docstring = ast.get_docstring(function, clean=False)
+    docstr_description, docstr_epilog = parse_docstring(
+        None if docstring is None else cleandoc(docstring))
+
+    return make_parser(
+        Signature(params),
+        description or docstr_description,
+        epilog or docstr_epilog,
+        add_nos)
+
+
+def static_parser(target):
+    '''
+    Build an ArgumentParser for the --help of a "module:function" target,
+    without importing the module. The function must be decorated with
+    autoparse or autocommand (and optionally autoasync), and be defined at the
+    top level of its module. The parser is only suitable for rendering help,
+    since its argument types are placeholders.
+
+    Returns None if the target can't be handled statically, or if its module
+    has already been imported; in either case, the caller should use the real
+    parser instead.
+    '''
+    module_name, _, function_name = target.partition(':')
+    if module_name in sys.modules or '.' in function_name:
+        return None
+
+    try:
+        spec = find_spec(module_name)
+    except (ImportError, ValueError):
+        return None
+
+    if spec is None or not spec.has_location or not (
+            spec.origin or '').endswith('.py'):
+        return None
+
+    try:
+        with open(spec.origin, 'rb') as file:
+            source = file.read()
+        return _static_parser(source, function_name)
+    except (OSError, SyntaxError, ValueError, TypeError, _Unresolvable):
+        return None
+
+
+def is_help_request(argv):
+    '''Check if argv is nothing more than a request for --help'''
+    return list(argv) in _HELP_FLAGS
+
+
+def run(target, argv=None):
+    '''
+    Run a "module:function" autoparse target with argv (by default,
+    sys.argv[1:]). If argv is just -h or --help, the help is rendered
+    statically if possible, without importing the target's module.
+    '''
+    from autocommand.group import resolve_target
+
+    if argv is None:
+        argv = sys.argv[1:]
+
+    if is_help_request(argv):
+        parser = static_parser(target)
+        if parser is not None:
+            return parser.parse_args(argv)
+
+    return resolve_target(target)(argv)
@@ -216,3 +216,283 @@ def test_defered_loop(context_loop, new_loop):
         assert passed_loop is not context_loop
 
     assert passed_loop is not asyncio.get_event_loop()
+
+
+def test_async_generator(context_loop, capsys):
+    @autoasync(encoder='jsonl')
+    async def produce(count):
+        for i in range(count):
+            await YieldOnce()
+            yield {'value': i}
+
+    assert produce(3) is None
+    assert capsys.readouterr().out == (
+        '{"value":0}\n{"value":1}\n{"value":2}\n')
+
+
+def test_async_generator_forever(context_loop, capsys):
+    @autoasync(forever=True)
+    async def produce():
+        # The loop keeps running after the items are written
+        asyncio.get_event_loop().call_later(0.2, context_loop.stop)
+        yield 'first'
+        yield 'second'
+
+    produce()
+    assert capsys.readouterr().out == 'first\nsecond\n'
+
+
+ASYNC_GENERATOR_SCRIPT = '''\
+import asyncio
+import atexit
+import os
+import sys
+from autocommand import autocommand
+
+# stdout is blocking again when the generator is done
+atexit.register(lambda: os.get_blocking(1) or sys.stderr.write('nonblocking'))
+
+@autocommand(__name__, loop=True)
+async def main(count: int, delay: float =0.0, width: int =0, progress=None):
+    if progress:
+        # The count only grows, so overwriting it in place is never torn
+        progress = os.open(progress, os.O_WRONLY | os.O_CREAT)
+    for i in range(count):
+        if delay or progress:
+            await asyncio.sleep(delay)
+        if progress:
+            os.pwrite(progress, str(i + 1).encode(), 0)
+        yield str(i).rjust(width)
+'''
+
+
+def run_script(tmpdir, *args):
+    import os
+    import subprocess
+    import sys
+
+    path = tmpdir.join('script.py')
+    path.write(ASYNC_GENERATOR_SCRIPT)
+    return subprocess.Popen(
+        [sys.executable, str(path)] + list(args),
+        env=dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path)),
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+
+def test_async_generator_pipe(tmpdir):
+    process = run_script(tmpdir, '200000')
+    stdout, stderr = process.communicate(timeout=30)
+
+    assert process.returncode == 0
+    assert stderr == b''
+    assert stdout.split() == [str(i).encode() for i in range(200000)]
+
+
+def test_async_generator_streams_items(tmpdir):
+    # Items that arrive slowly are written as they arrive, not in batches
+    process = run_script(tmpdir, '3', '-d', '0.3')
+    assert process.stdout.readline() == b'0\n'
+    process.kill()
+    process.communicate()
+
+
+def test_async_generator_backpressure(tmpdir):
+    # A generator that awaits between items, so that each one is written by
+    # itself, still waits for a reader that falls behind
+    import time
+
+    progress = tmpdir.join('progress')
+    process = run_script(tmpdir, '20000', '-w', '1000', '-p', str(progress))
+
+    deadline = time.monotonic() + 10
+    while not progress.check() and time.monotonic() < deadline:
+        time.sleep(0.05)
+    time.sleep(1)
+    produced = int(progress.read())
+
+    stdout, stderr = process.communicate(timeout=30)
+    assert process.returncode == 0
+    assert stderr == b''
+    assert stdout.split() == [str(i).encode() for i in range(20000)]
+    # The pipe and the transport's buffer only hold a few hundred items
+    assert produced < 2000
+
+
+def test_async_generator_broken_pipe(tmpdir):
+    process = run_script(tmpdir, str(10 ** 7))
+    assert process.stdout.readline() == b'0\n'
+    process.stdout.close()
+
+    assert process.wait(timeout=30) == 1
+    assert process.stderr.read() == b''
+    process.stderr.close()
+
+
+class CustomLoop(asyncio.SelectorEventLoop):
+    pass
+
+
+def test_loop_factory():
+    loops = []
+
+    def factory():
+        loop = CustomLoop()
+        loops.append(loop)
+        return loop
+
+    @autoasync(loop_factory=factory)
+    async def get_loop(value):
+        await YieldOnce()
+        return asyncio.get_running_loop(), value
+
+    first, value = get_loop(1)
+    second, _ = get_loop(2)
+
+    assert value == 1
+    assert loops == [first, second]
+    assert isinstance(first, CustomLoop)
+    assert first.is_closed() and second.is_closed()
+
+
+def test_loop_factory_cancels_tasks():
+    cancelled = False
+
+    async def background():
+        nonlocal cancelled
+        try:
+            await asyncio.sleep(60)
+        except asyncio.CancelledError:
+            cancelled = True
+            raise
+
+    @autoasync(loop_factory=CustomLoop)
+    async def main():
+        asyncio.ensure_future(background())
+        await asyncio.sleep(0)
+
+    main()
+    assert cancelled
+
+
+def test_loop_factory_pass_loop():
+    @autoasync(loop_factory=CustomLoop, pass_loop=True)
+    async def main(loop):
+        assert loop is asyncio.get_running_loop()
+        return type(loop)
+
+    assert main() is CustomLoop
+
+
+def test_loop_factory_forever():
+    @autoasync(loop_factory=CustomLoop, forever=True)
+    async def main():
+        asyncio.get_running_loop().call_soon(
+            asyncio.get_running_loop().stop)
+
+    main()
+
+
+def test_loop_factory_keeps_current_loop(context_loop):
+    @autoasync(loop_factory=CustomLoop)
+    async def factory_loop():
+        return asyncio.get_event_loop()
+
+    @autoasync
+    async def current_loop():
+        return asyncio.get_event_loop()
+
+    assert isinstance(factory_loop(), CustomLoop)
+    assert current_loop() is context_loop
+    assert asyncio.get_event_loop() is context_loop
+
+    from autocommand.autoasync import PersistentLoop
+    with PersistentLoop(loop_factory=CustomLoop):
+        assert isinstance(current_loop(), CustomLoop)
+    assert current_loop() is context_loop
+
+
+def test_loop_and_loop_factory(new_loop):
+    from autocommand.autoasync import LoopFactoryError
+
+    with pytest.raises(LoopFactoryError):
+        @autoasync(loop=new_loop, loop_factory=CustomLoop)
+        async def main():
+            pass
+
+
+def test_persistent_loop():
+    from autocommand import PersistentLoop
+
+    @autoasync(loop_factory=CustomLoop)
+    async def get_loop():
+        return asyncio.get_running_loop()
+
+    with PersistentLoop() as persistent:
+        first = get_loop()
+        second = get_loop()
+
+    assert first is second is persistent.loop
+    assert not isinstance(first, CustomLoop)
+    assert first.is_closed()
+    assert persistent.closed
+
+    # Outside the context, the wrapper creates its own loops again
+    third = get_loop()
+    assert isinstance(third, CustomLoop)
+
+
+def test_persistent_loop_keeps_state():
+    from autocommand.autoasync import PersistentLoop
+
+    cancelled = False
+
+    async def background():
+        nonlocal cancelled
+        try:
+            await asyncio.sleep(60)
+        except asyncio.CancelledError:
+            cancelled = True
+            raise
+
+    tasks = []
+
+    @autoasync
+    async def main():
+        if not tasks:
+            tasks.append(asyncio.ensure_future(background()))
+        await asyncio.sleep(0)
+        return tasks[0].done()
+
+    with PersistentLoop(loop_factory=CustomLoop) as persistent:
+        assert isinstance(persistent.loop, CustomLoop)
+        assert main() is False
+        assert main() is False
+        assert not cancelled
+
+    assert cancelled
+
+
+def test_persistent_loop_explicit_loop(new_loop):
+    from autocommand.autoasync import PersistentLoop
+
+    @autoasync(loop=new_loop)
+    async def get_loop():
+        return asyncio.get_running_loop()
+
+    with PersistentLoop():
+        assert get_loop() is new_loop
+
+
+def test_persistent_loop_runner():
+    from autocommand.autoasync import PersistentLoop
+
+    persistent = PersistentLoop()
+    assert persistent.run(asyncio.sleep(0, 'result')) == 'result'
+
+    persistent.close()
+    persistent.close()
+    assert persistent.loop.is_closed()
+
+    with pytest.raises(RuntimeError):
+        with persistent:
+            pass
@@ -82,7 +82,12 @@ def test_autocommand_no_async(
         description=sentinel.description,
         epilog=sentinel.epilog,
         add_nos=sentinel.add_nos,
-        parser=sentinel.parser)(sentinel.original_function)
+        parser=sentinel.parser,
+        lazy=sentinel.lazy,
+        cache=sentinel.cache,
+        fast=sentinel.fast,
+        jobs=sentinel.jobs,
+        chunk_size=sentinel.chunk_size)(sentinel.original_function)
 
     assert not patched_autoasync.called
 
@@ -91,11 +96,18 @@ def test_autocommand_no_async(
         description=sentinel.description,
         epilog=sentinel.epilog,
         add_nos=sentinel.add_nos,
-        parser=sentinel.parser)
+        parser=sentinel.parser,
+        lazy=sentinel.lazy,
+        cache=sentinel.cache,
+        fast=sentinel.fast,
+        jobs=sentinel.jobs,
+        chunk_size=sentinel.chunk_size)
 
     autoparse_wrapped = patched_autoparse.return_value
 
-    patched_automain.assert_called_once_with(sentinel.module)
+    patched_automain.assert_called_once_with(
+        sentinel.module, server=None, idle_timeout=None, stdout_buffer=None,
+        encoder=None)
     patched_automain.return_value.assert_called_once_with(autoparse_wrapped)
 
     automain_wrapped = patched_automain.return_value.return_value
@@ -119,6 +131,11 @@ def test_autocommand_with_async(
         epilog=sentinel.epilog,
         add_nos=sentinel.add_nos,
         parser=sentinel.parser,
+        lazy=sentinel.lazy,
+        cache=sentinel.cache,
+        fast=sentinel.fast,
+        jobs=sentinel.jobs,
+        chunk_size=sentinel.chunk_size,
         loop=input_loop,
         forever=sentinel.forever,
         pass_loop=sentinel.pass_loop)(sentinel.original_function)
@@ -127,7 +144,9 @@ def test_autocommand_with_async(
         sentinel.original_function,
         loop=output_loop,
         forever=sentinel.forever,
-        pass_loop=sentinel.pass_loop)
+        pass_loop=sentinel.pass_loop,
+        encoder=None,
+        loop_factory=None)
     autoasync_wrapped = patched_autoasync.return_value
 
     patched_autoparse.assert_called_once_with(
@@ -135,10 +154,17 @@ def test_autocommand_with_async(
         description=sentinel.description,
         epilog=sentinel.epilog,
         add_nos=sentinel.add_nos,
-        parser=sentinel.parser)
+        parser=sentinel.parser,
+        lazy=sentinel.lazy,
+        cache=sentinel.cache,
+        fast=sentinel.fast,
+        jobs=sentinel.jobs,
+        chunk_size=sentinel.chunk_size)
     autoparse_wrapped = patched_autoparse.return_value
 
-    patched_automain.assert_called_once_with(sentinel.module)
+    patched_automain.assert_called_once_with(
+        sentinel.module, server=None, idle_timeout=None, stdout_buffer=None,
+        encoder=None)
     patched_automain.return_value.assert_called_once_with(autoparse_wrapped)
     automain_wrapped = patched_automain.return_value.return_value
     assert automain_wrapped is autocommand_wrapped
@@ -66,3 +66,116 @@ def test_args_and_kwargs():
             assert b == 2
 
     assert main_called
+
+
+BUFFERED_SCRIPT = '''\
+import sys
+from autocommand.automain import automain
+
+print('before')
+sys.stdout.flush()
+
+@automain(__name__, stdout_buffer={buffer_size})
+def main():
+    assert sys.stdout.line_buffering == sys.__stdout__.isatty()
+    for i in range({count}):
+        print(i)
+    return 3
+'''
+
+
+def run_buffered_script(tmpdir, buffer_size=True, count=10):
+    import os
+    import subprocess
+    import sys
+
+    path = tmpdir.join('script.py')
+    path.write(BUFFERED_SCRIPT.format(buffer_size=buffer_size, count=count))
+    return subprocess.Popen(
+        [sys.executable, str(path)],
+        env=dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path)),
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+
+def test_stdout_buffer(tmpdir):
+    process = run_buffered_script(tmpdir, buffer_size=64, count=1000)
+    stdout, stderr = process.communicate(timeout=30)
+
+    assert process.returncode == 3
+    assert stderr == b''
+    assert stdout.decode().split() == ['before'] + [
+        str(i) for i in range(1000)]
+
+
+def test_stdout_buffer_broken_pipe(tmpdir):
+    process = run_buffered_script(tmpdir, count=10 ** 6)
+    assert process.stdout.readline() == b'before\n'
+    process.stdout.close()
+
+    assert process.wait(timeout=30) == 1
+    assert process.stderr.read() == b''
+    process.stderr.close()
+
+
+def test_stdout_buffer_replaced_stdout(capsys):
+    with pytest.raises(SystemExit) as info:
+        @automain(True, stdout_buffer=True)
+        def main():
+            print('captured')
+            return 0
+
+    assert info.value.code == 0
+    assert capsys.readouterr().out == 'captured\n'
+
+
+def test_generator_main(capsys):
+    with pytest.raises(SystemExit) as info:
+        @automain(True, args=[3])
+        def main(count):
+            for i in range(count):
+                yield i
+            return 4
+
+    assert info.value.code == 4
+    assert capsys.readouterr().out == '0\n1\n2\n'
+
+
+def test_generator_main_encoder(capsys):
+    with pytest.raises(SystemExit) as info:
+        @automain(True, encoder='tsv')
+        def main():
+            yield 'a', 1
+            yield 'b', 2
+
+    assert info.value.code is None
+    assert capsys.readouterr().out == 'a\t1\nb\t2\n'
+
+
+GENERATOR_SCRIPT = '''\
+from autocommand import autocommand
+
+@autocommand(__name__, encoder='jsonl')
+def main(count: int):
+    for i in range(count):
+        yield {{'value': i}}
+'''
+
+
+def test_generator_main_broken_pipe(tmpdir):
+    import os
+    import subprocess
+    import sys
+
+    path = tmpdir.join('script.py')
+    path.write(GENERATOR_SCRIPT.format())
+    process = subprocess.Popen(
+        [sys.executable, str(path), str(10 ** 7)],
+        env=dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path)),
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    assert process.stdout.readline() == b'{"value":0}\n'
+    process.stdout.close()
+
+    assert process.wait(timeout=30) == 1
+    assert process.stderr.read() == b''
+    process.stderr.close()
@@ -35,43 +35,3 @@ def check_parse():
         assert parsed_args == kwargs
 
     return check_parse_impl
-
-
-@pytest.fixture
-def check_help_text(capsys):
-    def check_help_text_impl(func, *texts, reject=()):
-        '''
-        This helper checks that some set of text is written to stdout or stderr
-        after the called function raises a SystemExit. It is used to test that
-        the underlying ArgumentParser was correctly configured to output a
-        given set of help text(s).
-
-        func: This should be a wrapped autoparse function that causes a
-          SystemExit exception to be raised (most commonly a function with the
-          -h flag, or with an invalid set of positional arguments). This
-          Exception should be accompanied by some kind of printout from
-          argparse to stderr or stdout.
-        *texts: A set of strings to test for. All of the provided strings will
-          be checked for in the captured stdout/stderr using a standard
-          substring search.
-        reject: A string or set of strings to check do NOT exist anywhere in
-          the output. Currently used as a cludge to test the docstring split
-          behavior.
-        '''
-        with pytest.raises(SystemExit):
-            func()
-
-        out, err = capsys.readouterr()
-
-        # TODO: be wary of argparse's text formatting
-        # TODO: test that the text appears in the order given
-        for text in texts:
-            assert text in out or text in err
-
-        if isinstance(reject, str):
-            reject = [reject]
-
-        for text in reject:
-            assert text not in out and text not in err
-
-    return check_help_text_impl
@@ -0,0 +1,97 @@
+# Copyright 2014-2016 Nathan West
+#
+# This file is part of autocommand.
+#
+# autocommand is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# autocommand is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with autocommand.  If not, see <http://www.gnu.org/licenses/>.
+
+import io
+import pytest
+from autocommand.autoparse import autoparse, AnnotationError
+from autocommand.argtypes import ArgStream
+
+
+@autoparse
+def collect(first, paths: ArgStream, verbose=False):
+    return first, paths, verbose
+
+
+def test_plain_arguments():
+    first, paths, verbose = collect(['-v', 'a', 'b', 'c'])
+
+    assert first == 'a'
+    assert isinstance(paths, ArgStream)
+    assert list(paths) == ['b', 'c']
+    assert verbose
+
+
+def test_no_arguments():
+    first, paths, verbose = collect(['a'])
+    assert list(paths) == []
+
+
+def test_argument_files(tmpdir):
+    newlines = tmpdir.join('newlines.txt')
+    newlines.write('x\ny z\n')
+    nuls = tmpdir.join('nuls.txt')
+    nuls.write('p\0q\nr\0')
+
+    _, paths, _ = collect([
+        'a', 'b', '@' + str(newlines), '@' + str(nuls), '@@literal', '@'])
+
+    assert list(paths) == ['b', 'x', 'y z', 'p', 'q\nr', '@literal', '@']
+
+
+def test_argument_file_is_lazy(tmpdir):
+    _, paths, _ = collect(['a', '@' + str(tmpdir.join('missing.txt'))])
+
+    with pytest.raises(FileNotFoundError):
+        list(paths)
+
+
+def test_stdin(monkeypatch):
+    monkeypatch.setattr('sys.stdin', io.StringIO('1\n2\n'))
+    _, paths, _ = collect(['a', '@-', '3'])
+
+    assert list(paths) == ['1', '2', '3']
+
+
+def test_streaming(tmpdir):
+    # Items are yielded as the file is read, not after
+    path = tmpdir.join('many.txt')
+    path.write(''.join('{}\n'.format(i) for i in range(100000)))
+
+    _, paths, _ = collect(['a', '@' + str(path)])
+    items = iter(paths)
+    assert next(items) == '0'
+    assert sum(1 for _ in items) == 99999
+
+
+def test_using_fixed_delimiter(tmpdir):
+    LineStream = ArgStream.using(delimiter='\n')
+
+    @autoparse
+    def func(paths: LineStream):
+        return list(paths)
+
+    path = tmpdir.join('items.txt')
+    path.write('a\0b\nc\n')
+
+    assert func(['@' + str(path)]) == ['a\0b', 'c']
+
+
+def test_varargs_stream_is_rejected():
+    with pytest.raises(AnnotationError):
+        @autoparse
+        def func(*paths: ArgStream):
+            pass
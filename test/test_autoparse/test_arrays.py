@@ -0,0 +1,122 @@
+# Copyright 2014-2016 Nathan West
+#
+# This file is part of autocommand.
+#
+# autocommand is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# autocommand is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with autocommand.  If not, see <http://www.gnu.org/licenses/>.
+
+import sys
+from array import array
+from typing import List
+import pytest
+from autocommand.autoparse import autoparse, AnnotationError
+from autocommand.argtypes import Array, sequence_element_type
+
+
+@autoparse
+def collect(ids: List[int], weights: List[float] =(), names: List[str] =()):
+    return ids, weights, names
+
+
+def test_int_array():
+    ids, weights, names = collect(['1', '-2', '30'])
+
+    assert ids == array('q', [1, -2, 30])
+    assert weights == ()
+    assert names == ()
+
+
+def test_float_array_option():
+    ids, weights, _ = collect(['-w', '0.5', '1e3', '--', '7'])
+
+    assert ids == array('q', [7])
+    assert weights == array('d', [0.5, 1000.0])
+
+
+def test_other_element_types():
+    @autoparse
+    def func(values: List[complex]):
+        return values
+
+    assert func(['1+2j', '3']) == [1 + 2j, 3]
+    assert collect(['-n', 'a', 'b', '--', '1'])[2] == ['a', 'b']
+
+
+def test_empty_array():
+    assert collect([])[0] == array('q')
+
+
+@pytest.mark.parametrize('argv, message', [
+    (['1', 'x', '2'], "invalid int value: 'x'"),
+    (['1', str(2 ** 63)], 'int value out of range'),
+    (['-w', 'nan?', '--', '1'], "invalid float value: 'nan?'"),
+])
+def test_invalid_values(capsys, argv, message):
+    with pytest.raises(SystemExit):
+        collect(argv)
+
+    assert message in capsys.readouterr().err
+
+
+@pytest.mark.skipif(sys.version_info < (3, 9), reason='requires list[int]')
+def test_builtin_generic():
+    @autoparse
+    def func(ids: list[int]):
+        return ids
+
+    assert func(['1', '2']) == array('q', [1, 2])
+
+
+def test_numpy_array():
+    numpy = pytest.importorskip('numpy')
+
+    @autoparse
+    def func(ids: Array.of(int, numpy=True)):
+        return ids
+
+    result = func(['1', '2'])
+    assert isinstance(result, numpy.ndarray)
+    assert result.tolist() == [1, 2]
+
+
+def test_numpy_fallback(monkeypatch):
+    monkeypatch.setitem(sys.modules, 'numpy', None)
+
+    @autoparse
+    def func(ids: Array.of(float, numpy=True)):
+        return ids
+
+    assert func(['1.5']) == array('d', [1.5])
+
+
+def test_varargs_list_is_rejected():
+    with pytest.raises(AnnotationError):
+        @autoparse
+        def func(*ids: List[int]):
+            pass
+
+
+def test_array_of_other_types():
+    with pytest.raises(TypeError):
+        Array.of(str)
+
+
+@pytest.mark.parametrize('annotation, expected', [
+    (List[int], int),
+    (List[str], str),
+    (List, None),
+    (list, None),
+    (int, None),
+])
+def test_sequence_element_type(annotation, expected):
+    assert sequence_element_type(annotation) is expected
@@ -0,0 +1,130 @@
+# Copyright 2014-2016 Nathan West
+#
+# This file is part of autocommand.
+#
+# autocommand is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# autocommand is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with autocommand.  If not, see <http://www.gnu.org/licenses/>.
+
+import io
+import pickle
+import pytest
+from autocommand.autoparse import autoparse
+from autocommand.batch import BatchResult, read_records
+
+
+@autoparse
+def scale(value: int, factor: int =2, fail=False):
+    if fail:
+        raise RuntimeError(value)
+    if value < 0:
+        return 'negative'
+    return value * factor
+
+
+INPUT = '''\
+1
+3 -f 10
+
+-4
+x
+5 --fail
+'unclosed
+'''
+
+
+def check_results(results):
+    assert [result[:4] for result in results] == [
+        (0, ['1'], 2, 2),
+        (1, ['3', '-f', '10'], 30, 30),
+        (3, ['-4'], 1, 'negative'),
+        (4, ['x'], 2, None),
+        (5, ['5', '--fail'], 1, None),
+        (6, None, 2, None),
+    ]
+
+    assert all(isinstance(result, BatchResult) for result in results)
+    assert isinstance(results[3].error, SystemExit)
+    assert isinstance(results[4].error, RuntimeError)
+    assert isinstance(results[5].error, ValueError)
+
+
+def test_batch(capsys):
+    check_results(scale.batch(io.StringIO(INPUT)))
+
+
+def test_batch_from_file(tmpdir, capsys):
+    path = tmpdir.join('input.txt')
+    path.write(INPUT)
+    check_results(scale.batch(str(path)))
+
+
+def test_batch_from_stdin(monkeypatch, capsys):
+    monkeypatch.setattr('sys.stdin', io.StringIO(INPUT))
+    check_results(scale.batch())
+
+
+def test_batch_nul_delimited():
+    results = scale.batch(io.StringIO('1\0"2"\n-f\n3\0'), delimiter='\0')
+
+    assert [(result.argv, result.result) for result in results] == [
+        (['1'], 2),
+        (['2', '-f', '3'], 6),
+    ]
+
+
+def test_batch_iterable():
+    results = scale.batch(['1', '2 -f 5'])
+    assert [result.result for result in results] == [2, 10]
+
+
+def test_batch_threads(capsys):
+    check_results(scale.batch(io.StringIO(INPUT), workers=3))
+
+
+def test_batch_processes(capsys):
+    check_results(scale.batch(io.StringIO(INPUT), workers=2, processes=True))
+
+
+def test_batch_processes_with_threads():
+    import threading
+    import warnings
+
+    stop = threading.Event()
+    thread = threading.Thread(target=stop.wait)
+    thread.start()
+    try:
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            check_results(scale.batch(
+                io.StringIO(INPUT), workers=2, processes=True))
+    finally:
+        stop.set()
+        thread.join()
+
+    # Python 3.12 and later warn about forking with threads
+    assert not [
+        warning for warning in caught if 'fork' in str(warning.message)]
+
+
+def test_pickle_by_reference():
+    assert pickle.loads(pickle.dumps(scale)) is scale
+
+
+@pytest.mark.parametrize('delimiter, text, expected', [
+    ('\n', 'a\nb\n', ['a', 'b']),
+    ('\n', 'a\n\nb', ['a', '', 'b']),
+    ('\0', 'a b\0c\nd\0', ['a b', 'c\nd']),
+    ('\0', '', []),
+])
+def test_read_records(delimiter, text, expected):
+    assert list(read_records(io.StringIO(text), delimiter)) == expected
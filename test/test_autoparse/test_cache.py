@@ -0,0 +1,161 @@
+import sys
+from unittest.mock import patch
+import pytest
+from autocommand.autoparse import autoparse
+
+
+autoparse_module = sys.modules['autocommand.autoparse']
+
+
+@pytest.fixture
+def counted_make_argument_specs():
+    with patch.object(
+            autoparse_module,
+            'make_argument_specs',
+            wraps=autoparse_module.make_argument_specs) as make_argument_specs:
+        yield make_argument_specs
+
+
+def cache_files(tmpdir):
+    return sorted(path.basename for path in tmpdir.listdir())
+
+
+def make_command(cache, docstring='Original docstring'):
+    def command(arg: int, path=sys.stdout, ratio=0.5, verbose=False):
+        return arg, path, ratio, verbose
+
+    command.__doc__ = docstring
+    return autoparse(command, cache=cache, add_nos=True)
+
+
+def test_cache_warm_start(tmpdir, counted_make_argument_specs):
+    cold = make_command(str(tmpdir))
+    assert counted_make_argument_specs.call_count == 1
+    assert len(cache_files(tmpdir)) == 1
+
+    warm = make_command(str(tmpdir))
+    assert counted_make_argument_specs.call_count == 1
+
+    for argv in [['1'], ['2', '-p', 'out.txt', '-r', '2.5', '-v'],
+                 ['3', '--verbose', '--no-verbose']]:
+        assert warm(argv) == cold(argv)
+
+    assert warm(['1'])[1] is sys.stdout
+    assert 'Original docstring' in warm.parser.description
+
+
+def test_cache_invalidated_by_docstring(tmpdir, counted_make_argument_specs):
+    make_command(str(tmpdir))
+    original_files = cache_files(tmpdir)
+
+    make_command(str(tmpdir), docstring='New docstring')
+    assert counted_make_argument_specs.call_count == 2
+
+    new_files = cache_files(tmpdir)
+    assert len(new_files) == 1
+    assert new_files != original_files
+
+
+def test_cache_invalidated_by_signature(tmpdir, counted_make_argument_specs):
+    @autoparse(cache=str(tmpdir))
+    def command(arg):
+        return arg
+
+    @autoparse(cache=str(tmpdir))
+    def command(arg: int):  # NOQA: F811
+        return arg
+
+    assert counted_make_argument_specs.call_count == 2
+    assert command(['10']) == 10
+    assert len(cache_files(tmpdir)) == 1
+
+
+def test_cache_scripts_with_the_same_name(
+        tmpdir, counted_make_argument_specs):
+    # The main function of every script is __main__.main
+    def make_script_command(filename):
+        namespace = {'__name__': '__main__'}
+        exec(compile('def main(value):\n    return value\n', filename, 'exec'),
+             namespace)
+        return autoparse(namespace['main'], cache=str(tmpdir))
+
+    make_script_command('first.py')
+    make_script_command('second.py')
+    assert counted_make_argument_specs.call_count == 2
+    assert len(cache_files(tmpdir)) == 2
+
+    # Each script still has a warm start after the other one has run
+    assert make_script_command('first.py')(['x']) == 'x'
+    assert make_script_command('second.py')(['y']) == 'y'
+    assert counted_make_argument_specs.call_count == 2
+
+
+def test_cache_warm_start_skips_inspect(tmpdir, monkeypatch):
+    make_command(str(tmpdir))
+
+    def signature(func):
+        raise AssertionError('signature inspected')
+
+    monkeypatch.setattr('inspect.signature', signature)
+    command = autoparse(
+        make_command(str(tmpdir)).func, cache=str(tmpdir), add_nos=True,
+        fast=True)
+    assert command(['4', '-v']) == (4, sys.stdout, 0.5, True)
+    assert 'Original docstring' in command.parser.description
+
+
+def test_cache_inexact_annotation(tmpdir):
+    # A type that can't be told apart from another by name isn't cached
+    from autocommand import Lines
+    Records = Lines.using(delimiter='\0')
+
+    @autoparse(cache=str(tmpdir))
+    def command(lines: Records):
+        return list(lines)
+
+    assert cache_files(tmpdir) == []
+
+
+def test_cache_unimportable_type(tmpdir):
+    @autoparse(cache=str(tmpdir))
+    def command(arg: lambda value: value * 2):
+        return arg
+
+    assert command(['ab']) == 'abab'
+    assert cache_files(tmpdir) == []
+
+
+def test_cache_corrupt_file(tmpdir, counted_make_argument_specs):
+    make_command(str(tmpdir))
+    (cache_file,) = tmpdir.listdir()
+    cache_file.write("{'key': ")
+
+    command = make_command(str(tmpdir))
+    assert counted_make_argument_specs.call_count == 2
+    assert command(['5'])[0] == 5
+
+    make_command(str(tmpdir))
+    assert counted_make_argument_specs.call_count == 2
+
+
+def test_cache_key_mismatch(tmpdir, counted_make_argument_specs):
+    # A file with the right name, but for another signature, isn't used, as
+    # if the checksums collided
+    import marshal
+
+    make_command(str(tmpdir))
+    (cache_file,) = tmpdir.listdir()
+    data = marshal.loads(cache_file.read_binary())
+    data['key'] += 'other'
+    cache_file.write_binary(marshal.dumps(data))
+
+    make_command(str(tmpdir))
+    assert counted_make_argument_specs.call_count == 2
+
+
+def test_cache_default_dir(tmpdir, monkeypatch):
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmpdir))
+
+    command = make_command(True)
+    assert command(['1'])[0] == 1
+    assert len(tmpdir.join('autocommand').listdir()) == 1
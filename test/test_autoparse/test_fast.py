@@ -0,0 +1,138 @@
+from unittest.mock import patch
+import pytest
+from autocommand.autoparse import autoparse
+
+
+def example(source, dest: int, *rest: float, opt1=None, opt2=2, opt3='3',
+            flag=False, on=True, b: bool =None):
+    pass
+
+
+def example_no_varargs(arg, count: int =0, name='x', verbose=False):
+    pass
+
+
+def example_only_varargs(*args, n: int ='5'):
+    pass
+
+
+def parse_both(func, argv, add_nos=True):
+    '''
+    Parse argv with both the fast parser and the ArgumentParser for func, and
+    return both results. The fast result is None if it fell back.
+    '''
+    wrapped = autoparse(func, fast=True, add_nos=add_nos)
+    fast_result = wrapped._fast_parser.parse(argv)
+
+    try:
+        slow_result = vars(wrapped.parser.parse_args(argv))
+    except SystemExit:
+        slow_result = SystemExit
+
+    return fast_result, slow_result
+
+
+@pytest.mark.parametrize('func, argv', [
+    (example, ['a', '1']),
+    (example, ['a', '1', '2.5', '3']),
+    (example, ['-o', 'x', 'a', '1', '--opt2', '10', '-f', '--no-on']),
+    (example, ['a', '1', '--opt2=10', '--opt3', '-']),
+    (example, ['--flag', '--no-flag', 'a', '1', '-b']),
+    (example, ['a', '1', '-b', '--no-b']),
+    (example, ['a', '1', '--opt3=']),
+    (example, ['-', '1', '2']),
+    (example_no_varargs, ['x']),
+    (example_no_varargs, ['-c', '3', 'x', '-n', 'y', '--no-verbose', '-v']),
+    (example_no_varargs, ['-c', '3', 'x', '--count', '4']),
+    (example_only_varargs, []),
+    (example_only_varargs, ['1', '2', '-n', '3']),
+    (example_only_varargs, ['-n', '3', '1', '2']),
+])
+def test_fast_matches_argparse(func, argv):
+    fast_result, slow_result = parse_both(func, argv)
+
+    assert fast_result is not None
+    assert fast_result == slow_result
+
+
+@pytest.mark.parametrize('func, argv', [
+    (example, ['-h']),
+    (example, ['a', '1', '--help']),
+    (example, ['a']),
+    (example, ['a', 'b']),
+    (example, ['a', '1', 'x']),
+    (example, ['a', '1', '--opt']),
+    (example, ['a', '1', '-fo', 'x']),
+    (example, ['a', '1', '-ox']),
+    (example, ['a', '1', '--', '2']),
+    (example, ['a', '1', '2', '-f', '3']),
+    (example, ['a', '1', '-o']),
+    (example, ['a', '1', '-o', '-f']),
+    (example, ['a', '1', '--flag=yes']),
+    (example, ['a', '1', '-3']),
+    (example_no_varargs, ['x', 'y']),
+    (example_no_varargs, ['x', '-c', 'three']),
+    (example_no_varargs, ['x', '--bogus']),
+])
+def test_fast_falls_back(func, argv):
+    fast_result, slow_result = parse_both(func, argv)
+
+    assert fast_result is None
+
+
+def test_fast_call_skips_argparse():
+    @autoparse(fast=True)
+    def func(arg, count: int =1, verbose=False):
+        return arg, count, verbose
+
+    with patch.object(
+            type(func.parser), 'parse_args',
+            side_effect=AssertionError('argparse used')):
+        assert func(['x', '-c', '3', '-v']) == ('x', 3, True)
+
+
+def test_fast_call_layout():
+    @autoparse(fast=True)
+    def func(a, b: int, *rest: int, key='k', flag=False):
+        return a, b, rest, key, flag
+
+    assert func(['x', '1', '2', '3', '-k', 'v', '-f']) == (
+        'x', 1, (2, 3), 'v', True)
+    assert func(['x', '1']) == ('x', 1, (), 'k', False)
+
+
+def test_fast_call_falls_back(check_help_text):
+    @autoparse(fast=True)
+    def func(arg: 'This is help text', count: int =1):
+        return arg, count
+
+    assert func(['x', '--cou', '2']) == ('x', 2)
+    check_help_text(lambda: func(['-h']), 'This is help text')
+    check_help_text(lambda: func(['x', '-c', 'y']), 'invalid int value')
+
+
+def test_fast_lazy_parser_not_built():
+    @autoparse(fast=True, lazy=True)
+    def func(arg, count: int =1):
+        return arg, count
+
+    assert func(['x', '-c', '3']) == ('x', 3)
+    assert func._parser is None
+
+    assert func(['x', '--co', '3']) == ('x', 3)
+    assert func._parser is not None
+
+
+def test_fast_custom_parser():
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser()
+    parser.add_argument('arg', nargs='?')
+
+    @autoparse(parser=parser, fast=True)
+    def func(arg):
+        return arg
+
+    assert func._fast_parser is None
+    assert func(['x']) == 'x'
+    assert func([]) is None
@@ -0,0 +1,174 @@
+# Copyright 2014-2016 Nathan West
+#
+# This file is part of autocommand.
+#
+# autocommand is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# autocommand is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with autocommand.  If not, see <http://www.gnu.org/licenses/>.
+
+import gzip
+import io
+import sys
+import pytest
+from autocommand.autoparse import autoparse
+from autocommand.argtypes import File
+
+
+Output = File.using(mode='w', buffer_size=1 << 16)
+TextOutput = File.using(mode='w')
+BinaryOutput = File.using(mode='wb')
+RawInput = File.using(mode='rb', compression=None)
+
+
+@pytest.fixture(params=[False, True], ids=['argparse', 'fast'])
+def fast(request):
+    return request.param
+
+
+@pytest.fixture
+def text_file(tmpdir):
+    path = tmpdir.join('file.txt')
+    path.write('first\nsecond\n')
+    return str(path)
+
+
+def test_file_is_lazy(tmpdir, fast):
+    @autoparse(fast=fast)
+    def main(infile: File, out: Output ='out.txt'):
+        return infile, out
+
+    missing = tmpdir.join('missing.txt')
+    infile, out = main([str(missing)])
+
+    assert isinstance(infile, File)
+    assert isinstance(out, Output)
+    assert not infile.opened
+    assert infile.closed
+    assert not tmpdir.join('out.txt').check()
+
+    with pytest.raises(ValueError):
+        infile.read()
+
+
+def test_file_read(text_file, fast):
+    @autoparse(fast=fast)
+    def main(infile: File):
+        assert not infile.opened
+        lines = list(infile)
+        assert infile.opened
+        return lines, infile.file
+
+    lines, file = main([text_file])
+    assert lines == ['first\n', 'second\n']
+    assert file.closed
+
+
+def test_file_write(tmpdir, fast):
+    @autoparse(fast=fast)
+    def main(log: Output =str(tmpdir.join('log.txt')),
+             unused: Output =str(tmpdir.join('unused.txt'))):
+        print('hello', file=log)
+        log.write('world\n')
+        return log
+
+    log = main([])
+    assert log.closed
+    assert tmpdir.join('log.txt').read() == 'hello\nworld\n'
+    assert not tmpdir.join('unused.txt').check()
+
+    main(['-l', str(tmpdir.join('other.txt'))])
+    assert tmpdir.join('other.txt').read() == 'hello\nworld\n'
+
+
+def test_file_closed_on_error(text_file):
+    @autoparse
+    def main(infile: File):
+        infile.readline()
+        raise RuntimeError(infile)
+
+    with pytest.raises(RuntimeError) as info:
+        main([text_file])
+
+    assert info.value.args[0].closed
+
+
+def test_file_stdio(monkeypatch):
+    stdout = io.StringIO()
+    monkeypatch.setattr('sys.stdin', io.StringIO('input'))
+    monkeypatch.setattr('sys.stdout', stdout)
+
+    @autoparse
+    def main(infile: File ='-', out: TextOutput ='-'):
+        out.write(infile.read())
+
+    main([])
+    assert stdout.getvalue() == 'input'
+    assert not sys.stdin.closed
+    assert not stdout.closed
+
+
+def test_file_default_object():
+    @autoparse
+    def main(out: TextOutput =sys.stdout):
+        return out
+
+    assert main([]) is sys.stdout
+    assert isinstance(main(['-o', 'name.txt']), File)
+
+
+def test_file_varargs(tmpdir, text_file):
+    @autoparse
+    def main(*infiles: File):
+        return [infile.read() for infile in infiles], infiles
+
+    contents, infiles = main([text_file, text_file])
+    assert contents == ['first\nsecond\n'] * 2
+    assert all(infile.closed for infile in infiles)
+
+
+def test_file_options(tmpdir):
+    path = str(tmpdir.join('data.bin.gz'))
+
+    @autoparse
+    def main(out: BinaryOutput =path):
+        out.write(b'\x00\x01')
+
+    main([])
+    with gzip.open(path) as file:
+        assert file.read() == b'\x00\x01'
+
+    @autoparse
+    def raw(infile: RawInput):
+        return infile.read()
+
+    assert raw([path])[:2] == b'\x1f\x8b'
+
+
+def test_file_using_is_a_subclass():
+    latin = File.using(encoding='latin-1', buffer_size=4096)
+
+    assert issubclass(latin, File)
+    assert latin.encoding == 'latin-1'
+    assert latin.buffer_size == 4096
+    assert latin.mode == File.mode == 'r'
+    assert File.encoding is None
+
+
+def test_file_generator(text_file):
+    @autoparse
+    def main(infile: File):
+        for line in infile:
+            yield line.strip()
+
+    generator = main([text_file])
+    assert next(generator) == 'first'
+    assert list(generator) == ['second']
@@ -0,0 +1,182 @@
+# Copyright 2014-2016 Nathan West
+#
+# This file is part of autocommand.
+#
+# autocommand is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# autocommand is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with autocommand.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import pytest
+from autocommand.autoparse import autoparse, JobsError
+from autocommand.jobs import chunk, combine_results
+
+
+@autoparse(jobs=True)
+def touch(directory, *names, fail=''):
+    '''
+    Create a file for each name, containing the pid of the process that
+    created it. Fails if any name is `fail`.
+    '''
+    for name in names:
+        with open(os.path.join(directory, name), 'w') as file:
+            file.write(str(os.getpid()))
+
+    if fail in names:
+        return 'failed on {}'.format(fail)
+
+
+@autoparse(jobs=True, fast=True, chunk_size=1)
+def touch_fast(directory, *names, j=False):
+    return touch.func(directory, *names)
+
+
+def test_jobs_fast_parser(tmpdir):
+    touch_fast([str(tmpdir), 'a'])
+    assert touch_fast._fast_parser is not None
+
+
+def created(tmpdir):
+    return {
+        path.basename: int(path.read())
+        for path in tmpdir.listdir()}
+
+
+@pytest.mark.parametrize('command', [touch, touch_fast])
+def test_jobs(tmpdir, command):
+    names = [str(index) for index in range(20)]
+
+    assert command(['--jobs', '3', str(tmpdir)] + names) is None
+
+    pids = created(tmpdir)
+    assert sorted(pids) == sorted(names)
+    assert os.getpid() not in pids.values()
+
+
+def test_jobs_with_threads(tmpdir):
+    import threading
+    import warnings
+
+    # Forking with other threads running can deadlock, so the workers are
+    # started without fork, and the command is pickled by name instead.
+    stop = threading.Event()
+    thread = threading.Thread(target=stop.wait)
+    thread.start()
+    try:
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            assert touch(['-j', '2', str(tmpdir), 'a', 'b', 'c']) is None
+    finally:
+        stop.set()
+        thread.join()
+
+    # Python 3.12 and later warn about forking with threads
+    assert not [
+        warning for warning in caught if 'fork' in str(warning.message)]
+
+    pids = created(tmpdir)
+    assert sorted(pids) == ['a', 'b', 'c']
+    assert os.getpid() not in pids.values()
+
+
+@pytest.mark.parametrize('argv', [[], ['-j', '1'], ['--jobs=1']])
+def test_single_job(tmpdir, argv):
+    touch(argv + [str(tmpdir), 'a', 'b'])
+    assert set(created(tmpdir).values()) == {os.getpid()}
+
+
+def test_jobs_failure(tmpdir):
+    result = touch(['-j', '2', '-f', 'c', str(tmpdir), 'a', 'b', 'c', 'd'])
+    assert result == 'failed on c'
+
+
+def test_jobs_flags(check_help_text):
+    # The help line is '-j N, --jobs N' or, from Python 3.13, '-j, --jobs N',
+    # so check the flags and the metavar in the usage instead
+    check_help_text(lambda: touch(['-h']), '[-j N]', '--jobs N')
+    # -j is taken by a parameter, so only --jobs is added
+    check_help_text(lambda: touch_fast(['-h']), '[-j]', '[--jobs N]')
+
+
+def test_negative_jobs(capsys):
+    with pytest.raises(SystemExit):
+        touch(['dir', '-j', '-1'])
+
+
+def test_jobs_requires_varargs():
+    with pytest.raises(JobsError):
+        @autoparse(jobs=True)
+        def func(a, b):
+            pass
+
+
+def test_jobs_custom_parser():
+    with pytest.raises(JobsError):
+        @autoparse(jobs=True, parser=object())
+        def func(*a):
+            pass
+
+
+@pytest.mark.parametrize('items, jobs, chunk_size, expected', [
+    (list(range(10)), 2, None, [[0, 1], [2, 3], [4, 5], [6, 7], [8, 9]]),
+    (list(range(10)), 1, None, [[0, 1, 2], [3, 4, 5], [6, 7, 8], [9]]),
+    (list(range(5)), 2, 3, [[0, 1, 2], [3, 4]]),
+    (list(range(3)), 8, None, [[0], [1], [2]]),
+    ([], 4, None, []),
+])
+def test_chunk(items, jobs, chunk_size, expected):
+    assert chunk(items, jobs, chunk_size) == expected
+
+
+@pytest.mark.parametrize('results, expected', [
+    ([None, None], None),
+    ([0, 3, 'error'], 3),
+    ([None, 'error', 1], 'error'),
+    ([], None),
+])
+def test_combine_results(results, expected):
+    assert combine_results(results) == expected
+
+
+JOBS_SCRIPT = '''
+import os
+from autocommand import autocommand
+
+@autocommand(__name__, jobs=True)
+def main(directory, *names):
+    for name in names:
+        with open(os.path.join(directory, name), 'w') as file:
+            file.write(str(os.getpid()))
+'''
+
+
+@pytest.mark.skipif(
+    not hasattr(os, 'fork'), reason='__main__ commands need fork')
+def test_jobs_main_script(tmpdir):
+    import subprocess
+    import sys
+
+    script = tmpdir.join('script.py')
+    script.write(JOBS_SCRIPT)
+    output = tmpdir.mkdir('output')
+    names = ['a', 'b', 'c', 'd']
+
+    result = subprocess.run(
+        [sys.executable, str(script), '-j', '2', str(output)] + names,
+        env=dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path)),
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=60)
+
+    assert result.stderr == b''
+    assert result.returncode == 0
+    pids = created(output)
+    assert sorted(pids) == names
+    assert os.getpid() not in pids.values()
@@ -0,0 +1,89 @@
+import sys
+from unittest.mock import patch
+import pytest
+from autocommand.autoparse import autoparse, TooManySplitsError
+
+
+autoparse_module = sys.modules['autocommand.autoparse']
+
+
+@pytest.fixture
+def counted_make_parser():
+    with patch.object(
+            autoparse_module,
+            'make_parser_from_specs',
+            wraps=autoparse_module.make_parser_from_specs) as make_parser:
+        yield make_parser
+
+
+def test_lazy_parser_built_on_call(counted_make_parser):
+    @autoparse(lazy=True)
+    def func(arg1, arg2: int, flag=False):
+        return arg1, arg2, flag
+
+    assert not counted_make_parser.called
+
+    assert func(['value', '1', '-f']) == ('value', 1, True)
+    assert counted_make_parser.call_count == 1
+
+    assert func(['value', '2']) == ('value', 2, False)
+    assert counted_make_parser.call_count == 1
+
+
+def test_lazy_parser_built_on_access(counted_make_parser):
+    @autoparse(lazy=True)
+    def func(arg):
+        '''This is the description'''
+        return arg
+
+    assert not counted_make_parser.called
+
+    parser = func.parser
+    assert counted_make_parser.call_count == 1
+    assert 'This is the description' in parser.description
+
+    assert func(['value']) == 'value'
+    assert func.parser is parser
+    assert counted_make_parser.call_count == 1
+
+
+def test_eager_parser(counted_make_parser):
+    @autoparse
+    def func(arg):
+        return arg
+
+    assert counted_make_parser.call_count == 1
+    assert func(['value']) == 'value'
+    assert counted_make_parser.call_count == 1
+
+
+def test_lazy_bad_docstring():
+    @autoparse(lazy=True)
+    def func(arg):
+        '''
+        Part 1
+        -------
+        Part 2
+        -------
+        Part 3
+        '''
+        pass
+
+    with pytest.raises(TooManySplitsError):
+        func(['value'])
+
+    with pytest.raises(TooManySplitsError):
+        func.parser
+
+
+def test_wrapper_attributes():
+    def func(arg):
+        '''Docstring'''
+        pass
+
+    wrapped = autoparse(func, lazy=True)
+
+    assert wrapped.func is func
+    assert wrapped.__name__ == 'func'
+    assert wrapped.__doc__ == 'Docstring'
+    assert wrapped.__wrapped__ is func
@@ -0,0 +1,112 @@
+# Copyright 2014-2016 Nathan West
+#
+# This file is part of autocommand.
+#
+# autocommand is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# autocommand is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with autocommand.  If not, see <http://www.gnu.org/licenses/>.
+
+import gzip
+import io
+import pytest
+from autocommand.autoparse import autoparse
+from autocommand.argtypes import Lines
+
+
+@autoparse
+def collect(infile: Lines ='-'):
+    return infile
+
+
+Records = Lines.using(delimiter='\0', buffer_size=4)
+
+
+@autoparse
+def collect_records(infile: Records):
+    return infile
+
+
+@pytest.fixture
+def text_file(tmpdir):
+    path = tmpdir.join('file.txt')
+    path.write('first\nsecond\n\nlast')
+    return str(path)
+
+
+def test_lines_is_lazy(tmpdir):
+    lines = collect(['-i', str(tmpdir.join('missing.txt'))])
+    assert isinstance(lines, Lines)
+
+    with pytest.raises(FileNotFoundError):
+        list(lines)
+
+
+def test_lines(text_file):
+    lines = collect(['-i', text_file])
+    assert list(lines) == ['first', 'second', '', 'last']
+
+    # Each iteration reads the file again
+    assert list(lines) == ['first', 'second', '', 'last']
+
+
+def test_lines_stdin(monkeypatch):
+    monkeypatch.setattr('sys.stdin', io.StringIO('a\nb\n'))
+    assert list(collect([])) == ['a', 'b']
+    assert list(collect(['-i', '-'])) == []
+
+
+def test_lines_compressed(tmpdir):
+    path = str(tmpdir.join('file.txt.gz'))
+    with gzip.open(path, 'wt') as file:
+        file.write('a\nb\n')
+
+    assert list(collect(['-i', path])) == ['a', 'b']
+
+
+def test_lines_closed_after_iteration(text_file, monkeypatch):
+    opened = []
+    real_open = open
+
+    def tracking_open(*args, **kwargs):
+        file = real_open(*args, **kwargs)
+        opened.append(file)
+        return file
+
+    monkeypatch.setattr('builtins.open', tracking_open)
+
+    lines = iter(collect(['-i', text_file]))
+    assert next(lines) == 'first'
+    assert not opened[-1].closed
+
+    lines.close()
+    assert opened[-1].closed
+
+
+def test_lines_delimiter(tmpdir):
+    path = tmpdir.join('records.dat')
+    path.write('one\0two\nlines\0three')
+
+    assert list(collect_records([str(path)])) == [
+        'one', 'two\nlines', 'three']
+
+
+def test_lines_using_is_a_subclass():
+    records = Lines.using(delimiter=';', encoding='latin-1')
+
+    assert issubclass(records, Lines)
+    assert records.delimiter == ';'
+    assert records.encoding == 'latin-1'
+    assert records.buffer_size == Lines.buffer_size
+    assert Lines.delimiter == '\n'
+
+    with pytest.raises(ValueError):
+        Lines.using(delimiter='')
@@ -1,4 +1,12 @@
+import bz2
+import gzip
+import io
+import lzma
+import mmap
+import os
+import pytest
 from autocommand.autoparse import smart_open
+from autocommand.smartopen import smart_copy
 
 
 def test_smart_open_is_exported():
@@ -46,3 +54,427 @@ def test_smart_open_file(tmpdir):
             assert file is smart_file
             assert not smart_file.closed
         assert not smart_file.closed
+
+
+@pytest.mark.parametrize('extension, module', [
+    ('.gz', gzip),
+    ('.bz2', bz2),
+    ('.xz', lzma),
+])
+def test_smart_open_compressed_extension(tmpdir, extension, module):
+    path = str(tmpdir.join('file.txt' + extension))
+
+    with smart_open(path, 'w') as file:
+        file.write("Hello\nWorld\n")
+
+    with module.open(path, 'rt') as file:
+        assert file.read() == "Hello\nWorld\n"
+
+    with smart_open(path) as file:
+        assert list(file) == ["Hello\n", "World\n"]
+    assert file.closed
+
+    with smart_open(path, 'rb') as file:
+        assert file.read() == b"Hello\nWorld\n"
+
+
+@pytest.mark.parametrize('module', [gzip, bz2, lzma])
+def test_smart_open_compressed_magic(tmpdir, module):
+    path = str(tmpdir.join('file.dat'))
+    with module.open(path, 'wt') as file:
+        file.write("Hello")
+
+    with smart_open(path) as file:
+        assert file.read() == "Hello"
+
+    # Binary reads are only decompressed based on the extension
+    with smart_open(path, 'rb') as file:
+        assert file.read() != b"Hello"
+
+
+@pytest.mark.parametrize('text', ['BZh is a word\n', 'BZh91AY&S', ''])
+def test_smart_open_text_like_magic(tmpdir, text):
+    # Text that starts like a bz2 header isn't mistaken for one
+    path = tmpdir.join('file.txt')
+    path.write(text)
+
+    with smart_open(str(path)) as file:
+        assert file.read() == text
+
+
+def test_smart_open_empty_bz2_magic(tmpdir):
+    path = tmpdir.join('file.dat')
+    path.write_binary(bz2.compress(b''))
+
+    with smart_open(str(path)) as file:
+        assert file.read() == ''
+
+
+def test_smart_open_compression_option(tmpdir):
+    path = str(tmpdir.join('file.dat'))
+
+    with smart_open(path, 'w', compression='bz2') as file:
+        file.write("Hello")
+
+    with bz2.open(path, 'rt') as file:
+        assert file.read() == "Hello"
+
+    with smart_open(path, 'rb', compression=None) as file:
+        assert file.read().startswith(b'BZh')
+
+    with pytest.raises(ValueError):
+        with smart_open(path, compression='zip'):
+            pass
+
+
+def test_smart_open_compressed_arguments(tmpdir):
+    path = str(tmpdir.join('file.txt.gz'))
+
+    with smart_open(path, 'w', -1, 'utf-16') as file:
+        file.write("Hé")
+
+    with smart_open(path, encoding='utf-16', buffer_size=2) as file:
+        assert file.read() == "Hé"
+
+    with pytest.raises(ValueError):
+        with smart_open(path, 'rb', encoding='utf-8'):
+            pass
+
+    with pytest.raises(ValueError):
+        with smart_open(path, 'r+'):
+            pass
+
+
+def test_smart_open_plain_text_is_unchanged(tmpdir):
+    path = str(tmpdir.join('file.txt'))
+
+    with smart_open(path, 'w', newline='') as file:
+        file.write("a\r\nb")
+
+    with smart_open(path) as file:
+        assert file.mode == 'r'
+        assert file.read() == "a\nb"
+
+
+def test_smart_open_compressed_pipe(tmpdir):
+    read_fd, write_fd = os.pipe()
+    with os.fdopen(write_fd, 'wb') as pipe:
+        pipe.write(gzip.compress(b"Hello"))
+
+    with smart_open(read_fd) as file:
+        assert file.read() == "Hello"
+
+
+def test_smart_open_mmap(tmpdir):
+    path = str(tmpdir.join('file.dat'))
+    with open(path, 'wb') as file:
+        file.write(b"Hello, World")
+
+    with smart_open(path, mmap=True) as mapping:
+        assert isinstance(mapping, mmap.mmap)
+        assert mapping[7:12] == b"World"
+        assert mapping.find(b",") == 5
+
+        view = memoryview(mapping)
+        assert view[0] == ord("H")
+        view.release()
+
+    assert mapping.closed
+
+
+def test_smart_open_mmap_file_object(tmpdir):
+    path = str(tmpdir.join('file.dat'))
+    with open(path, 'wb') as file:
+        file.write(b"Hello")
+
+    with open(path) as file:
+        with smart_open(file, mmap=True) as mapping:
+            assert mapping[:] == b"Hello"
+        assert mapping.closed
+        assert not file.closed
+
+
+@pytest.mark.parametrize('data', [b"", b"Hello"])
+def test_smart_open_mmap_fallback(tmpdir, data):
+    # Pipes and empty files can't be mapped
+    path = str(tmpdir.join('empty.dat').ensure(file=True))
+    with smart_open(path, mmap=True) as file:
+        assert file.read() == b""
+
+    read_fd, write_fd = os.pipe()
+    with os.fdopen(write_fd, 'wb') as pipe:
+        pipe.write(data)
+
+    with smart_open(read_fd, mmap=True) as file:
+        assert not isinstance(file, mmap.mmap)
+        assert file.read() == data
+    assert file.closed
+
+
+def test_smart_open_mmap_compressed(tmpdir):
+    path = str(tmpdir.join('file.dat.gz'))
+    with gzip.open(path, 'wb') as file:
+        file.write(b"Hello")
+
+    with smart_open(path, mmap=True) as file:
+        assert file.read() == b"Hello"
+
+
+def test_smart_open_mmap_stream_object():
+    stream = io.TextIOWrapper(io.BytesIO(b"Hello"))
+
+    with smart_open(stream, mmap=True) as file:
+        assert file.read() == b"Hello"
+
+
+def test_smart_open_mmap_is_read_only(tmpdir):
+    with pytest.raises(ValueError):
+        with smart_open(str(tmpdir.join('file.dat')), 'w', mmap=True):
+            pass
+
+
+DATA = bytes(range(256)) * 1000
+
+
+def test_smart_copy_files(tmpdir):
+    source = tmpdir.join('source.bin')
+    source.write_binary(DATA)
+    dest = tmpdir.join('dest.bin')
+
+    assert smart_copy(str(source), str(dest)) == len(DATA)
+    assert dest.read_binary() == DATA
+
+
+def test_smart_copy_empty(tmpdir):
+    source = tmpdir.join('source.bin').ensure(file=True)
+    dest = tmpdir.join('dest.bin')
+
+    assert smart_copy(str(source), str(dest)) == 0
+    assert dest.read_binary() == b''
+
+
+def test_smart_copy_proc_file(tmpdir):
+    # /proc files report a size of 0, but aren't empty
+    if not os.path.exists('/proc/self/status'):
+        pytest.skip('requires /proc')
+
+    dest = tmpdir.join('status.txt')
+    assert smart_copy('/proc/self/status', str(dest)) > 0
+    assert 'Name:' in dest.read()
+
+
+def test_smart_copy_pipes(tmpdir):
+    source = tmpdir.join('source.bin')
+    source.write_binary(DATA)
+    dest = tmpdir.join('dest.bin')
+
+    read_fd, write_fd = os.pipe()
+    with open(read_fd, 'rb') as reader, open(write_fd, 'wb') as writer:
+        # The pipe can't hold all the data, so copy from it with the other
+        # end being written in a thread
+        from threading import Thread
+        thread = Thread(target=smart_copy, args=(str(source), writer))
+        thread.start()
+        result = []
+
+        def copy_out():
+            result.append(smart_copy(reader, str(dest)))
+
+        reader_thread = Thread(target=copy_out)
+        reader_thread.start()
+        thread.join()
+        writer.close()
+        reader_thread.join()
+
+    assert result == [len(DATA)]
+    assert dest.read_binary() == DATA
+
+
+def test_smart_copy_buffered_data(tmpdir):
+    source = tmpdir.join('source.bin')
+    source.write_binary(DATA)
+    dest = tmpdir.join('dest.bin')
+
+    with open(str(source), 'rb') as src, open(str(dest), 'wb') as dst:
+        assert src.read(10) == DATA[:10]
+        dst.write(b'head')
+
+        assert smart_copy(src, dst) == len(DATA) - 10
+        assert not src.closed and not dst.closed
+        assert src.read() == b''
+
+    assert dest.read_binary() == b'head' + DATA[10:]
+
+
+def test_smart_copy_text_objects(tmpdir):
+    source = tmpdir.join('source.txt')
+    source.write('text')
+
+    dest = io.TextIOWrapper(io.BytesIO())
+    dest.write('before ')
+    assert smart_copy(str(source), dest) == 4
+    assert dest.buffer.getvalue() == b'before text'
+
+
+def test_smart_copy_text_source(tmpdir):
+    source = tmpdir.join('source.txt')
+    source.write_binary(b'line1\nline2\r\nline3\n')
+    dest = tmpdir.join('dest.txt')
+
+    # The text file has read ahead of its buffer
+    with open(str(source)) as src:
+        assert src.readline() == 'line1\n'
+        assert smart_copy(src, str(dest)) == 13
+
+    assert dest.read_binary() == b'line2\r\nline3\n'
+
+
+def test_smart_copy_text_pipe(tmpdir):
+    dest = tmpdir.join('dest.txt')
+
+    read_fd, write_fd = os.pipe()
+    with open(write_fd, 'wb') as writer:
+        writer.write('line1\nlíne2\nline3\n'.encode('utf-8'))
+
+    with open(read_fd, encoding='utf-8') as src:
+        assert src.readline() == 'line1\n'
+        assert smart_copy(src, str(dest)) == 13
+
+    assert dest.read_text('utf-8') == 'líne2\nline3\n'
+
+
+def test_smart_copy_string_io():
+    dest = io.BytesIO()
+    assert smart_copy(io.StringIO('text'), dest) == 4
+    assert dest.getvalue() == b'text'
+
+
+def test_smart_copy_compressed(tmpdir):
+    source = tmpdir.join('source.txt.gz')
+    with gzip.open(str(source), 'wb') as file:
+        file.write(DATA)
+
+    dest = tmpdir.join('dest.bin')
+    assert smart_copy(str(source), str(dest), buffer_size=1000) == len(DATA)
+    assert dest.read_binary() == DATA
+
+    recompressed = tmpdir.join('dest.bin.xz')
+    smart_copy(str(dest), str(recompressed))
+    assert lzma.decompress(recompressed.read_binary()) == DATA
+
+    raw = tmpdir.join('raw.gz.copy')
+    smart_copy(str(source), str(raw), compression=None)
+    assert raw.read_binary() == source.read_binary()
+
+
+def test_smart_copy_streams():
+    dest = io.BytesIO()
+    assert smart_copy(io.BytesIO(DATA), dest, buffer_size=1000) == len(DATA)
+    assert dest.getvalue() == DATA
+
+
+def test_smart_copy_zero_copy(tmpdir, monkeypatch):
+    from autocommand import smartopen
+
+    def no_stream_copy(*args):
+        raise AssertionError('copied through Python')
+
+    monkeypatch.setattr(smartopen, '_copy_stream', no_stream_copy)
+
+    source = tmpdir.join('source.bin')
+    source.write_binary(DATA)
+    dest = tmpdir.join('dest.bin')
+
+    assert smart_copy(str(source), str(dest)) == len(DATA)
+    assert dest.read_binary() == DATA
+
+
+STDIO_SCRIPT = '''\
+import sys
+from autocommand.smartopen import smart_open
+
+print('first')
+with smart_open(sys.argv[1], sys.argv[2], compression=sys.argv[3] or None) \\
+        as file:
+    if sys.argv[4] == 'read':
+        data = file.read()
+        print(type(data).__name__, len(data))
+    else:
+        file.write('second\\n' if 'b' not in sys.argv[2] else b'second\\n')
+assert not sys.stdout.closed
+print('third')
+'''
+
+
+@pytest.mark.parametrize('name, mode, compression, stdin, expected', [
+    ('-', 'w', '', b'', b'first\nsecond\nthird\n'),
+    ('-', 'wb', '', b'', b'first\nsecond\nthird\n'),
+    ('stdout', 'r', '', b'', b'first\nsecond\nthird\n'),
+    ('-', 'r', '', b'input', b'first\nstr 5\nthird\n'),
+    ('-', 'rb', '', b'input', b'first\nbytes 5\nthird\n'),
+    ('stdin', 'r', '', b'input', b'first\nstr 5\nthird\n'),
+    ('-', 'r', 'infer', gzip.compress(b'input'), b'first\nstr 5\nthird\n'),
+])
+def test_smart_open_stdio(tmpdir, name, mode, compression, stdin, expected):
+    import subprocess
+    import sys
+
+    path = tmpdir.join('script.py')
+    script = STDIO_SCRIPT
+    if name != '-':
+        script = script.replace('sys.argv[1]', 'sys.' + name)
+    path.write(script)
+
+    result = subprocess.run(
+        [sys.executable, str(path), name, mode, compression,
+         'read' if stdin else 'write'],
+        env=dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path)),
+        input=stdin, stdout=subprocess.PIPE, timeout=30)
+
+    assert result.returncode == 0
+    assert result.stdout == expected
+
+
+def test_smart_open_stdio_replaced(monkeypatch):
+    stdout = io.StringIO()
+    monkeypatch.setattr('sys.stdout', stdout)
+
+    with smart_open('-', 'w') as file:
+        assert file is stdout
+
+    monkeypatch.setattr('sys.stdin', io.BytesIO(b'data'))
+    with smart_open('-', 'rb') as file:
+        assert file.read() == b'data'
+
+
+STDIN_SCRIPT = '''\
+import sys
+from autocommand import Lines, smart_open
+
+print(repr(sys.stdin.readline()))
+if sys.argv[1] == 'lines':
+    print(list(Lines('-')))
+else:
+    with smart_open('-', sys.argv[1]) as file:
+        print(repr(file.read()))
+'''
+
+
+@pytest.mark.parametrize('mode, expected', [
+    ('r', "'line2\\nline3\\n'"),
+    ('lines', "['line2', 'line3']"),
+])
+def test_smart_open_stdin_read_ahead(tmpdir, mode, expected):
+    import subprocess
+    import sys
+
+    path = tmpdir.join('script.py')
+    path.write(STDIN_SCRIPT)
+
+    result = subprocess.run(
+        [sys.executable, str(path), mode],
+        env=dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path)),
+        input=b'line1\nline2\nline3\n', stdout=subprocess.PIPE, timeout=30)
+
+    assert result.returncode == 0
+    assert result.stdout.decode().splitlines() == ["'line1\\n'", expected]
@@ -0,0 +1,172 @@
+# Copyright 2014-2016 Nathan West
+#
+# This file is part of autocommand.
+#
+# autocommand is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# autocommand is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with autocommand.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import subprocess
+import sys
+from importlib import import_module
+import pytest
+from autocommand.compile import CompileError, generate
+
+
+# All the commands are lazy, so that importing the module doesn't build any
+# parsers
+COMMAND_MODULE = '''
+import sys
+from fractions import Fraction
+from autocommand import autoparse, File
+
+@autoparse(lazy=True, add_nos=True)
+def main(source, dest, *rest: int, count: int =1, ratio: Fraction ='1/2',
+         verbose=False, out=sys.stdout, name='x'):
+    return source, dest, rest, count, ratio, verbose, out, name
+
+@autoparse(lazy=True)
+def plain(value):
+    return value
+
+@autoparse(lazy=True)
+def files(*infiles: File, out: File ='unused.txt'):
+    return [infile.readline() for infile in infiles], infiles, out
+
+@autoparse(parser=object(), lazy=True)
+def custom(value):
+    return value
+
+@autoparse(lazy=True)
+def unimportable(value: lambda value: value):
+    return value
+
+def undecorated(value):
+    return value
+'''
+
+
+@pytest.fixture
+def command_module(tmpdir, monkeypatch):
+    '''
+    Create a uniquely named module of commands on disk, and return a function
+    that compiles one of them and imports the generated module.
+    '''
+    name = 'compile_test_{}'.format(id(tmpdir))
+    tmpdir.join(name + '.py').write(COMMAND_MODULE)
+    monkeypatch.syspath_prepend(str(tmpdir))
+
+    compiled_names = []
+
+    def compile_command(attr):
+        compiled_name = '{}_{}_compiled'.format(name, attr)
+        tmpdir.join(compiled_name + '.py').write(
+            generate('{}:{}'.format(name, attr)))
+        compiled_names.append(compiled_name)
+        return import_module(compiled_name)
+
+    compile_command.module_name = name
+    yield compile_command
+
+    for module_name in [name] + compiled_names:
+        sys.modules.pop(module_name, None)
+
+
+@pytest.mark.parametrize('argv', [
+    ['a', 'b'],
+    ['a', 'b', '1', '2', '-c', '3'],
+    ['-v', 'a', 'b', '--no-verbose'],
+    ['a', 'b', '--ratio=3/4', '-n', 'y'],
+    ['a', 'b', '-r', '2', '--count=-4'],
+    ['-', '-'],
+])
+def test_compiled_matches_autoparse(command_module, argv):
+    compiled = command_module('main')
+    assert compiled._parse(argv) is not None
+    assert compiled.main(argv) == compiled._command(argv)
+
+
+@pytest.mark.parametrize('argv', [
+    ['a'],
+    ['a', 'b', 'x'],
+    ['a', 'b', '-c'],
+    ['a', 'b', '-c', 'x'],
+    ['a', 'b', '--unknown'],
+    ['-h'],
+])
+def test_compiled_falls_back(command_module, argv, capsys):
+    compiled = command_module('main')
+    assert compiled._parse(argv) is None
+
+    with pytest.raises(SystemExit):
+        compiled.main(argv)
+    compiled_output = capsys.readouterr()
+
+    with pytest.raises(SystemExit):
+        compiled._command(argv)
+    assert capsys.readouterr() == compiled_output
+
+
+def test_compiled_non_literal_default(command_module):
+    compiled = command_module('main')
+    assert compiled.main(['a', 'b'])[6] is sys.stdout
+
+
+def test_compiled_closes_files(command_module, tmpdir):
+    path = tmpdir.join('input.txt')
+    path.write('line\n')
+
+    contents, infiles, out = command_module('files').main([str(path)] * 2)
+    assert contents == ['line\n', 'line\n']
+    assert all(infile.closed for infile in infiles)
+    assert not out.opened
+
+
+def test_stale_compiled_module(command_module):
+    compiled = command_module('plain')
+    assert compiled.main(['value']) == 'value'
+
+    sys.modules.pop(command_module.module_name)
+    sys.modules.pop(compiled.__name__)
+    module = import_module(command_module.module_name)
+    module.plain.func.__annotations__['value'] = int
+
+    with pytest.raises(SystemExit) as exc_info:
+        import_module(compiled.__name__).main(['1'])
+
+    assert 'python -m autocommand.compile' in str(exc_info.value)
+
+
+@pytest.mark.parametrize('attr', [
+    'custom', 'unimportable', 'undecorated'])
+def test_compile_error(command_module, attr):
+    with pytest.raises(CompileError):
+        command_module(attr)
+
+
+def test_compiled_does_not_import_argparse(command_module):
+    command_module('main')
+
+    code = (
+        'import sys\n'
+        'from {}_main_compiled import main\n'
+        'main(["a", "b", "-c", "2"])\n'
+        'print("argparse" in sys.modules, "inspect" in sys.modules)\n'
+    ).format(command_module.module_name)
+
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+    result = subprocess.run(
+        [sys.executable, '-c', code], env=env, check=True,
+        stdout=subprocess.PIPE, universal_newlines=True)
+
+    assert result.stdout.split() == ['False', 'False']
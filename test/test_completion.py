@@ -0,0 +1,147 @@
+# Copyright 2014-2016 Nathan West
+#
+# This file is part of autocommand.
+#
+# autocommand is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# autocommand is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with autocommand.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import shutil
+import subprocess
+import pytest
+from autocommand import autoparse
+from autocommand import completion
+from autocommand.completion import (
+    UnknownShellError, completion_path, completion_script)
+
+
+@autoparse(add_nos=True)
+def copy(source, *dests, count: 'How many copies' =1, verbose=False):
+    pass
+
+
+def test_bash_script():
+    script = completion_script(copy.parser, 'bash', 'copy')
+
+    assert '-c|--count)' in script
+    assert "'-h --help -c --count -v --verbose --no-verbose'" in script
+    assert script.endswith('complete -o filenames -F _autocommand_copy copy\n')
+
+
+def test_zsh_script():
+    script = completion_script(copy.parser, 'zsh', 'copy')
+
+    assert "'--count[How many copies]:count:_files'" in script
+    assert '--no-verbose' in script
+    assert ':source:_files' in script
+    assert "'*:dests:_files'" in script
+    assert script.endswith('compdef _autocommand_copy copy\n')
+
+
+def test_fish_script():
+    script = completion_script(copy.parser, 'fish', 'copy')
+
+    assert "complete -c copy -s c -l count -r -d 'How many copies'" in script
+    assert 'complete -c copy -s v -l verbose\n' in script
+    assert 'complete -c copy -l no-verbose\n' in script
+
+
+def test_unknown_shell(tmpdir):
+    with pytest.raises(UnknownShellError):
+        completion_script(copy.parser, 'csh', 'copy')
+
+    with pytest.raises(UnknownShellError):
+        completion_path(copy, 'csh', 'copy', str(tmpdir))
+
+
+def test_completion_cache(tmpdir, monkeypatch):
+    path = completion_path(copy, 'bash', 'copy', str(tmpdir))
+
+    with open(path) as file:
+        assert file.read() == completion_script(copy.parser, 'bash', 'copy')
+
+    # The cached script is reused
+    def fail(*args):
+        raise AssertionError('completion script was regenerated')
+
+    with monkeypatch.context() as patch:
+        patch.setattr(completion, 'completion_script', fail)
+        assert completion_path(copy, 'bash', 'copy', str(tmpdir)) == path
+
+    # A different signature replaces the cached script
+    @autoparse
+    def copy_v2(source, dest):
+        pass
+
+    new_path = completion_path(copy_v2, 'bash', 'copy', str(tmpdir))
+    assert new_path != path
+    assert os.listdir(str(tmpdir)) == [os.path.basename(new_path)]
+
+
+def test_completion_cache_object_default(tmpdir, monkeypatch):
+    # The repr of an object default differs from run to run
+    def make_command():
+        @autoparse
+        def command(value=object()):
+            pass
+
+        return command
+
+    path = completion_path(make_command(), 'bash', 'command', str(tmpdir))
+
+    def fail(*args):
+        raise AssertionError('completion script was regenerated')
+
+    monkeypatch.setattr(completion, 'completion_script', fail)
+    assert completion_path(
+        make_command(), 'bash', 'command', str(tmpdir)) == path
+
+
+def test_completion_custom_parser(tmpdir):
+    from argparse import ArgumentParser
+
+    def make_command(flag):
+        parser = ArgumentParser()
+        parser.add_argument(flag)
+        return autoparse(lambda **kwargs: None, parser=parser)
+
+    path = completion_path(make_command('--first'), 'bash', 'cmd', str(tmpdir))
+    new_path = completion_path(
+        make_command('--second'), 'bash', 'cmd', str(tmpdir))
+
+    assert new_path != path
+    with open(new_path) as file:
+        assert '--second' in file.read()
+
+
+@pytest.mark.skipif(shutil.which('bash') is None, reason='requires bash')
+@pytest.mark.parametrize('words, expected', [
+    ('copy --c', '--count'),
+    ('copy --no', '--no-verbose'),
+    ('copy -c fi', 'file.txt'),
+    ('copy fi', 'file.txt'),
+])
+def test_bash_completion(tmpdir, words, expected):
+    tmpdir.join('file.txt').write('')
+    path = completion_path(copy, 'bash', 'copy', str(tmpdir.join('cache')))
+
+    result = subprocess.run(
+        ['bash', '-c', (
+            'source "$1"; COMP_WORDS=($2); '
+            'COMP_CWORD=$((${#COMP_WORDS[@]} - 1)); '
+            '_autocommand_copy; echo "${COMPREPLY[*]}"'),
+         'bash', path, words],
+        cwd=str(tmpdir), check=True, stdout=subprocess.PIPE,
+        universal_newlines=True)
+
+    assert result.stdout.split() == [expected]
@@ -0,0 +1,233 @@
+# Copyright 2014-2016 Nathan West
+#
+# This file is part of autocommand.
+#
+# autocommand is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# autocommand is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with autocommand.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import pytest
+from autocommand import forkserver
+
+
+pytestmark = pytest.mark.skipif(
+    not forkserver.available(), reason='requires fork and Unix sockets')
+
+
+SCRIPT = '''\
+import os
+import sys
+from autocommand.forkserver import client
+client()
+
+with open(os.environ['MARKER'], 'a') as file:
+    file.write('imported\\n')
+
+from autocommand import autocommand
+
+
+@autocommand(__name__, server=True, idle_timeout={idle_timeout})
+def main(code: int =0, echo_stdin=False):
+    print('pid', os.getpid())
+    print('cwd', os.getcwd())
+    print('value', os.environ.get('VALUE'))
+    if echo_stdin:
+        print('stdin', sys.stdin.read().strip())
+    return code
+'''
+
+
+@pytest.fixture
+def runtime(monkeypatch):
+    # Unix socket paths are limited to about 100 bytes, so keep it short
+    path = tempfile.mkdtemp(prefix='ac')
+    monkeypatch.setenv('XDG_RUNTIME_DIR', path)
+    monkeypatch.delenv('AUTOCOMMAND_NO_SERVER', raising=False)
+    try:
+        yield path
+    finally:
+        for name in forkserver.running_servers():
+            forkserver.stop(name)
+        shutil.rmtree(path, ignore_errors=True)
+
+
+@pytest.fixture
+def script(runtime, tmpdir):
+    def make_script(idle_timeout=60):
+        path = tmpdir.join('command.py')
+        path.write(SCRIPT.format(idle_timeout=idle_timeout))
+        return str(path)
+
+    return make_script
+
+
+def run(path, *args, cwd=None, value=None, stdin=''):
+    env = dict(
+        os.environ,
+        PYTHONPATH=os.pathsep.join(sys.path),
+        MARKER=path + '.marker')
+    if value is not None:
+        env['VALUE'] = value
+
+    result = subprocess.run(
+        [sys.executable, path] + list(args),
+        env=env, cwd=cwd, input=stdin, stdout=subprocess.PIPE,
+        universal_newlines=True, timeout=30)
+
+    output = dict(
+        line.split(' ', 1) for line in result.stdout.splitlines())
+    return result.returncode, output
+
+
+def imports(path):
+    try:
+        with open(path + '.marker') as file:
+            return len(file.readlines())
+    except FileNotFoundError:
+        return 0
+
+
+def wait_for_server(path, present=True):
+    # Only check for the socket, since connecting to the server would reset
+    # its idle timeout
+    name = forkserver.server_name(path)
+    socket_path = os.path.join(
+        os.environ['XDG_RUNTIME_DIR'], 'autocommand', name + '.sock')
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        if os.path.exists(socket_path) == present:
+            return name
+        time.sleep(0.02)
+    raise AssertionError('server did not {}'.format(
+        'start' if present else 'stop'))
+
+
+def test_server_runs_command(script, tmpdir):
+    path = script()
+
+    code, first = run(path)
+    assert code == 0
+    wait_for_server(path)
+    assert imports(path) == 1
+
+    workdir = tmpdir.mkdir('workdir')
+    code, second = run(
+        path, '-e', cwd=str(workdir), value='forwarded',
+        stdin='hello\n')
+
+    assert code == 0
+    assert imports(path) == 1
+    assert second['pid'] != first['pid']
+    assert second['cwd'] == str(workdir)
+    assert second['value'] == 'forwarded'
+    assert second['stdin'] == 'hello'
+
+
+def test_exit_code(script):
+    path = script()
+
+    assert run(path, '-c', '3')[0] == 3
+    wait_for_server(path)
+
+    assert run(path, '-c', '5')[0] == 5
+    assert run(path, '-c', 'invalid')[0] == 2
+    assert imports(path) == 1
+
+
+def test_stop(script):
+    path = script()
+    run(path)
+    name = wait_for_server(path)
+
+    assert forkserver.stop(name)['script'] == path
+    wait_for_server(path, present=False)
+    assert forkserver.stop(name) is None
+
+    run(path)
+    assert imports(path) == 2
+
+
+def test_restart(script):
+    path = script()
+    run(path)
+    name = wait_for_server(path)
+
+    assert forkserver.restart(name)
+    wait_for_server(path)
+    assert imports(path) == 2
+
+    run(path)
+    assert imports(path) == 2
+
+
+def test_idle_timeout(script):
+    path = script(idle_timeout=0.5)
+    run(path)
+    wait_for_server(path)
+    wait_for_server(path, present=False)
+
+
+def test_modified_script_restarts(script):
+    path = script()
+    run(path)
+    wait_for_server(path)
+
+    # Make sure the modification time changes
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+    assert run(path)[0] == 0
+    assert imports(path) == 2
+    wait_for_server(path)
+
+    run(path)
+    assert imports(path) == 2
+
+
+def test_disabled(script, monkeypatch):
+    path = script()
+    run(path)
+    wait_for_server(path)
+
+    monkeypatch.setenv('AUTOCOMMAND_NO_SERVER', '1')
+    run(path)
+    assert imports(path) == 2
+
+
+def test_server_builds_wrapped_parser(runtime, monkeypatch):
+    from functools import wraps
+    from autocommand import autoparse
+
+    @autoparse(lazy=True)
+    def command(value):
+        return value
+
+    @wraps(command)
+    def main(*args, **kwargs):
+        return command(*args, **kwargs)
+
+    built = []
+    monkeypatch.setattr(forkserver, 'run_in_server', lambda name: None)
+    monkeypatch.setattr(
+        forkserver, 'start_server',
+        lambda name, main, args, kwargs, idle_timeout: built.append(
+            command._built))
+
+    result = forkserver.serve_or_run(main, (['value'],), name='wrapped')
+    assert result == 'value'
+    assert built == [True]
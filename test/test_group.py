@@ -0,0 +1,172 @@
+# Copyright 2014-2016 Nathan West
+#
+# This file is part of autocommand.
+#
+# autocommand is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# autocommand is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with autocommand.  If not, see <http://www.gnu.org/licenses/>.
+
+import sys
+import pytest
+from autocommand.group import (
+    CommandGroup, CommandTargetError, DuplicateCommandError)
+
+
+BUILD_MODULE = '''
+from autocommand import autoparse
+
+@autoparse
+def main(target, jobs: int =1):
+    'Build the target'
+    return 'build', target, jobs
+'''
+
+PLAIN_MODULE = '''
+def run(name, loud=False):
+    return 'plain', name, loud
+'''
+
+# A module that must never be imported by the tests that use it
+POISON_MODULE = '''
+raise RuntimeError('poison module was imported')
+'''
+
+
+@pytest.fixture
+def modules(tmpdir, monkeypatch):
+    '''
+    Create some uniquely named subcommand modules on disk. Returns a dict
+    mapping each kind of module to its name.
+    '''
+    names = {}
+    for kind, source in [
+            ('build', BUILD_MODULE),
+            ('plain', PLAIN_MODULE),
+            ('poison', POISON_MODULE)]:
+        name = 'group_test_{}_{}'.format(kind, id(tmpdir))
+        tmpdir.join(name + '.py').write(source)
+        names[kind] = name
+
+    monkeypatch.syspath_prepend(str(tmpdir))
+    yield names
+
+    for name in names.values():
+        sys.modules.pop(name, None)
+
+
+@pytest.fixture
+def group(modules):
+    group = CommandGroup(prog='tool', description='A multi-tool')
+    group.register(
+        'build', modules['build'] + ':main', help='Build something')
+    group.register('plain', modules['plain'] + ':run', help='A plain function')
+    group.register('poison', modules['poison'] + ':main', help='Never run')
+    return group
+
+
+def test_dispatch_imports_only_chosen_command(group, modules):
+    assert group(['build', 'thing', '-j', '4']) == ('build', 'thing', 4)
+
+    assert modules['build'] in sys.modules
+    assert modules['plain'] not in sys.modules
+    assert modules['poison'] not in sys.modules
+
+
+def test_dispatch_plain_function(group):
+    assert group(['plain', 'name', '--loud']) == ('plain', 'name', True)
+
+
+def test_dispatch_from_argv(group, monkeypatch):
+    monkeypatch.setattr(sys, 'argv', ['tool', 'plain', 'x'])
+    assert group() == ('plain', 'x', False)
+
+
+def test_top_level_help(group, modules, check_help_text):
+    check_help_text(
+        lambda: group(['--help']),
+        'usage: tool',
+        'A multi-tool',
+        'build',
+        'Build something',
+        'A plain function')
+
+    assert modules['build'] not in sys.modules
+    assert modules['poison'] not in sys.modules
+
+
+@pytest.mark.parametrize('argv', [[], ['bogus'], ['-x']])
+def test_invalid_command(group, modules, argv, capsys):
+    with pytest.raises(SystemExit) as exc_info:
+        group(argv)
+
+    assert exc_info.value.code == 2
+    assert 'usage: tool' in capsys.readouterr().err
+    assert modules['poison'] not in sys.modules
+
+
+def test_subcommand_help_prog(group, check_help_text):
+    check_help_text(
+        lambda: group(['build', '--help']),
+        'usage: tool build',
+        'Build the target')
+
+
+def test_load_lazy_command(check_help_text):
+    from autocommand import autoparse
+
+    @autoparse(lazy=True, fast=True)
+    def echo(value):
+        return value
+
+    group = CommandGroup(prog='tool')
+    group.register('echo', echo)
+
+    assert group(['echo', 'hello']) == 'hello'
+    assert echo._parser is None
+    assert echo.prog == 'tool echo'
+
+    check_help_text(lambda: group(['echo']), 'usage: tool echo')
+    assert echo.parser.prog == 'tool echo'
+
+
+def test_callable_target():
+    group = CommandGroup(prog='tool')
+    group.register('echo', lambda value: value)
+
+    assert group(['echo', 'hello']) == 'hello'
+    assert group.commands == ['echo']
+
+
+def test_nested_group(check_help_text):
+    inner = CommandGroup()
+    inner.register('echo', lambda value: value)
+
+    outer = CommandGroup(prog='tool')
+    outer.register('inner', inner)
+
+    assert outer(['inner', 'echo', 'hello']) == 'hello'
+    check_help_text(lambda: outer(['inner', '-h']), 'usage: tool inner')
+
+
+@pytest.mark.parametrize('target', [
+    'no_colon', ':func', 'module:', 10])
+def test_bad_target(target):
+    with pytest.raises(CommandTargetError):
+        CommandGroup().register('name', target)
+
+
+def test_duplicate_command():
+    group = CommandGroup()
+    group.register('name', 'module:func')
+
+    with pytest.raises(DuplicateCommandError):
+        group.register('name', 'module:other')
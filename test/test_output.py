@@ -0,0 +1,102 @@
+# Copyright 2014-2016 Nathan West
+#
+# This file is part of autocommand.
+#
+# autocommand is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# autocommand is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with autocommand.  If not, see <http://www.gnu.org/licenses/>.
+
+import io
+import pytest
+from autocommand.output import (
+    write_items, get_encoder, encode_tsv, UnknownEncoderError)
+
+
+class CountingIO(io.StringIO):
+    writes = 0
+
+    def write(self, data):
+        self.writes += 1
+        return super().write(data)
+
+
+def generate(count, result=None):
+    for i in range(count):
+        yield i
+    return result
+
+
+@pytest.mark.parametrize('count', [0, 1, 9, 10, 11, 25])
+def test_write_items_batches(count):
+    out = CountingIO()
+    assert write_items(generate(count, 'done'), out, batch_size=10) == 'done'
+
+    assert out.getvalue() == ''.join('{}\n'.format(i) for i in range(count))
+    assert out.writes == -(-count // 10)
+
+
+def test_write_items_iterable():
+    out = io.StringIO()
+    assert write_items(['a', 'b'], out) is None
+    assert out.getvalue() == 'a\nb\n'
+
+
+def test_write_items_jsonl():
+    out = io.StringIO()
+    write_items([{'name': 'é', 'values': [1, None]}, 'text'], out,
+                encoder='jsonl')
+    assert out.getvalue() == '{"name":"é","values":[1,null]}\n"text"\n'
+
+
+def test_write_items_custom_encoder():
+    out = io.StringIO()
+    write_items([1, 2], out, encoder=lambda item: '#' * item)
+    assert out.getvalue() == '#\n##\n'
+
+
+def test_encode_tsv():
+    assert encode_tsv(('a', 1, None, 2.5)) == 'a\t1\t\t2.5'
+    assert encode_tsv(['tab\there', 'line\nbreak\r', 'back\\slash']) == (
+        'tab\\there\tline\\nbreak\\r\tback\\\\slash')
+    assert encode_tsv('single field') == 'single field'
+    assert encode_tsv(7) == '7'
+
+
+def test_unknown_encoder():
+    with pytest.raises(UnknownEncoderError):
+        get_encoder('xml')
+
+
+def test_write_items_closes_generator_on_error():
+    closed = False
+
+    def items():
+        nonlocal closed
+        try:
+            yield 1
+            yield 2
+        finally:
+            closed = True
+
+    class FailingIO(io.StringIO):
+        def write(self, data):
+            raise OSError('disk full')
+
+    with pytest.raises(OSError):
+        write_items(items(), FailingIO(), batch_size=1)
+
+    assert closed
+
+
+def test_write_items_stdout(capsys):
+    write_items(generate(3))
+    assert capsys.readouterr().out == '0\n1\n2\n'
@@ -0,0 +1,132 @@
+# Copyright 2014-2016 Nathan West
+#
+# This file is part of autocommand.
+#
+# autocommand is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# autocommand is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with autocommand.  If not, see <http://www.gnu.org/licenses/>.
+
+import gzip
+import io
+import pytest
+asyncio = pytest.importorskip('asyncio')
+autoasync_module = pytest.importorskip('autocommand.autoasync')
+AsyncFile = autoasync_module.AsyncFile
+smart_open_async = autoasync_module.smart_open_async
+
+
+def run(coro):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+
+LINES = ['line {}\n'.format(i) for i in range(1000)]
+
+
+def test_smart_open_async_is_exported():
+    import autocommand
+
+    assert autocommand.smart_open_async is smart_open_async
+
+
+def test_read_lines(tmpdir):
+    path = tmpdir.join('file.txt')
+    path.write(''.join(LINES) + 'last')
+
+    async def read():
+        async with smart_open_async(str(path), chunk_size=100) as file:
+            lines = [line async for line in file]
+        return lines, file
+
+    lines, file = run(read())
+    assert lines == LINES + ['last']
+    assert file.file.closed
+
+
+def test_read_sizes(tmpdir):
+    path = tmpdir.join('file.dat')
+    path.write_binary(bytes(range(256)) * 10)
+
+    async def read():
+        async with smart_open_async(str(path), 'rb', chunk_size=7) as file:
+            first = await file.read(10)
+            line = await file.readline()
+            rest = await file.read()
+            end = await file.read()
+        return first, line, rest, end
+
+    first, line, rest, end = run(read())
+    assert first == bytes(range(10))
+    assert line == bytes(range(10, 11))
+    assert first + line + rest == bytes(range(256)) * 10
+    assert end == b''
+
+
+def test_write_compressed(tmpdir):
+    path = str(tmpdir.join('file.txt.gz'))
+
+    async def write():
+        async with smart_open_async(path, 'w', chunk_size=64) as file:
+            for line in LINES:
+                await file.write(line)
+
+    run(write())
+    with gzip.open(path, 'rt') as file:
+        assert file.read() == ''.join(LINES)
+
+
+def test_file_object_is_not_closed():
+    stream = io.StringIO('hello\nworld\n')
+
+    async def read():
+        async with smart_open_async(stream) as file:
+            assert isinstance(file, AsyncFile)
+            return await file.readline()
+
+    assert run(read()) == 'hello\n'
+    assert not stream.closed
+
+
+def test_empty_file(tmpdir):
+    path = tmpdir.join('empty.txt').ensure(file=True)
+
+    async def read():
+        async with smart_open_async(str(path)) as file:
+            return await file.read(), await file.readline()
+
+    assert run(read()) == ('', '')
+
+
+def test_early_exit(tmpdir):
+    path = tmpdir.join('file.txt')
+    path.write(''.join(LINES))
+
+    async def read():
+        async with smart_open_async(str(path), chunk_size=10) as file:
+            async for line in file:
+                return line, file
+
+    line, file = run(read())
+    assert line == LINES[0]
+    assert file.file.closed
+
+
+def test_streams_pass_through():
+    async def open_stream():
+        reader = asyncio.StreamReader()
+        async with smart_open_async(reader) as file:
+            return file is reader
+
+    assert run(open_stream())
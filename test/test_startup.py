@@ -0,0 +1,92 @@
+# Copyright 2014-2016 Nathan West
+#
+# This file is part of autocommand.
+#
+# autocommand is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# autocommand is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with autocommand.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import subprocess
+import sys
+from importlib import import_module
+import pytest
+
+
+def imported_modules(code):
+    '''
+    Run some code in a fresh interpreter, and return the set of modules that
+    were imported by it (and by interpreter startup).
+    '''
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+    result = subprocess.run(
+        [sys.executable, '-c', code + '\nimport sys\nprint(*sys.modules)'],
+        env=env, check=True, stdout=subprocess.PIPE, universal_newlines=True)
+
+    return set(result.stdout.split())
+
+
+def test_import_does_not_import_asyncio():
+    modules = imported_modules('import autocommand')
+
+    assert 'autocommand' in modules
+    assert 'asyncio' not in modules
+    assert 'argparse' not in modules
+
+
+def test_automain_imports_only_automain():
+    modules = imported_modules('from autocommand import automain')
+
+    assert 'autocommand.automain' in modules
+    assert 'autocommand.autoparse' not in modules
+    assert 'asyncio' not in modules
+    assert 'argparse' not in modules
+    assert 'inspect' not in modules
+
+
+def test_autocommand_does_not_import_asyncio():
+    modules = imported_modules('from autocommand import autocommand')
+
+    assert 'autocommand.autoparse' in modules
+    assert 'asyncio' not in modules
+
+
+def test_lazy_autoparse_does_not_import_argparse():
+    modules = imported_modules(
+        'from autocommand import autoparse\n'
+        'autoparse(lambda arg: arg, lazy=True)\n')
+
+    assert 'autocommand.autoparse' in modules
+    assert 'argparse' not in modules
+    assert 'inspect' not in modules
+
+
+@pytest.mark.parametrize('name', [
+    'automain', 'autoparse', 'autocommand', 'autoasync'])
+def test_exports_are_functions(name):
+    '''
+    Test that the package attributes are the exported functions, rather than
+    the submodules of the same name, even after the submodules are imported
+    directly.
+    '''
+    import autocommand
+    module = import_module('autocommand.' + name)
+
+    assert getattr(autocommand, name) is not module
+    assert getattr(autocommand, name) is getattr(module, name)
+
+
+def test_unknown_attribute():
+    import autocommand
+
+    with pytest.raises(AttributeError):
+        autocommand.not_a_real_attribute
@@ -0,0 +1,272 @@
+# Copyright 2014-2016 Nathan West
+#
+# This file is part of autocommand.
+#
+# autocommand is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# autocommand is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with autocommand.  If not, see <http://www.gnu.org/licenses/>.
+
+import sys
+import pytest
+from autocommand.group import CommandGroup, resolve_target
+from autocommand.statichelp import run, static_parser
+
+
+COMMANDS = {
+    'basic': '''
+from autocommand import autoparse
+
+@autoparse
+def main(source, dest, *rest, count: int =1, verbose=False):
+    """Copy some files"""
+''',
+
+    'described': '''
+import sys
+from pathlib import Path
+import autocommand
+
+DEBUG = False
+SIZE_HELP = 'The block size'
+
+@autocommand.autocommand(__name__, add_nos=True, epilog='The end')
+def main(
+        path: (Path, 'The path to copy'),
+        size: SIZE_HELP =1024,
+        debug=DEBUG,
+        quiet: bool =True,
+        output=sys.stdout,
+        mode: ('The mode', str) ='r'):
+    """
+    Copy a file
+
+    ----
+
+    More details
+    """
+''',
+
+    'async': '''
+from autocommand import autocommand
+
+@autocommand(__name__, pass_loop=True)
+async def main(host, port: int, loop):
+    """Connect to a server"""
+''',
+}
+
+# Commands that can't be handled statically
+UNRESOLVABLE = {
+    'decorator': '''
+import functools
+from autocommand import autoparse
+
+@autoparse
+@functools.lru_cache()
+def main(value):
+    pass
+''',
+
+    'imported_default': '''
+from autocommand import autoparse
+from settings import DEFAULT
+
+@autoparse
+def main(value=DEFAULT):
+    pass
+''',
+
+    'parser': '''
+from argparse import ArgumentParser
+from autocommand import autoparse
+
+@autoparse(parser=ArgumentParser())
+def main(value):
+    pass
+''',
+
+    'future': '''
+from __future__ import annotations
+from autocommand import autoparse
+
+@autoparse
+def main(value: int):
+    pass
+''',
+
+    'undecorated': '''
+def main(value):
+    pass
+''',
+
+    'argstream': '''
+from autocommand import autoparse, ArgStream
+
+@autoparse
+def main(paths: ArgStream):
+    pass
+''',
+
+    'argstream_attribute': '''
+import autocommand
+
+@autocommand.autoparse
+def main(paths: (autocommand.ArgStream, 'The paths')):
+    pass
+''',
+
+    'argstream_subclass': '''
+from autocommand import autoparse
+from autocommand.argtypes import ArgStream
+
+class Paths(ArgStream):
+    pass
+
+@autoparse
+def main(paths: Paths):
+    pass
+''',
+
+    'typing_list': '''
+from typing import List
+from autocommand import autoparse
+
+@autoparse
+def main(*, ids: List[int] =()):
+    pass
+''',
+
+    'list': '''
+from autocommand import autoparse
+
+@autoparse
+def main(*, ids: list[int] =()):
+    pass
+''',
+
+    'alias': '''
+from typing import List
+from autocommand import autoparse
+
+Ids = List[int]
+
+@autoparse
+def main(*, ids: Ids =()):
+    pass
+''',
+}
+
+POISON_COMMAND = '''
+from autocommand import autoparse
+
+raise RuntimeError('poison module was imported')
+
+@autoparse
+def main(target, jobs: int =1):
+    """Build the target"""
+'''
+
+
+@pytest.fixture
+def make_module(tmpdir, monkeypatch):
+    '''
+    Return a function that writes a uniquely named module to disk, and
+    returns its name.
+    '''
+    monkeypatch.syspath_prepend(str(tmpdir))
+    names = []
+
+    def make_module_impl(source):
+        name = 'statichelp_test_{}_{}'.format(id(tmpdir), len(names))
+        tmpdir.join(name + '.py').write(source)
+        names.append(name)
+        return name
+
+    yield make_module_impl
+
+    for name in names:
+        sys.modules.pop(name, None)
+
+
+@pytest.mark.parametrize('source', COMMANDS.values(), ids=list(COMMANDS))
+def test_static_help_matches(make_module, source):
+    target = make_module(source) + ':main'
+
+    parser = static_parser(target)
+    assert parser is not None
+
+    assert parser.format_help() == resolve_target(target).parser.format_help()
+
+
+@pytest.mark.parametrize(
+    'source', UNRESOLVABLE.values(), ids=list(UNRESOLVABLE))
+def test_unresolvable(make_module, source):
+    assert static_parser(make_module(source) + ':main') is None
+
+
+@pytest.mark.parametrize('source, usage', [
+    (UNRESOLVABLE['argstream'], '[paths'),
+    (UNRESOLVABLE['typing_list'], '-i [IDS'),
+])
+def test_unresolvable_help(make_module, capsys, source, usage):
+    target = make_module(source) + ':main'
+
+    with pytest.raises(SystemExit):
+        run(target, ['--help'])
+
+    assert usage in capsys.readouterr().out
+
+
+def test_imported_module(make_module):
+    target = make_module(COMMANDS['basic']) + ':main'
+    resolve_target(target)
+
+    assert static_parser(target) is None
+
+
+def test_missing_module():
+    assert static_parser('not_a_real_module_for_statichelp:main') is None
+
+
+def test_run_help_does_not_import(make_module, capsys):
+    target = make_module(POISON_COMMAND) + ':main'
+
+    with pytest.raises(SystemExit) as exc_info:
+        run(target, ['--help'])
+
+    assert exc_info.value.code == 0
+    assert 'Build the target' in capsys.readouterr().out
+
+
+def test_run_calls_target(make_module):
+    target = make_module('''
+from autocommand import autoparse
+
+@autoparse
+def main(value, *, twice=False):
+    return value * 2 if twice else value
+''') + ':main'
+
+    assert run(target, ['ab', '-t']) == 'abab'
+
+
+def test_group_subcommand_help_does_not_import(make_module, capsys):
+    group = CommandGroup(prog='tool')
+    group.register('build', make_module(POISON_COMMAND) + ':main')
+
+    with pytest.raises(SystemExit) as exc_info:
+        group(['build', '-h'])
+
+    assert exc_info.value.code == 0
+    out = capsys.readouterr().out
+    assert out.startswith('usage: tool build [-h] [-j JOBS] target')
+    assert 'Build the target' in out